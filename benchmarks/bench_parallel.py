@@ -0,0 +1,48 @@
+"""
+平行評分的基準測試：比較不同程序數下的評分速度與加速比。
+
+用法:
+    python benchmarks/bench_parallel.py --rows 1000000
+    python benchmarks/bench_parallel.py --rows 20000 --report   # 逐筆產生報告 (CPU 密集)
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel import default_workers, score_frame_parallel
+from synthetic import make_companies
+
+def worker_counts(max_workers):
+    """1, 2, 4, ... 直到 max_workers (包含 max_workers 本身)。"""
+    counts = []
+    n = 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    counts.append(max_workers)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunk-size', type=int, default=20_000)
+    parser.add_argument('--max-workers', type=int, default=default_workers())
+    parser.add_argument('--report', action='store_true', help="同時產生每家公司的報告文字")
+    args = parser.parse_args(argv)
+
+    df = make_companies(args.rows)
+    print(f"{args.rows:,} 家公司，每批 {args.chunk_size:,} 列，報告={'是' if args.report else '否'}")
+    print(f"{'程序數':>6} {'秒數':>10} {'列/秒':>14} {'加速比':>8}")
+    baseline = None
+    for workers in worker_counts(args.max_workers):
+        started = time.perf_counter()
+        score_frame_parallel(df, workers=workers, chunk_size=args.chunk_size, with_report=args.report)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(f"{workers:>6} {elapsed:>10.3f} {args.rows / elapsed:>14,.0f} {baseline / elapsed:>8.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+"""
+熱點路徑的基準測試：比率計算、六項 assess_* 評估、多期時間序列評分、長條圖繪製、綜合報告文字與整批 ZIP 匯出、CSV / Excel / Parquet / Arrow 讀取、SQLite 資料庫的保存與載入，以及 web.py 的冷啟動時間。
+
+每個項目記錄最短耗時 (多次重複取最小值) 與峰值記憶體 (tracemalloc，另外跑一次以免影響計時)，
+結果附加寫入 JSON 歷史檔，並可與儲存的基準 (baseline) 比較：任何項目比基準慢超過門檻時
+以非零狀態碼結束，方便在部署前的 CI 中攔下效能退化。
+
+逐筆 (scalar) 的 calculate_ratios / assess_* 在大量公司時非常耗時，只測到 --scalar-max 家；
+批次版本 (calculate_ratios_batch / score_batch) 則測試所有規模。
+
+用法:
+    python benchmarks/run_benchmarks.py                     # 1、1k、100k、1M 家公司
+    python benchmarks/run_benchmarks.py --quick             # 只測 1 與 1k 家，約數秒
+    python benchmarks/run_benchmarks.py --save-baseline     # 將本次結果存為基準
+    python benchmarks/run_benchmarks.py --only batch --sizes 1000000
+    python benchmarks/run_benchmarks.py --only startup      # web.py 冷啟動時間
+"""
+import argparse
+import ast
+from datetime import datetime
+import gc
+import io
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from charts import bar_chart_png, bar_chart_spec
+from data_io import read_financial_table, read_uploaded_table, write_table
+from financial_analysis import (ANALYSIS_TITLES, REPORT_CACHE, FinancialCalculator, FinancialData, FinancialDataTable,
+                                generate_overall_report_text, generate_reports_batch, score_companies)
+from ranking import Ranker
+from report_export import write_report_archive
+from screener import Screener, parse_query
+from simulation import simulate
+from store import STORE_ENV, FinancialStore
+from synthetic import make_companies, make_company_history
+from timeseries import CASH_FLOW_HISTORY_PERIODS, PREVIOUS_FIELDS, PREVIOUS_RATIOS, FinancialTimeSeries
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(BENCH_DIR, 'history.json')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_SIZES = (1, 1_000, 100_000, 1_000_000)
+QUICK_SIZES = (1, 1_000)
+GROUPS = ('scalar', 'batch', 'chart', 'report', 'ingest', 'timeseries', 'store', 'startup')
+TIMESERIES_PERIODS = 10
+TIMESERIES_CHECK_COMPANIES = 30 # 與逐期的計算器比對評分的公司數
+
+# 測試環境多半沒有中文字型，避免每次繪圖都輸出找不到字型的訊息
+logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+warnings.filterwarnings('ignore', message=r'Glyph \d+ .* missing from font')
+
+WEB_APP = os.path.join(REPO_DIR, 'web.py')
+# web.py 啟動時不應載入的重量級模組 (只在繪圖或讀取 Excel 時才匯入)
+LAZY_MODULES = ('matplotlib', 'openpyxl')
+
+SCREENER_QUERY = "roe > industry_avg_roe, debt_ratio < 0.5, liquidity > 70"
+
+# 比較基準時，耗時低於此值 (秒) 的差異視為雜訊
+MIN_REGRESSION_SECONDS = 0.005
+
+def measure(func, repeat):
+    """回傳 (最短秒數, 峰值記憶體位元組)。計時與記憶體追蹤分開執行。"""
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(timings), peak
+
+def repeat_for(n):
+    """小規模多跑幾次以降低雜訊，大規模只跑一次。"""
+    return 5 if n <= 1_000 else 3 if n <= 100_000 else 1
+
+def build_calculators(df):
+    return [FinancialCalculator(FinancialData.from_record(record)) for record in df.to_dict('records')]
+
+def scalar_cases(df):
+    """逐筆呼叫 calculate_ratios 與各 assess_* 方法。"""
+    calculators = build_calculators(df)
+    ratios = [calculator.calculate_ratios() for calculator in calculators]
+    yield 'calculate_ratios', lambda: [calculator.calculate_ratios() for calculator in calculators]
+    for key in FinancialCalculator.ANALYSIS_KEYS:
+        method = FinancialCalculator.ANALYSIS_METHODS[key]
+        yield method, lambda method=method: [getattr(calculator, method)(r) for calculator, r in zip(calculators, ratios)]
+
+def batch_cases(df):
+    """批次版本：calculate_ratios_batch 與 score_batch (一次算完六項評估)、欄式 FinancialDataTable，篩選器查詢、排名與蒙地卡羅模擬 (n 個情境)。"""
+    ratios = FinancialCalculator.calculate_ratios_batch(df)
+    yield 'calculate_ratios_batch', lambda: FinancialCalculator.calculate_ratios_batch(df)
+    yield 'score_batch', lambda: FinancialCalculator.score_batch(df, ratios)
+    yield 'FinancialDataTable.from_frame', lambda: FinancialDataTable.from_frame(df)
+    table = FinancialDataTable.from_frame(df)
+    yield 'score_batch_table', lambda: FinancialCalculator.score_batch(table)
+    # 篩選器：索引已建立後的查詢 (與 Streamlit 重新執行時相同)
+    scored = score_companies(df)
+    screener = Screener.from_scores(df, scored)
+    conditions = parse_query(SCREENER_QUERY)
+    screener.filter(conditions)
+    screener.top_k('profit_quality', 100)
+    yield 'screener_filter', lambda: screener.filter(conditions)
+    yield 'screener_top_k', lambda: screener.top_k('profit_quality', 100)
+    # 排名：調整權重後重算綜合分數的前 100 名，以及單項分數最低的 10%
+    ranker = Ranker.from_frame(scored)
+    weights = dict(zip(FinancialCalculator.ANALYSIS_KEYS, (2, 1, 1, 1, 0.5, 0.5)))
+    yield 'ranking_top_100', lambda: ranker.top(100, weights)
+    yield 'ranking_bottom_decile', lambda: ranker.bottom_fraction('cash_flow', 0.1)
+    # 蒙地卡羅模擬：第一家公司的 n 個情境
+    company = FinancialData.from_record(df.iloc[0])
+    yield 'simulate', lambda: simulate(company, scenarios=len(df), seed=0)
+
+def check_score_history(n):
+    """
+    約 15% 缺期的時間序列：score_history 須與逐期建立 FinancialData 再以 FinancialCalculator 評分的結果相同。
+    prev_* 欄位取自前一期 (未申報的期別各欄位為 0)，前一期未申報時 prev_* 比率維持預設值 0。不一致時擲出 AssertionError。
+    """
+    series = FinancialTimeSeries.from_long_frame(make_company_history(n, TIMESERIES_PERIODS, seed=1, missing=0.15))
+    scores = series.score_history()
+    mismatches = []
+    for c in range(len(series)):
+        previous, cash_flows = None, []
+        for t in range(series.n_periods):
+            data = FinancialData()
+            for key in series.FIELDS:
+                data.data[key] = float(series.field(key)[c, t]) if series.observed[c, t] else 0.0
+            if previous is not None:
+                for previous_key, key in PREVIOUS_FIELDS.items():
+                    data.data[previous_key] = previous[0].data[key]
+                data.data['prev_total_liabilities'] = previous[0].data['total_assets'] - previous[0].data['shareholders_equity']
+                if series.observed[c, t - 1]:
+                    for previous_key, key in PREVIOUS_RATIOS.items():
+                        data.data[previous_key] = previous[1][key]
+            cash_flows.append(data.data['operating_cash_flow'])
+            data.data['three_year_operating_cash_flows'] = cash_flows[-CASH_FLOW_HISTORY_PERIODS:]
+            calculator = FinancialCalculator(data)
+            ratios = calculator.calculate_ratios()
+            if series.observed[c, t]:
+                for key, result in calculator.assess_all(ratios).items():
+                    if result['score'] != scores[key][c, t]:
+                        mismatches.append((series.companies[c], series.periods[t], key))
+            previous = data, ratios
+    if mismatches:
+        raise AssertionError(f"score_history 與逐期計算不一致 ({len(mismatches)} 項)，例如 {mismatches[:3]}")
+
+def timeseries_cases(n):
+    """n 家公司、各 TIMESERIES_PERIODS 期的時間序列：建立陣列、一次算出所有期別的評分與滾動指標。"""
+    check_score_history(min(n, TIMESERIES_CHECK_COMPANIES))
+    history = make_company_history(n, TIMESERIES_PERIODS)
+    yield 'FinancialTimeSeries.from_long_frame', lambda: FinancialTimeSeries.from_long_frame(history)
+    series = FinancialTimeSeries.from_long_frame(history)
+    yield 'FinancialTimeSeries.score_history', series.score_history
+    yield 'FinancialTimeSeries.rolling_metrics', series.rolling_metrics
+
+def report_cases(df):
+    """為每家公司產生綜合報告文字 (不含比率與評估的計算時間)；逐筆版本每次先清空報告快取。"""
+    calculators = build_calculators(df)
+    prepared = []
+    for calculator in calculators:
+        ratios = calculator.calculate_ratios()
+        prepared.append((calculator, ratios, list(calculator.assess_all(ratios).values())))
+    def uncached():
+        REPORT_CACHE.clear()
+        return [generate_overall_report_text(c, r, *results) for c, r, results in prepared]
+    yield 'generate_overall_report_text', uncached
+    batch_ratios = FinancialCalculator.calculate_ratios_batch(df)
+    batch_results = [results for _, _, results in prepared]
+    extra_values = {'accounts_payable_days': df['accounts_payable_days']}
+    yield 'generate_reports_batch', lambda: generate_reports_batch(batch_ratios, batch_results, extra_values)
+    # 整批匯出 ZIP (含評分與報告產生，單一程序)；處理速度欄即為每秒匯出的報告數
+    yield 'write_report_archive', lambda: write_report_archive([df], io.BytesIO(), workers=1)
+
+def store_cases(df, workdir):
+    """
+    SQLite 資料庫：第一次保存整批評分、數據未變動時再次評分 (只比對快照雜湊值，不寫入)，
+    以及逐一載入每家公司保存的數據、比率與評估結果。
+    """
+    path = os.path.join(workdir, 'store.db')
+    def first_save():
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        with FinancialStore(path) as store:
+            store.score_frame(df, 'company_id')
+    yield 'FinancialStore.score_frame_new', first_save
+    store = FinancialStore(path)
+    yield 'FinancialStore.score_frame_unchanged', lambda: store.score_frame(df, 'company_id')
+    companies = df['company_id'].tolist()
+    yield 'FinancialStore.load', lambda: [store.load(company) for company in companies]
+
+def web_imports():
+    """web.py 最上層匯入的模組名稱 (以 ast 解析，不執行 web.py)。"""
+    with open(WEB_APP, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            modules.append(node.module)
+    return modules
+
+def run_python(code):
+    # web.py 會開啟 SQLite 資料庫，改用記憶體中的資料庫，不在專案目錄留下檔案
+    env = dict(os.environ, **{STORE_ENV: ':memory:'})
+    result = subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit code {result.returncode}")
+
+def startup_cases():
+    """
+    冷啟動 (每次都是新的 Python 程序)：匯入 web.py 用到的所有模組，以及以 Streamlit AppTest 執行 web.py 到第一個畫面完成。
+    匯入後 LAZY_MODULES 中的模組、或第一個畫面完成後 matplotlib 已被載入時視為失敗，避免重量級套件又被放回啟動路徑。
+    """
+    imports = '\n'.join(f'import {module}' for module in web_imports())
+    yield 'import_web_modules', lambda: run_python(
+        f"import sys\n{imports}\n"
+        f"loaded = [m for m in {LAZY_MODULES!r} if m in sys.modules]\n"
+        f"sys.exit(f'web.py 啟動時載入了 {{loaded}}') if loaded else None")
+    yield 'web_first_run', lambda: run_python(
+        f"import sys\nfrom streamlit.testing.v1 import AppTest\nAppTest.from_file({WEB_APP!r}, default_timeout=60).run()\n"
+        f"sys.exit('第一個畫面載入了 matplotlib') if 'matplotlib' in sys.modules else None")
+
+def chart_cases():
+    labels = list(ANALYSIS_TITLES.values())
+    values = [39.0, 23.75, 50.0, 100.0, 72.0, 25.0]
+    yield 'bar_chart_png', lambda: bar_chart_png(labels, values, "各項分析評分")
+    # 瀏覽器繪製的 Vega-Lite 版本：伺服器只產生規格
+    yield 'bar_chart_spec', lambda: bar_chart_spec(labels, values, "各項分析評分")
+
+def ingest_cases(df, excel_max, workdir):
+    """讀取上傳檔 (與 Streamlit 介面相同的 read_uploaded_table)，以及 Parquet / Arrow IPC 檔。"""
+    table = FinancialDataTable.from_frame(df)
+    for extension in ('parquet', 'arrow'):
+        path = os.path.join(workdir, f'companies.{extension}')
+        write_table(table, path)
+        yield f'read_financial_table_{extension}', lambda path=path: read_financial_table(path)
+    df = df.drop(columns=['three_year_operating_cash_flows'], errors='ignore')
+    csv_bytes = df.to_csv(index=False).encode('utf-8')
+    yield 'read_csv', lambda: read_uploaded_table('companies.csv', csv_bytes)
+    if len(df) <= excel_max:
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False)
+        excel_bytes = buffer.getvalue()
+        yield 'read_excel', lambda: read_uploaded_table('companies.xlsx', excel_bytes)
+
+def run(args):
+    results = []
+    def record(group, name, n, func):
+        seconds, peak = measure(func, repeat_for(n) if n else 5)
+        entry = {'name': f"{name}[n={n}]" if n else name, 'group': group, 'n': n,
+                 'seconds': seconds, 'peak_bytes': peak}
+        results.append(entry)
+        rate = f"{n / seconds:>14,.0f}/s" if n and seconds > 0 else ' ' * 16
+        print(f"{entry['name']:<48} {seconds:>10.4f}s {rate} {peak / 2**20:>10.1f} MiB", flush=True)
+
+    groups = set(args.only or GROUPS)
+    if 'startup' in groups:
+        for name, func in startup_cases():
+            record('startup', name, 0, func)
+    if 'chart' in groups:
+        for name, func in chart_cases():
+            record('chart', name, 0, func)
+    for n in args.sizes:
+        df = make_companies(n)
+        if 'batch' in groups:
+            for name, func in batch_cases(df):
+                record('batch', name, n, func)
+        if 'scalar' in groups and n <= args.scalar_max:
+            for name, func in scalar_cases(df):
+                record('scalar', name, n, func)
+        if 'report' in groups and n <= args.report_max:
+            for name, func in report_cases(df):
+                record('report', name, n, func)
+        if 'ingest' in groups and n <= args.ingest_max:
+            with tempfile.TemporaryDirectory() as workdir:
+                for name, func in ingest_cases(df, args.excel_max, workdir):
+                    record('ingest', name, n, func)
+        if 'store' in groups and n <= args.store_max:
+            with tempfile.TemporaryDirectory() as workdir:
+                for name, func in store_cases(df, workdir):
+                    record('store', name, n, func)
+        del df
+        if 'timeseries' in groups and n <= args.timeseries_max:
+            for name, func in timeseries_cases(n):
+                record('timeseries', name, n, func)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment():
+    return {
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'machine': platform.machine(), 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+    }
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+def compare(results, baseline, threshold):
+    """回傳比基準慢超過 threshold 倍的項目列表 [(名稱, 基準秒數, 本次秒數)]。"""
+    previous = {entry['name']: entry['seconds'] for entry in baseline.get('results', [])}
+    regressions = []
+    print(f"\n與基準比較 ({baseline.get('timestamp', '?')}, commit {baseline.get('commit') or '?'})，門檻 {threshold:.2f}x")
+    for entry in results:
+        before = previous.get(entry['name'])
+        if before is None:
+            continue
+        ratio = entry['seconds'] / before if before > 0 else float('inf')
+        regressed = ratio > threshold and entry['seconds'] - before > MIN_REGRESSION_SECONDS
+        mark = '  <-- 退化' if regressed else ''
+        print(f"{entry['name']:<48} {before:>10.4f}s -> {entry['seconds']:>10.4f}s {ratio:>7.2f}x{mark}")
+        if regressed:
+            regressions.append((entry['name'], before, entry['seconds']))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', help="公司數量 (預設 1 1000 100000 1000000)")
+    parser.add_argument('--quick', action='store_true', help="只測 1 與 1000 家公司")
+    parser.add_argument('--only', choices=GROUPS, nargs='+', help="只執行指定的項目群組")
+    parser.add_argument('--scalar-max', type=int, default=100_000, help="逐筆 calculate_ratios / assess_* 的最大公司數")
+    parser.add_argument('--report-max', type=int, default=10_000, help="generate_overall_report_text 的最大公司數")
+    parser.add_argument('--ingest-max', type=int, default=1_000_000, help="CSV 讀取的最大公司數")
+    parser.add_argument('--excel-max', type=int, default=10_000, help="Excel 讀取的最大公司數 (寫入 xlsx 很慢)")
+    parser.add_argument('--timeseries-max', type=int, default=100_000, help=f"時間序列 (每家 {TIMESERIES_PERIODS} 期) 的最大公司數")
+    parser.add_argument('--store-max', type=int, default=10_000, help="SQLite 資料庫保存與載入的最大公司數")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="附加寫入結果的 JSON 歷史檔")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="比較用的基準 JSON 檔")
+    parser.add_argument('--save-baseline', action='store_true', help="將本次結果寫入基準檔")
+    parser.add_argument('--threshold', type=float, default=1.25, help="視為退化的耗時倍數 (預設 1.25)")
+    args = parser.parse_args(argv)
+    args.sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+
+    print(f"{'項目':<46} {'最短耗時':>10} {'處理速度':>14} {'峰值記憶體':>10}")
+    run_record = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(),
+        'environment': environment(), 'sizes': list(args.sizes), 'results': run(args),
+    }
+
+    history = load_json(args.history, [])
+    history.append(run_record)
+    write_json(args.history, history)
+    print(f"\n結果已附加至 {args.history} (共 {len(history)} 次紀錄)")
+
+    if args.save_baseline:
+        write_json(args.baseline, run_record)
+        print(f"已將本次結果存為基準: {args.baseline}")
+        return 0
+    baseline = load_json(args.baseline, None)
+    if baseline is None:
+        print("尚無基準檔，使用 --save-baseline 建立。")
+        return 0
+    regressions = compare(run_record['results'], baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} 個項目比基準慢超過 {args.threshold:.2f}x。", file=sys.stderr)
+        return 1
+    print("\n沒有項目退化。")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
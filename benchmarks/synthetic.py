@@ -0,0 +1,89 @@
+"""
+產生基準測試用的合成公司財務數據 (固定亂數種子，結果可重現)。
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from financial_analysis import FinancialData
+
+def make_companies(n, seed=0):
+    """
+    產生 n 家公司的 DataFrame，欄位對應 FinancialData.data 的鍵，另含 company_id 識別欄位。
+    數值大致落在一般上市公司的範圍 (營收約百萬至百億)，並混入少量 0 以涵蓋除以零的分支。
+    """
+    rng = np.random.default_rng(seed)
+    revenue = rng.lognormal(mean=18, sigma=1.5, size=n)
+    scale = lambda low, high: revenue * rng.uniform(low, high, n)
+    columns = {
+        'company_id': np.char.add('C', np.arange(n).astype(str)),
+        'operating_revenue': revenue,
+        'cost_of_goods_sold': scale(0.4, 0.9),
+        'operating_expenses': scale(0.05, 0.3),
+        'net_profit_after_tax': scale(-0.1, 0.25),
+        'shareholders_equity': scale(0.3, 2.0),
+        'total_assets': scale(0.8, 4.0),
+        'current_assets': scale(0.2, 1.5),
+        'current_liabilities': scale(0.1, 1.0),
+        'inventory': scale(0.0, 0.4),
+        'accounts_receivable': scale(0.02, 0.4),
+        'interest_expense': scale(0.0, 0.05),
+        'net_profit_before_tax': scale(-0.1, 0.3),
+        'operating_cash_flow': scale(-0.1, 0.35),
+        'investing_cash_flow': scale(-0.3, 0.05),
+        'financing_cash_flow': scale(-0.2, 0.2),
+        'capital_expenditures': scale(0.0, 0.25),
+        'cash_dividends_paid': scale(0.0, 0.1),
+        'non_recurring_gain_loss': scale(-0.03, 0.03),
+        'total_profit': scale(-0.1, 0.3),
+        'cash_and_equivalents': scale(0.02, 0.6),
+        'short_term_borrowing': scale(0.0, 0.5),
+        'accounts_payable_days': rng.uniform(15, 120, n),
+        'prev_year_net_profit_after_tax': scale(-0.1, 0.25),
+        'prev_year_operating_revenue': scale(0.7, 1.3),
+        'prev_year_inventory': scale(0.0, 0.4),
+        'prev_year_accounts_receivable': scale(0.02, 0.4),
+        'prev_year_inventory_turnover_rate': rng.uniform(0, 15, n),
+        'prev_year_accounts_receivable_turnover_days': rng.uniform(10, 150, n),
+        'prev_year_gross_profit_margin': rng.uniform(0.05, 0.6, n),
+        'industry_avg_roe': rng.uniform(0.0, 0.2, n),
+        'industry_avg_revenue_growth_rate': rng.uniform(-0.05, 0.15, n),
+        'cost_of_debt_interest_rate': rng.uniform(0.0, 0.08, n),
+        'prev_total_liabilities': scale(0.3, 2.5),
+        'prev_total_assets': scale(0.8, 4.0),
+        'prev_net_debt': scale(-0.5, 1.5),
+    }
+    df = pd.DataFrame(columns)
+    # 約 2% 的數值設為 0，涵蓋除以零的分支
+    numeric = [k for k in FinancialData().data if k in df.columns]
+    df[numeric] = df[numeric].mask(rng.random((n, len(numeric))) < 0.02, 0.0)
+    df['three_year_operating_cash_flows'] = list(scale(-0.1, 0.35)[:, None] * rng.uniform(0.7, 1.3, (n, 3)))
+    return df
+
+def make_company_history(n, periods, seed=0, missing=0.0):
+    """
+    產生 n 家公司、每家 periods 期的長格式 DataFrame (company_id、period + 每期申報的欄位)，
+    每期數值以前一期為基準隨機成長，可交給 FinancialTimeSeries.from_long_frame。
+    missing 為隨機刪除的 (公司, 期別) 比例，用來產生缺期的資料。
+    """
+    from timeseries import PERIOD_FIELDS
+
+    rng = np.random.default_rng(seed)
+    fields = list(PERIOD_FIELDS)
+    values = make_companies(n, seed)[fields].to_numpy()
+    frames = []
+    for period in range(periods):
+        if period:
+            values = values * rng.normal(1.03, 0.12, (n, 1)) * rng.uniform(0.9, 1.1, values.shape)
+        frame = pd.DataFrame(values, columns=fields)
+        frame.insert(0, 'company_id', np.char.add('C', np.arange(n).astype(str)))
+        frame.insert(1, 'period', 2015 + period)
+        frames.append(frame)
+    history = pd.concat(frames, ignore_index=True)
+    if missing:
+        history = history[rng.random(len(history)) >= missing].reset_index(drop=True)
+    return history
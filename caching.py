@@ -0,0 +1,88 @@
+"""
+程序內共用的快取工具。
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import numbers
+import sys
+import threading
+
+def _canonical(value):
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, numbers.Real):
+        return float(value)
+    return str(value)
+
+def canonical_hash(data):
+    """
+    dict 內容的標準化 SHA-256 (十六進位字串)，作為內容定址快取的鍵：
+    鍵依字母排序、數值一律轉為 float，所以鍵的順序、1 與 1.0、list 與 tuple 都不影響結果。
+    """
+    text = json.dumps(_canonical(data), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class LRUCache:
+    """
+    執行緒安全的 LRU 快取，同時以項目數與總大小 (bytes) 設定上限。
+    sizeof 用來估算每個值佔用的記憶體；超過 max_bytes 的單一值不會被快取。
+    """
+    def __init__(self, max_entries=128, max_bytes=None, sizeof=sys.getsizeof):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict() # key -> (value, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.current_bytes > self.max_bytes):
+                self.current_bytes -= self._entries.popitem(last=False)[1][1]
+
+    def get_or_compute(self, key, compute):
+        """取得快取值；未命中時呼叫 compute() 計算並存入 (計算時不持有鎖)。"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'bytes': self.current_bytes, 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,225 @@
+"""
+圖表繪製 (不依賴 Streamlit)：web.py 的分頁圖表與基準測試共用。
+matplotlib 匯入約需 0.5 秒，只在第一次繪圖時才匯入，不影響 web.py 的啟動時間。
+
+*_spec 函式產生相同圖表的 Vega-Lite 規格 (dict，數據內嵌於規格中)，交給瀏覽器繪製：
+伺服器只需送出標籤與數值，不需點陣化，圖表也可互動 (滑鼠提示、縮放)。
+
+中文字型由 FONT_REGISTRY 在每個程序中只解析一次，每張圖以 fontfamily 參數個別指定，
+不修改全域的 matplotlib.rcParams，多個 session 同時繪圖時互不影響。
+"""
+import io
+import math
+import os
+import threading
+
+# 指定中文字型檔路徑的環境變數；未設定時使用隨附的字型檔 (若存在)，再依序尋找系統內建的字型
+CJK_FONT_ENV = 'FINANCIAL_ANALYZER_FONT'
+BUNDLED_FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts', 'SourceHanSansTC-Regular.otf')
+CJK_FONT_FAMILIES = ('Microsoft JhengHei', 'Heiti TC', 'Apple LiGothic', 'PingFang TC', 'Noto Sans CJK TC',
+                     'Source Han Sans TC', 'Arial Unicode MS', 'SimHei', 'WenQuanYi Zen Hei')
+# 中文字型缺少的字元 (例如負號 U+2212、部分英數符號) 改用此字型
+FALLBACK_FONT_FAMILY = 'DejaVu Sans'
+
+class FontRegistry:
+    """
+    解析並記住繪圖用的字型家族列表 [中文字型, 後備字型]：依序嘗試 font_paths 中存在的字型檔，
+    再嘗試 families 中系統已安裝的字型；都找不到時只使用後備字型。
+    解析 (含匯入 matplotlib 與載入字型快取) 只在第一次呼叫 families() 時執行一次，以鎖保護。
+    """
+    def __init__(self, font_paths=None, families=CJK_FONT_FAMILIES):
+        self.font_paths = tuple(font_paths) if font_paths is not None else (os.environ.get(CJK_FONT_ENV), BUNDLED_FONT_PATH)
+        self.candidates = tuple(families)
+        self._families = None
+        self._lock = threading.Lock()
+
+    def families(self):
+        if self._families is None:
+            with self._lock:
+                if self._families is None:
+                    self._families = self._resolve()
+        return self._families
+
+    def _resolve(self):
+        from matplotlib import font_manager
+
+        families = [FALLBACK_FONT_FAMILY]
+        for path in self.font_paths:
+            if path and os.path.exists(path):
+                font_manager.fontManager.addfont(path)
+                families = [font_manager.FontProperties(fname=path).get_name(), FALLBACK_FONT_FAMILY]
+                break
+        else:
+            for family in self.candidates:
+                try:
+                    font_manager.findfont(font_manager.FontProperties(family=family), fallback_to_default=False)
+                except ValueError:
+                    continue
+                families = [family, FALLBACK_FONT_FAMILY]
+                break
+        # 預先載入字型檔，第一張圖表不需再等待
+        font_manager.get_font(font_manager.findfont(font_manager.FontProperties(family=families[0])))
+        return families
+
+    def warm_up(self):
+        """在背景執行緒中解析字型 (例如伺服器啟動時)，回傳該執行緒。"""
+        thread = threading.Thread(target=self.families, name='font-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+FONT_REGISTRY = FontRegistry()
+
+def plot_bar_chart(labels, values, title):
+    """
+    繪製一個簡單的條形圖並返回 Matplotlib Figure。
+    使用物件導向的 Figure API 而非 pyplot：圖表不會登記在 pyplot 的全域狀態中，
+    不再被引用後即可被回收，不需要 plt.close。
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
+
+    families = FONT_REGISTRY.families()
+    fig = Figure(figsize=(8, 5)) # Increased size for better readability
+    ax = fig.subplots()
+    bars = ax.bar(labels, values, color='skyblue')
+    ax.set_title(title + " - 關鍵指標", fontsize=14, fontfamily=families)
+    ax.tick_params(axis='x', rotation=45, labelsize=10)  # ✅ 正確
+    ax.tick_params(labelfontfamily=families)
+    ax.yaxis.get_major_formatter().set_scientific(False)
+    # 無限大的數值 (例如分母為 0 的覆蓋率) 畫不出長條，在基準線上標示 ∞
+    for position, value in enumerate(values):
+        label = _infinity_label(value)
+        if label:
+            ax.text(position, 0, label, ha='center', va='bottom', fontsize=12)
+
+    # 根據數值範圍調整y軸標籤格式 (只看有限的數值，與 Vega-Lite 版本相同)
+    value_format = _value_format(values)
+    if value_format == ',.0f':
+        ax.ticklabel_format(style='plain', axis='y', useOffset=False)
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x:,.0f}'))
+    elif value_format == '.0%':
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda y, _: '{:.0%}'.format(y)))
+
+    fig.tight_layout() # Adjust layout to prevent labels overlapping
+    return fig
+
+def plot_line_chart(periods, series, title):
+    """
+    繪製趨勢折線圖 (例如 TTM 營收、滾動 ROE) 並返回 Figure。
+    series 為 {圖例名稱: 與 periods 等長的數值}，NaN 的期別不畫點。
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import FuncFormatter
+
+    families = FONT_REGISTRY.families()
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    labels = [str(p) for p in periods]
+    for name, values in series.items():
+        ax.plot(labels, values, marker='o', markersize=3, label=name)
+    ax.set_title(title, fontsize=14, fontfamily=families)
+    ax.tick_params(axis='x', rotation=45, labelsize=9)
+    ax.tick_params(labelfontfamily=families)
+    if len(labels) > 12: # 期數多時只標示部分期別
+        step = -(-len(labels) // 12)
+        ax.set_xticks(range(0, len(labels), step), labels[::step])
+    values = [v for vs in series.values() for v in vs if v == v]
+    if values and max(abs(v) for v in values) > 1000:
+        ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'{x:,.0f}'))
+    ax.legend(prop={'family': families, 'size': 9})
+    ax.grid(alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+def figure_to_png(fig, dpi=200):
+    """將 Figure 輸出為 PNG bytes (與 st.pyplot 相同的 dpi 與緊密邊界)。"""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+def bar_chart_png(labels, values, title):
+    """繪製條形圖並直接輸出為 PNG bytes。"""
+    return figure_to_png(plot_bar_chart(labels, values, title))
+
+def line_chart_png(periods, series, title):
+    """繪製趨勢折線圖並直接輸出為 PNG bytes。"""
+    return figure_to_png(plot_line_chart(periods, series, title))
+
+def _json_number(value):
+    """Vega-Lite 規格中的數值：NaN 與無限大以 null 表示 (JSON 不支援)，圖表會略過該點。"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+def _infinity_label(value):
+    """正負無限大的標示文字 (∞、-∞)，其他數值為 None。"""
+    if value is None or not math.isinf(value):
+        return None
+    return "∞" if value > 0 else "-∞"
+
+def _value_format(values):
+    """
+    兩種圖表共用的 y 軸格式：大於 1000 加千分位，介於 -1 與 1 之間以百分比表示 (d3-format 字串，無特殊格式時為 None)。
+    只依有限的數值決定，NaN 與無限大不影響格式。
+    """
+    values = [v for v in values if v is not None and math.isfinite(v)]
+    if not values:
+        return None
+    if max(values) > 1000:
+        return ',.0f'
+    if -1.0 <= min(values) and max(values) <= 1.0 and not all(v == 0 for v in values):
+        return '.0%'
+    return None
+
+def bar_chart_spec(labels, values, title):
+    """
+    plot_bar_chart 的 Vega-Lite 版本 (標題、顏色、軸格式相同)。
+    無限大的數值沒有長條 (JSON 中為 null)，與 matplotlib 版本一樣在基準線上標示 ∞，滑鼠提示也顯示 ∞。
+    """
+    values = [float(v) for v in values]
+    value_axis = {'title': None}
+    value_format = _value_format(values)
+    if value_format:
+        value_axis['format'] = value_format
+    rows = [{'label': str(label), 'value': _json_number(value), 'infinity': _infinity_label(value)}
+            for label, value in zip(labels, values)]
+    tooltip = [{'field': 'label', 'title': "項目"}, {'field': 'value', 'title': "數值", 'format': value_format or ',.4~f'}]
+    return {
+        'title': title + " - 關鍵指標",
+        'data': {'values': rows},
+        'encoding': {
+            'x': {'field': 'label', 'type': 'nominal', 'sort': None, 'axis': {'title': None, 'labelAngle': -45}},
+        },
+        'layer': [
+            {
+                'mark': {'type': 'bar', 'color': 'skyblue', 'tooltip': True},
+                'encoding': {'y': {'field': 'value', 'type': 'quantitative', 'axis': value_axis}, 'tooltip': tooltip},
+            },
+            {
+                'transform': [{'filter': 'datum.infinity != null'}],
+                'mark': {'type': 'text', 'fontSize': 14, 'baseline': 'bottom', 'tooltip': True},
+                'encoding': {'y': {'datum': 0, 'type': 'quantitative'}, 'text': {'field': 'infinity'},
+                             'tooltip': [{'field': 'label', 'title': "項目"}, {'field': 'infinity', 'title': "數值"}]},
+            },
+        ],
+    }
+
+def line_chart_spec(periods, series, title):
+    """plot_line_chart 的 Vega-Lite 版本：series 為 {圖例名稱: 與 periods 等長的數值}，NaN 的期別不畫點。"""
+    labels = [str(p) for p in periods]
+    rows = [{'period': label, 'series': name, 'value': _json_number(value)}
+            for name, values in series.items() for label, value in zip(labels, values)]
+    value_axis = {'title': None, 'grid': True}
+    if any(row['value'] is not None and abs(row['value']) > 1000 for row in rows):
+        value_axis['format'] = ',.0f'
+    return {
+        'title': title,
+        'data': {'values': rows},
+        'mark': {'type': 'line', 'point': True, 'tooltip': True},
+        'encoding': {
+            'x': {'field': 'period', 'type': 'ordinal', 'sort': labels, 'axis': {'title': None, 'labelAngle': -45}},
+            'y': {'field': 'value', 'type': 'quantitative', 'axis': value_axis},
+            'color': {'field': 'series', 'type': 'nominal', 'title': None, 'sort': list(series)},
+            'tooltip': [{'field': 'period', 'title': "期別"}, {'field': 'series', 'title': "指標"},
+                        {'field': 'value', 'title': "數值", 'format': ',.4~f'}],
+        },
+    }
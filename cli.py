@@ -0,0 +1,103 @@
+"""
+無介面的批次評分命令列工具：不需啟動 Streamlit 或瀏覽器，適合以 cron 定期評分整個公司清單。
+
+輸入檔每一列為一家公司，欄位名稱對應 FinancialData.data 的鍵 (CSV / Excel / Parquet / Arrow IPC)，
+不屬於 FinancialData 的欄位 (例如公司名稱、代號) 會原樣保留在輸出最前面。
+Parquet / Arrow 輸入只讀取計算器使用的欄位與非數值的識別欄位，其他數值欄位不會載入。
+輸出為 CSV、JSONL、Parquet 或 Arrow IPC，逐批寫出 (JSONL 中的 inf 會寫成 null)。
+讀取、評分與寫出都是逐批進行，峰值記憶體只與 --chunk-size 有關，可處理比記憶體還大的 CSV (含 .csv.gz)。
+--report-zip 改為匯出 ZIP：每家公司一份綜合報告 (.txt) 加上合併的評分 CSV。
+
+用法:
+    python cli.py companies.csv -o scores.csv
+    python cli.py companies.xlsx -o scores.jsonl --report
+    python cli.py companies.parquet --format jsonl > scores.jsonl
+    python cli.py companies.arrow -o scores.parquet
+    python cli.py market_history.csv.gz -o scores.csv.gz --chunk-size 50000
+    python cli.py companies.csv -o scores.csv --workers 0   # 使用所有 CPU 核心平行評分
+    python cli.py companies.csv --report-zip reports.zip --workers 0
+"""
+import argparse
+import os
+import sys
+import time
+
+from data_io import file_format, iter_company_chunks, open_chunk_writer
+from parallel import default_workers, score_stream
+from report_export import write_report_archive
+
+DEFAULT_CHUNK_SIZE = 10000
+INPUT_FORMATS = ('.csv', '.csv.gz', '.xlsx', '.xls', '.parquet', '.arrow', '.feather')
+OUTPUT_FORMATS = ('csv', 'jsonl', 'parquet', 'arrow')
+BINARY_OUTPUT_FORMATS = ('parquet', 'arrow')
+
+def read_companies(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """逐批讀取輸入檔，每次產生至多 chunk_size 列的 DataFrame。CSV、Parquet、Arrow 以串流方式讀取。"""
+    try:
+        file_format(path)
+    except ValueError:
+        raise ValueError(f"不支援的檔案格式: {os.path.splitext(path)[1]} (支援 {', '.join(INPUT_FORMATS)})") from None
+    return iter_company_chunks(path, chunk_size)
+
+def resolve_output_format(output_path, output_format):
+    if output_format:
+        return output_format
+    if output_path and output_path != '-':
+        if output_path.lower().endswith(('.jsonl', '.jsonl.gz')):
+            return 'jsonl'
+        try:
+            kind = file_format(output_path)
+        except ValueError:
+            kind = None
+        if kind in BINARY_OUTPUT_FORMATS:
+            return kind
+    return 'csv'
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="批次評分公司財務數據 (不需啟動 Streamlit)。")
+    parser.add_argument('input', help="輸入檔路徑 (CSV / Excel / Parquet / Arrow IPC)")
+    parser.add_argument('-o', '--output', default='-', help="輸出檔路徑，預設為標準輸出 (-)；以 .gz 結尾時壓縮輸出")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, help="輸出格式，預設依輸出副檔名判斷 (預設 csv)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="每批處理的列數")
+    parser.add_argument('--report', action='store_true', help="額外輸出每家公司的綜合報告文字 (逐筆計算，較慢)")
+    parser.add_argument('--report-zip', metavar='PATH', help="改為匯出 ZIP：每家公司一份綜合報告加上合併的評分 CSV (忽略 -o 與 --format)")
+    parser.add_argument('--workers', type=int, default=1, help="平行評分的程序數，0 表示使用所有 CPU 核心 (預設 1，不平行)")
+    return parser
+
+def export_reports(input_path, archive_path, chunk_size, workers):
+    try:
+        chunks = read_companies(input_path, chunk_size)
+        with open(archive_path, 'wb') as output:
+            stats = write_report_archive(chunks, output, workers=workers)
+    except (OSError, ValueError) as e:
+        print(f"匯出失敗: {e}", file=sys.stderr)
+        return 1
+    print(f"已匯出 {stats['reports']} 份報告至 {archive_path}，耗時 {stats['seconds']:.2f} 秒 "
+          f"({stats['reports_per_second']:,.0f} 份/秒)。", file=sys.stderr)
+    return 0
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output_format = resolve_output_format(args.output, args.format)
+    workers = args.workers or default_workers()
+    started = time.perf_counter()
+    if args.report_zip:
+        return export_reports(args.input, args.report_zip, args.chunk_size, workers)
+    try:
+        chunks = read_companies(args.input, args.chunk_size)
+        writer = open_chunk_writer(args.output, output_format)
+    except (OSError, ValueError) as e:
+        print(f"評分失敗: {e}", file=sys.stderr)
+        return 2
+    try:
+        rows = score_stream(chunks, writer, workers=workers, with_report=args.report)
+    except (OSError, ValueError) as e:
+        print(f"評分失敗: {e}", file=sys.stderr)
+        return 1
+    finally:
+        writer.close()
+    print(f"已評分 {rows} 家公司，耗時 {time.perf_counter() - started:.2f} 秒。", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+財務數據檔案的讀取與輸出 (不依賴 Streamlit)。
+
+除了 CSV / Excel 之外，支援 Parquet 與 Arrow IPC (.arrow / .feather) 的讀寫：
+- 欄位裁剪：只讀取計算器使用的 FinancialData 欄位 (約 36 個)，以及非數值的識別欄位 (例如公司名稱)。
+- 記憶體映射：未壓縮的 Arrow IPC 檔以 mmap 開啟，float64 欄位直接成為 NumPy 檢視而不複製，
+  百萬列的資料集可在數毫秒內重新開啟 (read_financial_table)。
+原始數據 (FinancialDataTable 或 DataFrame) 與計算結果 (比率、分數的 DataFrame) 都可寫出成這兩種格式。
+
+超過記憶體大小的 CSV (可為 .csv.gz 等壓縮檔) 以 iter_company_chunks 逐批讀取，
+搭配 open_chunk_writer 逐批寫出結果，峰值記憶體只與每批列數有關，與檔案大小無關。
+"""
+import gzip
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from financial_analysis import HISTORY_KEY, FinancialCalculator, FinancialData, FinancialDataTable
+
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+# pd.read_csv 可直接解壓縮的副檔名 (例如 companies.csv.gz)
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.zip': 'zip', '.xz': 'xz', '.zst': 'zstd'}
+# 計算器實際讀取的欄位
+CALCULATOR_FIELDS = tuple(FinancialData().data)
+
+def file_format(file_name):
+    """
+    依副檔名回傳 'csv'、'excel'、'parquet' 或 'arrow'。壓縮的 CSV (.csv.gz 等) 也視為 'csv'，
+    沒有其他副檔名的 .gz 檔 (例如 companies.gz) 視為以 gzip 壓縮的 CSV。
+    """
+    base, extension = os.path.splitext(file_name.lower())
+    if extension in COMPRESSION_EXTENSIONS and base.endswith('.csv'):
+        return 'csv'
+    if extension == '.gz' and not os.path.splitext(base)[1]:
+        return 'csv'
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.xlsx', '.xls'):
+        return 'excel'
+    if extension in PARQUET_EXTENSIONS:
+        return 'parquet'
+    if extension in ARROW_EXTENSIONS:
+        return 'arrow'
+    raise ValueError(f"不支援的檔案格式: {extension}")
+
+def csv_compression(file_name):
+    """CSV 檔的壓縮格式 (例如 .csv.gz 為 'gzip')，未壓縮時為 None。檔案物件無法由 pandas 推斷，需由檔名決定。"""
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(file_name.lower())[1])
+
+def read_uploaded_table(file_name, raw_bytes):
+    """依副檔名解析上傳檔案的內容 (CSV (可壓縮) / Excel / Parquet / Arrow IPC)。"""
+    kind = file_format(file_name)
+    if kind == 'csv':
+        return pd.read_csv(io.BytesIO(raw_bytes), compression=csv_compression(file_name))
+    if kind == 'excel':
+        return pd.read_excel(io.BytesIO(raw_bytes))
+    return read_arrow(pa.BufferReader(raw_bytes), kind).to_pandas()
+
+def pruned_columns(schema, keep_identifiers=True):
+    """
+    欄位裁剪：schema 中屬於 CALCULATOR_FIELDS 的欄位，加上 (keep_identifiers 時) 非數值的識別欄位。
+    其他數值欄位 (例如已計算過的比率或分數) 不會被讀取。
+    """
+    columns = []
+    for field in schema:
+        is_identifier = not (pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+                             or pa.types.is_decimal(field.type) or pa.types.is_boolean(field.type))
+        if field.name in CALCULATOR_FIELDS or (keep_identifiers and is_identifier and not field.name.startswith('__')):
+            columns.append(field.name)
+    return columns
+
+def read_schema(source, kind=None):
+    kind = kind or file_format(source)
+    if kind == 'parquet':
+        return pq.read_schema(source)
+    with _open_ipc(source) as reader:
+        return reader.schema
+
+def _open_ipc(source, memory_map=True):
+    if isinstance(source, str):
+        source = pa.memory_map(source) if memory_map else pa.OSFile(source)
+    return ipc.open_file(source)
+
+def read_arrow(source, kind=None, columns=None, memory_map=True):
+    """
+    讀取 Parquet 或 Arrow IPC 為 pyarrow.Table，只讀取 columns 中的欄位 (None 表示全部)。
+    source 為檔案路徑或 pyarrow 的 buffer / file 物件。Arrow IPC 檔以 mmap 開啟時不複製資料。
+    """
+    kind = kind or file_format(source)
+    if kind == 'parquet':
+        return pq.read_table(source, columns=columns, memory_map=memory_map)
+    reader = _open_ipc(source, memory_map)
+    table = reader.read_all()
+    return table if columns is None else table.select(columns)
+
+def read_companies_frame(source, keep_identifiers=True, memory_map=True):
+    """以欄位裁剪讀取 Parquet / Arrow IPC 為 DataFrame (計算器欄位 + 識別欄位)。"""
+    kind = file_format(source)
+    columns = pruned_columns(read_schema(source, kind), keep_identifiers)
+    return read_arrow(source, kind, columns, memory_map).to_pandas()
+
+def iter_companies_frames(source, chunk_size, keep_identifiers=True):
+    """以欄位裁剪逐批讀取 Parquet / Arrow IPC，每次產生至多 chunk_size 列的 DataFrame。"""
+    kind = file_format(source)
+    if kind == 'parquet':
+        parquet_file = pq.ParquetFile(source, memory_map=True)
+        columns = pruned_columns(parquet_file.schema_arrow, keep_identifiers)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    table = read_arrow(source, kind)
+    table = table.select(pruned_columns(table.schema, keep_identifiers))
+    for batch in table.to_batches(max_chunksize=chunk_size):
+        yield batch.to_pandas()
+
+def iter_csv_chunks(source, chunk_size, compression='infer'):
+    """逐批讀取 CSV (路徑或檔案物件)，每次產生至多 chunk_size 列的 DataFrame，讀完即關閉檔案。"""
+    with pd.read_csv(source, chunksize=chunk_size, compression=compression) as reader:
+        yield from reader
+
+def iter_company_chunks(source, chunk_size, file_name=None):
+    """
+    依格式逐批讀取公司數據。CSV、Parquet、Arrow 以串流方式讀取，記憶體用量只與 chunk_size 有關；
+    Excel 無法串流，會先整份讀入再切批。source 為檔案物件時需以 file_name 指定格式。
+    """
+    file_name = file_name or source
+    kind = file_format(file_name)
+    if kind == 'csv':
+        yield from iter_csv_chunks(source, chunk_size, csv_compression(file_name))
+    elif kind in ('parquet', 'arrow'):
+        yield from iter_companies_frames(source, chunk_size)
+    else:
+        df = pd.read_excel(source)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+def _column_to_numpy(column):
+    """Arrow 數值欄位轉為 float64 陣列：單一 chunk 且無 null 的 float64 欄位不複製 (唯讀)。"""
+    if pa.types.is_floating(column.type) or pa.types.is_integer(column.type) or pa.types.is_boolean(column.type):
+        column = column.cast(pa.float64()) if column.type != pa.float64() else column
+        if column.num_chunks == 1 and column.null_count == 0:
+            return column.chunk(0).to_numpy(zero_copy_only=True)
+        return column.to_numpy() # null 轉為 NaN，與 pandas 讀入數值欄位時相同
+    # 非數值欄位 (例如以文字儲存的數字) 沿用 batch_column 的逐筆轉換規則
+    return FinancialCalculator.batch_column(pd.DataFrame({'value': column.to_pandas()}), 'value')
+
+def _history_to_block(column, default_width=3):
+    """Arrow 的 list<double> 欄位轉為 (列數, 最長年數) 的 NaN 補齊區塊與每列年數。"""
+    if not (pa.types.is_list(column.type) or pa.types.is_large_list(column.type) or pa.types.is_fixed_size_list(column.type)):
+        frame = pd.DataFrame({HISTORY_KEY: column.to_pandas()})
+        flows, lengths = FinancialCalculator.batch_cash_flow_history(frame)
+        return flows, lengths.astype(np.int16)
+    array = column.combine_chunks()
+    # null 列表與 _to_float_list(None) 相同，視為預設的三年 0
+    array = array.fill_null(pa.scalar([0.0] * default_width, array.type)) if array.null_count else array
+    if pa.types.is_fixed_size_list(array.type):
+        width = array.type.list_size
+        values = array.flatten().cast(pa.float64()).to_numpy(zero_copy_only=False)
+        return values.reshape(len(array), width), np.full(len(array), width, dtype=np.int16)
+    offsets = array.offsets.to_numpy()
+    lengths = np.diff(offsets)
+    values = array.flatten().cast(pa.float64()).to_numpy(zero_copy_only=False)
+    width = int(lengths.max()) if len(lengths) else default_width
+    if len(lengths) and (lengths == width).all():
+        return values.reshape(len(array), width), lengths.astype(np.int16)
+    block = np.full((len(array), width), np.nan)
+    rows = np.repeat(np.arange(len(array)), lengths)
+    block[rows, np.arange(len(values)) - np.repeat(offsets[:-1] - offsets[0], lengths)] = values
+    return block, lengths.astype(np.int16)
+
+def arrow_to_financial_table(table, copy=False):
+    """pyarrow.Table 轉為 FinancialDataTable；copy=False 時盡量直接引用 Arrow 的記憶體 (唯讀)。"""
+    columns = {}
+    for name in FinancialDataTable.FIELDS:
+        if name in table.column_names:
+            values = _column_to_numpy(table.column(name))
+            columns[name] = values.copy() if copy else values
+    if HISTORY_KEY in table.column_names:
+        history, lengths = _history_to_block(table.column(HISTORY_KEY))
+    else:
+        history, lengths = np.zeros((table.num_rows, 3)), np.full(table.num_rows, 3, dtype=np.int16)
+    if copy:
+        history = history.copy()
+    return FinancialDataTable.from_arrays(columns, history, lengths)
+
+def read_financial_table(source, memory_map=True, copy=False):
+    """
+    讀取 Parquet / Arrow IPC 中計算器使用的欄位為 FinancialDataTable。
+    Arrow IPC + memory_map 時，無 null 的 float64 欄位直接映射檔案內容 (唯讀，需要修改請傳入 copy=True)。
+    """
+    kind = file_format(source)
+    columns = pruned_columns(read_schema(source, kind), keep_identifiers=False)
+    return arrow_to_financial_table(read_arrow(source, kind, columns, memory_map), copy=copy)
+
+def financial_table_to_arrow(table):
+    """FinancialDataTable 轉為 pyarrow.Table，多年度現金流存成 list<double> 欄位。"""
+    arrays = {name: pa.array(table[name], type=pa.float64()) for name in table.FIELDS}
+    width = table.history.shape[1]
+    lengths = table.history_lengths.astype(np.int64)
+    if (lengths == width).all():
+        # 每家公司年數相同時存成固定長度列表，讀回時可直接 reshape
+        values = pa.array(table.history.ravel(), type=pa.float64())
+        arrays[HISTORY_KEY] = pa.FixedSizeListArray.from_arrays(values, width)
+    else:
+        mask = np.arange(width)[None, :] < lengths[:, None]
+        offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32)
+        arrays[HISTORY_KEY] = pa.ListArray.from_arrays(pa.array(offsets), pa.array(table.history[mask], type=pa.float64()))
+    return pa.table(arrays)
+
+def frame_to_arrow(df):
+    """DataFrame (原始數據或比率、分數等計算結果) 轉為 pyarrow.Table，不保留 RangeIndex。"""
+    return pa.Table.from_pandas(df, preserve_index=not isinstance(df.index, pd.RangeIndex))
+
+def write_table(data, path, compression=None):
+    """
+    將 DataFrame 或 FinancialDataTable 寫成 Parquet 或 Arrow IPC (依副檔名)。
+    Arrow IPC 預設不壓縮，才能以記憶體映射零複製讀回；Parquet 預設使用 snappy 壓縮。
+    """
+    table = financial_table_to_arrow(data) if isinstance(data, FinancialDataTable) else frame_to_arrow(data)
+    kind = file_format(path)
+    if kind == 'parquet':
+        pq.write_table(table, path, compression=compression or 'snappy')
+    elif kind == 'arrow':
+        options = ipc.IpcWriteOptions(compression=compression)
+        with ipc.new_file(path, table.schema, options=options) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"write_table 只支援 Parquet 與 Arrow IPC: {path}")
+
+def frame_to_parquet_bytes(df):
+    """將 DataFrame 輸出為 Parquet bytes (供下載按鈕使用)。"""
+    buffer = io.BytesIO()
+    pq.write_table(frame_to_arrow(df), buffer, compression='snappy')
+    return buffer.getvalue()
+
+class TextChunkWriter:
+    """逐批附加寫入 CSV (只在第一批寫出標題列) 或 JSONL (inf 寫成 null)。"""
+    def __init__(self, out, kind, owns_stream=False):
+        self.out = out
+        self.kind = kind
+        self.rows = 0
+        self._owns_stream = owns_stream
+
+    def write(self, df):
+        if self.kind == 'csv':
+            df.to_csv(self.out, header=self.rows == 0, index=False)
+        else:
+            # 預設只保留 10 位小數，比率與分數會被截斷；15 為 pandas 允許的最大精度
+            df.to_json(self.out, orient='records', lines=True, force_ascii=False, double_precision=15)
+        self.out.flush()
+        self.rows += len(df)
+
+    def close(self):
+        if self._owns_stream:
+            self.out.close()
+
+# 逐批寫出時固定為 float64 的欄位：計算器欄位、比率與分數
+NUMERIC_OUTPUT_COLUMNS = (frozenset(CALCULATOR_FIELDS) - {HISTORY_KEY}) | frozenset(FinancialCalculator.RATIO_KEYS) \
+    | frozenset(FinancialCalculator.ANALYSIS_KEYS)
+
+def chunk_schema(columns):
+    """
+    逐批寫出的 schema，只由欄位名稱決定：計算器、比率與分數欄位為 float64，多年度現金流為 list<double>，
+    其他 (識別) 欄位一律為字串。若依第一批推斷，第一批全為空值的文字欄位會成為 float64，之後的批次就無法寫入。
+    """
+    fields = []
+    for name in columns:
+        if name == HISTORY_KEY:
+            fields.append(pa.field(name, pa.list_(pa.float64())))
+        elif name in NUMERIC_OUTPUT_COLUMNS:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+class ArrowChunkWriter:
+    """
+    逐批附加寫入 Parquet 或 Arrow IPC 檔 (路徑或二進位檔案物件)。
+    schema 由第一批的欄位名稱以 chunk_schema 決定，每批的識別欄位都先轉為字串。
+    寫入失敗時關閉並刪除 (路徑的) 輸出檔，不留下只有部分批次的檔案。
+    """
+    def __init__(self, path, kind):
+        self.path = path
+        self.kind = kind
+        self.schema = None
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        try:
+            if self._writer is None:
+                self.schema = chunk_schema(df.columns)
+                if self.kind == 'parquet':
+                    self._writer = pq.ParquetWriter(self.path, self.schema, compression='snappy')
+                else:
+                    self._writer = ipc.new_file(self.path, self.schema)
+            identifiers = [field.name for field in self.schema if pa.types.is_string(field.type)]
+            df = df.astype({name: 'string' for name in identifiers if name in df.columns})
+            self._writer.write_table(pa.Table.from_pandas(df, schema=self.schema, preserve_index=False))
+        except Exception:
+            self.discard()
+            raise
+        self.rows += len(df)
+
+    def discard(self):
+        """關閉並刪除輸出檔 (path 為檔案物件時只關閉 writer)。"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if isinstance(self.path, str) and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def open_chunk_writer(target, kind):
+    """
+    建立逐批寫出的 writer (具 write(df) 與 close())。target 為 '-' (標準輸出)、檔案路徑或已開啟的檔案物件；
+    路徑以 .gz 結尾時以 gzip 壓縮寫出 CSV / JSONL。
+    """
+    if kind in ('parquet', 'arrow'):
+        if target == '-':
+            raise ValueError(f"{kind} 輸出需要指定檔案路徑")
+        return ArrowChunkWriter(target, kind)
+    if target == '-':
+        return TextChunkWriter(sys.stdout, kind)
+    if not isinstance(target, str):
+        return TextChunkWriter(target, kind)
+    if target.lower().endswith('.gz'):
+        # 壓縮等級 6 (zlib 預設)：比 gzip 模組預設的 9 快數倍，檔案大小相差不多
+        stream = gzip.open(target, 'wt', compresslevel=6, encoding='utf-8', newline='')
+        return TextChunkWriter(stream, kind, owns_stream=True)
+    return TextChunkWriter(open(target, 'w', encoding='utf-8', newline=''), kind, owns_stream=True)
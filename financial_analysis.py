@@ -0,0 +1,1409 @@
+"""
+財務分析核心：財務數據、比率計算與六項評估、綜合報告文字。
+不依賴 Streamlit，供 web.py 的介面與 cli.py 的批次評分共用。
+"""
+from collections.abc import MutableMapping
+import warnings
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache
+
+# --- 財務數據儲存類別 (No changes needed) ---
+class FinancialData:
+    def __init__(self):
+        # 初始化所有財務數據，提供預設值
+        self.data = {
+            'operating_revenue': 0.0,
+            'cost_of_goods_sold': 0.0,
+            'operating_expenses': 0.0,
+            'net_profit_after_tax': 0.0,
+            'shareholders_equity': 0.0,
+            'total_assets': 0.0,
+            'current_assets': 0.0,
+            'current_liabilities': 0.0,
+            'inventory': 0.0,
+            'accounts_receivable': 0.0,
+            'interest_expense': 0.0,
+            'net_profit_before_tax': 0.0,
+            'operating_cash_flow': 0.0,
+            'investing_cash_flow': 0.0,
+            'financing_cash_flow': 0.0,
+            'capital_expenditures': 0.0,
+            'cash_dividends_paid': 0.0,
+            'non_recurring_gain_loss': 0.0,
+            'total_profit': 0.0, # 通常指稅前利潤或淨利潤，用於非經常性損益佔比
+            'cash_and_equivalents': 0.0,
+            'short_term_borrowing': 0.0,
+            'accounts_payable_days': 0.0, # 假設已知或手動輸入
+            'prev_year_net_profit_after_tax': 0.0,
+            'prev_year_operating_revenue': 0.0,
+            'prev_year_inventory': 0.0, # 去年存貨
+            'prev_year_accounts_receivable': 0.0, # 去年應收帳款
+            'prev_year_inventory_turnover_rate': 0.0,
+            'prev_year_accounts_receivable_turnover_days': 0.0,
+            'prev_year_gross_profit_margin': 0.0, # 去年毛利率
+            'industry_avg_roe': 0.0,
+            'industry_avg_revenue_growth_rate': 0.0,
+            'cost_of_debt_interest_rate': 0.0, # 負債利率，例如 0.03 代表 3%
+            'prev_total_liabilities': 0.0,
+            'prev_total_assets': 0.0,
+            'prev_net_debt': 0.0,
+            'three_year_operating_cash_flows': [0.0, 0.0, 0.0] # 近三年營業現金流
+        }
+
+    def update_data(self, key, value):
+        if key in self.data:
+            self.data[key] = value
+        else:
+            warnings.warn(f"Warning: Key '{key}' not found in financial data.")
+
+    def get_data(self, key):
+        return self.data.get(key, 0.0)
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        由一筆記錄 (dict 或 pandas Series，鍵對應 data 的鍵) 建立 FinancialData，
+        缺少或格式錯誤的欄位使用預設值。
+        """
+        financial_data = cls()
+        for key, default in financial_data.data.items():
+            if key in record:
+                if isinstance(default, list):
+                    financial_data.data[key] = _to_float_list(record[key], default)
+                else:
+                    financial_data.data[key] = _to_float(record[key], default)
+        return financial_data
+
+def _to_float(value, default=0.0):
+    """Convert a raw input value to float, falling back to default on blanks or bad values."""
+    if value is None or (isinstance(value, str) and value.strip() == ''):
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+    except TypeError: # For cases where value might be a list but float is expected
+        return default
+
+def _safe_divide(numerator, denominator, fill=0.0):
+    """
+    向量化的 `a / b if b != 0 else fill`。
+    分母為 0 的位置填入 fill，其餘位置 (包含 NaN) 與純量除法結果相同。
+    """
+    numerator = np.asarray(numerator, dtype=float)
+    denominator = np.asarray(denominator, dtype=float)
+    out = np.full(np.broadcast(numerator, denominator).shape, fill, dtype=float)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+def _to_float_list(value, default=None):
+    """Convert a multi-year input (list, comma separated string or single number) to a list of floats."""
+    if default is None:
+        default = [0.0, 0.0, 0.0]
+    if value is None or (isinstance(value, float) and value != value):
+        return list(default)
+    try:
+        if isinstance(value, str):
+            return [float(x.strip()) for x in value.split(',') if x.strip()]
+        if isinstance(value, (list, tuple, np.ndarray)):
+            return [float(x) for x in value]
+        return [float(value)]
+    except (ValueError, TypeError):
+        return list(default)
+
+# --- 多家公司的欄式財務數據 ---
+HISTORY_KEY = 'three_year_operating_cash_flows'
+
+class FinancialDataTable:
+    """
+    多家公司的欄式 (columnar) 財務數據：每個純量欄位一個 float64 陣列，
+    多年度現金流存成 (公司數, 年數) 的固定寬度區塊，不足的年度以 NaN 補齊，實際年數另存於 history_lengths。
+    100 萬家公司約佔 300 MB，而 100 萬個 FinancialData (每個約 36 個 Python float 的 dict) 需要數 GB。
+
+    row(i) 回傳與 FinancialData 相容的單筆檢視 (get_data / update_data 直接讀寫陣列)，
+    可直接交給 FinancialCalculator；calculate_ratios_batch、score_batch、score_companies 也接受整個 table。
+    """
+    FIELDS = tuple(key for key, value in FinancialData().data.items() if not isinstance(value, list))
+
+    def __init__(self, n=0, history_width=3, index=None):
+        self._columns = {key: np.zeros(n) for key in self.FIELDS}
+        self.history = np.zeros((n, history_width))
+        self.history_lengths = np.full(n, history_width, dtype=np.int16)
+        self.index = pd.RangeIndex(n) if index is None else pd.Index(index)
+        if len(self.index) != n:
+            raise ValueError("index length must match the number of companies")
+
+    @classmethod
+    def from_arrays(cls, columns, history, history_lengths, index=None):
+        """
+        直接以既有陣列建立 (不複製)，例如由記憶體映射的 Arrow 檔案取得的唯讀陣列。
+        columns 中缺少的欄位以 0 填滿。
+        """
+        n = len(history)
+        table = cls(0, history.shape[1])
+        table.index = pd.RangeIndex(n) if index is None else pd.Index(index)
+        table._columns = {key: columns[key] if key in columns else np.zeros(n) for key in cls.FIELDS}
+        table.history = history
+        table.history_lengths = history_lengths
+        if any(len(c) != n for c in table._columns.values()) or len(history_lengths) != n or len(table.index) != n:
+            raise ValueError("all columns must have the same length")
+        return table
+
+    @classmethod
+    def from_frame(cls, df, history_width=None):
+        """由 DataFrame (每列一家公司) 建立，欄位轉換規則與 FinancialCalculator.batch_column 相同。"""
+        flows, lengths = FinancialCalculator.batch_cash_flow_history(df)
+        history = np.full((len(df), max(flows.shape[1], history_width or 0)), np.nan)
+        history[:, :flows.shape[1]] = flows
+        columns = {key: np.array(FinancialCalculator.batch_column(df, key), dtype=float) for key in cls.FIELDS}
+        return cls.from_arrays(columns, history, lengths.astype(np.int16), df.index)
+
+    @classmethod
+    def from_records(cls, records, history_width=None):
+        """由多筆記錄 (dict 或 FinancialData) 建立。"""
+        records = [r.data if isinstance(r, FinancialData) else r for r in records]
+        return cls.from_frame(pd.DataFrame.from_records(records), history_width)
+
+    @property
+    def columns(self):
+        return self.FIELDS + (HISTORY_KEY,)
+
+    @property
+    def nbytes(self):
+        """陣列實際佔用的位元組數。"""
+        return sum(c.nbytes for c in self._columns.values()) + self.history.nbytes + self.history_lengths.nbytes
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key):
+        return key in self._columns or key == HISTORY_KEY
+
+    def __getitem__(self, key):
+        """純量欄位回傳 float64 陣列，多年度現金流回傳二維區塊 (皆為檢視，修改會寫回 table)。"""
+        if key == HISTORY_KEY:
+            return self.history
+        return self._columns[key]
+
+    def column(self, key, default=0.0):
+        """與 batch_column 相同的介面：欄位不存在時回傳整欄預設值。"""
+        if key in self._columns:
+            return self._columns[key]
+        return np.full(len(self), default, dtype=float)
+
+    def row(self, position):
+        """第 position 家公司 (依位置) 的 FinancialData 相容檢視。"""
+        if not -len(self) <= position < len(self):
+            raise IndexError(f"company position {position} out of range")
+        return FinancialDataRow(self, position % len(self))
+
+    def get_value(self, position, key):
+        if key == HISTORY_KEY:
+            return self.history[position, :self.history_lengths[position]].tolist()
+        return float(self._columns[key][position])
+
+    def set_value(self, position, key, value):
+        """寫入單一欄位。純量欄位必須可轉為 float，多年度現金流超過目前寬度時自動加寬區塊。"""
+        if key != HISTORY_KEY:
+            self._columns[key][position] = float(value)
+            return
+        values = _to_float_list(value)
+        if len(values) > self.history.shape[1]:
+            widened = np.full((len(self), len(values)), np.nan)
+            widened[:, :self.history.shape[1]] = self.history
+            self.history = widened
+        self.history[position, :len(values)] = values
+        self.history[position, len(values):] = np.nan
+        self.history_lengths[position] = len(values)
+
+    def to_frame(self):
+        """轉回 DataFrame (多年度現金流為 list 欄位)，例如用於輸出或 score_companies 以外的 pandas 操作。"""
+        df = pd.DataFrame(self._columns, index=self.index)
+        df[HISTORY_KEY] = [self.get_value(i, HISTORY_KEY) for i in range(len(self))]
+        return df
+
+class _RowMapping(MutableMapping):
+    """FinancialDataTable 中單一公司的 dict 介面，讀寫直接對應到底層陣列。"""
+    def __init__(self, table, position):
+        self._table = table
+        self._position = position
+
+    def __getitem__(self, key):
+        if key not in self._table:
+            raise KeyError(key)
+        return self._table.get_value(self._position, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._table:
+            raise KeyError(key)
+        self._table.set_value(self._position, key, value)
+
+    def __delitem__(self, key):
+        raise TypeError("FinancialDataTable 的欄位固定，無法刪除")
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self):
+        return len(self._table.columns)
+
+class FinancialDataRow(FinancialData):
+    """FinancialDataTable 中單一公司的檢視，get_data / update_data 與 FinancialData 相同。"""
+    def __init__(self, table, position):
+        self.table = table
+        self.position = position
+        self.data = _RowMapping(table, position)
+
+# --- 評分級距表 ---
+class ScoreLadder:
+    """
+    以資料宣告的評分級距 (取代 if/elif 門檻階梯)。
+
+    edges 為由低到高的 (運算子, 門檻值)：'>=' 表示門檻值本身歸入較高的區間，'>' 表示歸入較低的區間。
+    points 為各區間的分數，長度為 len(edges) + 1；nan_points 為數值無法比較 (NaN) 時的分數，
+    也就是原本 if/elif 最後的 else 分支。
+
+    relative 為 None 時門檻為固定值；為 'offset' 時門檻為 base + 門檻值，
+    為 'scale' 時門檻為 base * 門檻值 (門檻值 0 不隨 base 縮放)。
+    """
+    def __init__(self, edges, points, nan_points, relative=None):
+        if len(points) != len(edges) + 1:
+            raise ValueError("points must have exactly one more entry than edges")
+        self.thresholds = tuple(float(t) for _, t in edges)
+        self.inclusive = tuple(op == '>=' for op, _ in edges)
+        self.points = tuple(points)
+        self.nan_points = nan_points
+        self.relative = relative
+        self._thresholds = np.array(self.thresholds, dtype=float)
+        self._inclusive = np.array(self.inclusive, dtype=bool)
+        self._points = np.array(self.points, dtype=float)
+
+    def _resolve(self, thresholds, base):
+        if self.relative == 'offset':
+            return base + thresholds
+        if self.relative == 'scale':
+            with np.errstate(invalid='ignore', over='ignore'):
+                return np.where(thresholds == 0, 0.0, base * thresholds)
+        return thresholds
+
+    def score(self, value, base=None):
+        """單一數值的分數。"""
+        if self.relative is None:
+            thresholds = self.thresholds
+        else:
+            thresholds = self._resolve(self._thresholds, base).tolist()
+        if value != value or any(t != t for t in thresholds):
+            return self.nan_points
+        index = sum(1 for t, inclusive in zip(thresholds, self.inclusive) if (value >= t if inclusive else value > t))
+        return self.points[index]
+
+    def score_array(self, values, base=None):
+        """向量化版本：以區間查表一次算出整個陣列的分數。"""
+        values = np.asarray(values, dtype=float)
+        if self.relative is None:
+            # searchsorted(side='right') 會把剛好等於門檻值的數值放到較高區間，'>' 的門檻需退回一格
+            index = np.searchsorted(self._thresholds, values, side='right')
+            previous = np.maximum(index - 1, 0)
+            on_edge = (index > 0) & (self._thresholds[previous] == values) & ~self._inclusive[previous]
+            index = index - on_edge
+            invalid = np.isnan(values)
+        else:
+            thresholds = self._resolve(self._thresholds[None, :], np.asarray(base, dtype=float)[:, None])
+            passed = np.where(self._inclusive, values[:, None] >= thresholds, values[:, None] > thresholds)
+            index = passed.sum(axis=1)
+            invalid = np.isnan(values) | np.isnan(thresholds).any(axis=1)
+        return np.where(invalid, self.nan_points, self._points[index])
+
+# 各分析項目的評分級距 (根據文件中的分數區間)
+SCORE_LADDERS = {
+    'profit_quality': {
+        # 1. 獲利含金量 (30%)
+        'profit_cash_content': ScoreLadder(
+            [('>=', 0.0), ('>=', 0.35), ('>=', 0.5), ('>=', 0.7), ('>=', 0.8), ('>=', 1.0)],
+            [3, 6, 9, 16.5, 21, 24, 30], nan_points=3),
+        # 2. 應收帳款周轉天數 (30%)，區間之間的空隙 (例如 20~21 天) 與 else 同分
+        'ar_turnover_days': ScoreLadder(
+            [('>', 20), ('>=', 21), ('>', 45), ('>=', 46), ('>', 90), ('>=', 91), ('>', 140)],
+            [30, 3, 24, 3, 18, 3, 12, 3], nan_points=3),
+        # 3. 非經常性損益佔比 <= 10% (15%)
+        'non_recurring_profit_ratio': ScoreLadder([('>', 0.10)], [15, 7.5], nan_points=7.5),
+        # 4. 淨利成長率 (25%)
+        'net_profit_growth_rate': ScoreLadder(
+            [('>=', 0.0), ('>=', 0.30), ('>=', 0.70)], [10, 15, 20, 25], nan_points=10),
+    },
+    'cash_flow': {
+        # 1. 營業活動現金流 (30%)
+        'operating_cash_flow': ScoreLadder(
+            [('>=', 0), ('>=', 500000), ('>=', 2000000), ('>', 5000000)], [0, 7.5, 12, 21, 30], nan_points=0),
+        # 2. 自由現金流 (25%)
+        'free_cash_flow': ScoreLadder(
+            [('>=', -500000), ('>=', 500000), ('>=', 1000000), ('>', 3000000)], [0, 6.25, 10, 17.5, 25], nan_points=0),
+        # 3. 營業現金流 > 淨利 (20%)
+        'op_cf_vs_net_profit': ScoreLadder(
+            [('>=', 0.3), ('>=', 0.7), ('>=', 1.0), ('>=', 1.5)], [0, 5, 8, 14, 20], nan_points=0),
+        # 4. 投資現金流為負且佔營業現金流比例不大於 50% (15%)
+        'investing_cf_ratio_to_op_cf': ScoreLadder([('>=', -0.5), ('>=', 0.0)], [7.5, 15, 0], nan_points=0),
+        # 5. 融資現金流和營運現金流的比例 (10%)
+        'financing_cf_ratio_to_op_cf': ScoreLadder(
+            [('>=', -1.0), ('>=', -0.3), ('>', 0.3), ('>', 1.0)], [3, 7, 10, 8, 4], nan_points=3),
+    },
+    'liquidity': {
+        # 1. 現金及約當現金 > 短期借款 (25%)
+        'cash_to_short_debt_ratio': ScoreLadder(
+            [('>=', 0.5), ('>=', 1.0), ('>=', 2.0)], [0, 8.3, 16.7, 25], nan_points=0),
+        # 3. 流動比率 > 2 (15%)
+        'current_ratio': ScoreLadder(
+            [('>=', 1.0), ('>=', 1.5), ('>=', 2.0), ('>=', 2.5), ('>', 3.0)], [0, 3, 6, 9, 12, 15], nan_points=0),
+        # 5. 營業現金流能覆蓋利息支出 (10%)
+        'op_cf_to_interest_coverage': ScoreLadder(
+            [('>=', 0.2), ('>=', 0.5), ('>=', 1.0), ('>=', 3.0), ('>', 5.0)], [0, 2, 4, 6, 8, 10], nan_points=0),
+        # 6. 速動比率 > 1 (10%)
+        'quick_ratio': ScoreLadder(
+            [('>=', 0.7), ('>=', 1.0), ('>=', 1.2), ('>=', 1.5), ('>', 2.0)], [0, 2, 4, 6, 8, 10], nan_points=0),
+    },
+    'debt_solvency': {
+        # 1. 利息保障倍數 (25%)
+        'interest_coverage_ratio': ScoreLadder(
+            [('>=', 1.0), ('>=', 3.0), ('>', 5.0)], [0, 10, 20, 25], nan_points=0),
+        # 4. 負債比率 (20%)
+        'debt_ratio': ScoreLadder(
+            [('>=', 0.30), ('>=', 0.50), ('>=', 0.70), ('>=', 0.90)], [20, 15, 10, 5, 0], nan_points=0),
+        # 5. 財務費用佔營收比例 (15%)
+        'financial_expense_to_revenue_ratio': ScoreLadder(
+            [('>=', 0.01), ('>=', 0.03), ('>=', 0.05)], [15, 10, 5, 0], nan_points=0),
+    },
+    'op_efficiency': {
+        # 1. 存貨周轉率變化 (25%)
+        'inv_turnover_rate_change_pct': ScoreLadder(
+            [('>=', -0.10), ('>=', 0.0), ('>', 0.10)], [0, 10, 20, 25], nan_points=0),
+        # 2. 應收帳款周轉天數變化 (20%)
+        'ar_days_change_pct': ScoreLadder(
+            [('>=', -0.10), ('>', 0.05), ('>', 0.20)], [20, 15, 5, 0], nan_points=0),
+        # 3. 營收與存貨成長同步性 (20%)，門檻相對於營收成長率
+        'inventory_growth_rate': ScoreLadder(
+            [('>', 0.0), ('>', 0.05), ('>', 0.15)], [20, 10, 5, 0], nan_points=0, relative='offset'),
+        # 4. 毛利率穩定性 (15%)
+        'gross_margin_change_abs': ScoreLadder(
+            [('>', 0.03), ('>', 0.05), ('>', 0.10)], [15, 10, 5, 0], nan_points=0),
+        # 5. 營收成長 vs. 同業 (10%)
+        'revenue_growth_gap': ScoreLadder(
+            [('>=', -0.05), ('>=', -0.02), ('>', 0.02)], [0, 3, 7, 10], nan_points=0),
+        # 7. 營收與應收帳款成長同步 (5%)，門檻相對於營收成長率
+        'ar_growth_rate': ScoreLadder([('>', 0.0), ('>', 0.05)], [5, 3, 0], nan_points=0, relative='offset'),
+    },
+    'inv_expansion': {
+        # 1. 自由現金流狀態 (10分)，營收為正時門檻為營收的比例
+        'free_cash_flow_to_revenue': ScoreLadder(
+            [('>', 0.0), ('>', 0.1), ('>', 0.3)], [2, 5, 8, 10], nan_points=2, relative='scale'),
+        'free_cash_flow_sign': ScoreLadder([('>', 0.0)], [2, 5], nan_points=2),
+        # 2. 資本支出/營業現金流比例 (10分)
+        'capex_to_ocf_ratio': ScoreLadder(
+            [('>', 0.2), ('>', 0.5), ('>', 0.8)], [2, 5, 8, 10], nan_points=2),
+        # 3. ROE 超過同業幅度 (10分)
+        'roe_diff_from_industry': ScoreLadder(
+            [('>=', -0.02), ('>', 0.02), ('>', 0.05)], [2, 5, 8, 10], nan_points=2),
+        # 4. 淨負債變動 (10分)
+        'net_debt_change_pct': ScoreLadder(
+            [('>=', -0.05), ('>', 0.05), ('>', 0.15)], [10, 8, 5, 2], nan_points=2),
+        # 5. 負債比率變化 (10分)
+        'debt_ratio_change_pct': ScoreLadder(
+            [('>=', -0.05), ('>', 0.05), ('>', 0.15)], [10, 8, 5, 2], nan_points=2),
+    },
+}
+
+# --- 財務計算與評估類別 ---
+class FinancialCalculator:
+    # calculate_ratios 產生的比率欄位 (批次模式輸出的欄位順序)
+    RATIO_KEYS = (
+        'gross_profit_margin', 'operating_profit_margin', 'net_profit_margin',
+        'roe', 'roa', 'net_profit_growth_rate', 'revenue_growth_rate', 'profit_cash_content',
+        'current_ratio', 'quick_ratio', 'interest_coverage_ratio',
+        'inventory_turnover_rate', 'inventory_turnover_days',
+        'accounts_receivable_turnover_rate', 'accounts_receivable_turnover_days',
+        'free_cash_flow', 'financing_to_operating_cash_flow_ratio',
+        'debt_ratio', 'financial_expense_to_revenue_ratio', 'net_debt',
+    )
+    # 六項評估在 st.session_state.results 中的鍵 (批次評分輸出的欄位順序)
+    ANALYSIS_KEYS = ('profit_quality', 'cash_flow', 'liquidity', 'debt_solvency', 'op_efficiency', 'inv_expansion')
+    # 各評估鍵對應的 assess_* 方法
+    ANALYSIS_METHODS = {
+        'profit_quality': 'assess_profit_quality', 'cash_flow': 'assess_cash_flow',
+        'liquidity': 'assess_liquidity_risk', 'debt_solvency': 'assess_debt_solvency',
+        'op_efficiency': 'assess_operational_efficiency', 'inv_expansion': 'assess_investment_expansion',
+    }
+
+    def __init__(self, financial_data):
+        self.financial_data = financial_data
+
+    def get_value(self, key, default=0.0):
+        """Helper to safely get data values, converting to float."""
+        return _to_float(self.financial_data.get_data(key), default)
+
+    @staticmethod
+    def batch_column(df, key, default=0.0):
+        """
+        以與 get_value 相同的規則，將 DataFrame 的一個欄位轉為 float64 陣列。
+        欄位不存在時整欄使用預設值。
+        """
+        if isinstance(df, FinancialDataTable):
+            return df.column(key, default)
+        if key not in df.columns:
+            return np.full(len(df), default, dtype=float)
+        column = df[key]
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in 'biuf':
+            return column.to_numpy(dtype=float)
+        return np.fromiter((_to_float(v, default) for v in column), dtype=float, count=len(column))
+
+    @classmethod
+    def calculate_ratios_batch(cls, df):
+        """
+        批次版本的 calculate_ratios：df 每一列為一家公司，欄位名稱對應 FinancialData.data 的鍵。
+        以 NumPy 陣列運算一次算出所有比率，回傳以 RATIO_KEYS 為欄位、索引與 df 相同的 DataFrame。
+        結果與逐筆呼叫 calculate_ratios 完全一致 (包含 float('inf') 的哨兵值)。
+        """
+        col = lambda key: cls.batch_column(df, key)
+
+        operating_revenue = col('operating_revenue')
+        cost_of_goods_sold = col('cost_of_goods_sold')
+        operating_expenses = col('operating_expenses')
+        net_profit_after_tax = col('net_profit_after_tax')
+        shareholders_equity = col('shareholders_equity')
+        total_assets = col('total_assets')
+        net_profit_before_tax = col('net_profit_before_tax')
+        interest_expense = col('interest_expense')
+        operating_cash_flow = col('operating_cash_flow')
+        capital_expenditures = col('capital_expenditures')
+        financing_cash_flow = col('financing_cash_flow')
+        current_assets = col('current_assets')
+        current_liabilities = col('current_liabilities')
+        inventory = col('inventory')
+        accounts_receivable = col('accounts_receivable')
+        cash_and_equivalents = col('cash_and_equivalents')
+        prev_year_net_profit_after_tax = col('prev_year_net_profit_after_tax')
+        prev_year_operating_revenue = col('prev_year_operating_revenue')
+        prev_year_inventory = col('prev_year_inventory')
+        prev_year_accounts_receivable = col('prev_year_accounts_receivable')
+
+        ratios = {}
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            total_liabilities = total_assets - shareholders_equity # 總負債 = 總資產 - 股東權益
+
+            # 獲利能力比率
+            ratios['gross_profit_margin'] = _safe_divide(operating_revenue - cost_of_goods_sold, operating_revenue)
+            ratios['operating_profit_margin'] = _safe_divide(operating_revenue - cost_of_goods_sold - operating_expenses, operating_revenue)
+            ratios['net_profit_margin'] = _safe_divide(net_profit_after_tax, operating_revenue)
+            ratios['roe'] = _safe_divide(net_profit_after_tax, shareholders_equity)
+            ratios['roa'] = _safe_divide(net_profit_after_tax, total_assets)
+            ratios['net_profit_growth_rate'] = _safe_divide(net_profit_after_tax - prev_year_net_profit_after_tax, prev_year_net_profit_after_tax)
+            ratios['revenue_growth_rate'] = _safe_divide(operating_revenue - prev_year_operating_revenue, prev_year_operating_revenue)
+            ratios['profit_cash_content'] = _safe_divide(operating_cash_flow, net_profit_after_tax)
+
+            # 償債能力比率
+            ratios['current_ratio'] = _safe_divide(current_assets, current_liabilities)
+            ratios['quick_ratio'] = _safe_divide(current_assets - inventory, current_liabilities)
+            ebit = net_profit_before_tax + interest_expense
+            ratios['interest_coverage_ratio'] = _safe_divide(ebit, interest_expense, fill=float('inf'))
+
+            # 營運效率比率
+            avg_inventory = np.where(prev_year_inventory != 0, (inventory + prev_year_inventory) / 2, inventory)
+            ratios['inventory_turnover_rate'] = _safe_divide(cost_of_goods_sold, avg_inventory)
+            ratios['inventory_turnover_days'] = _safe_divide(365, ratios['inventory_turnover_rate'], fill=float('inf'))
+
+            avg_accounts_receivable = np.where(prev_year_accounts_receivable != 0, (accounts_receivable + prev_year_accounts_receivable) / 2, accounts_receivable)
+            ratios['accounts_receivable_turnover_rate'] = _safe_divide(operating_revenue, avg_accounts_receivable)
+            ratios['accounts_receivable_turnover_days'] = _safe_divide(365, ratios['accounts_receivable_turnover_rate'], fill=float('inf'))
+
+            # 現金流量相關比率
+            ratios['free_cash_flow'] = operating_cash_flow - capital_expenditures
+            ratios['financing_to_operating_cash_flow_ratio'] = _safe_divide(financing_cash_flow, operating_cash_flow)
+
+            # 負債比率
+            ratios['debt_ratio'] = _safe_divide(total_liabilities, total_assets)
+
+            # 財務費用佔營收比例
+            ratios['financial_expense_to_revenue_ratio'] = _safe_divide(interest_expense, operating_revenue)
+
+            # 淨負債
+            ratios['net_debt'] = total_liabilities - cash_and_equivalents
+
+        return pd.DataFrame(ratios, index=df.index, columns=list(cls.RATIO_KEYS))
+
+    def calculate_ratios(self):
+        data = self.financial_data.data
+        ratios = {}
+
+        # 獲取所有必要的原始數據
+        operating_revenue = self.get_value('operating_revenue')
+        cost_of_goods_sold = self.get_value('cost_of_goods_sold')
+        operating_expenses = self.get_value('operating_expenses')
+        net_profit_after_tax = self.get_value('net_profit_after_tax')
+        shareholders_equity = self.get_value('shareholders_equity')
+        total_assets = self.get_value('total_assets')
+        net_profit_before_tax = self.get_value('net_profit_before_tax')
+        interest_expense = self.get_value('interest_expense')
+        operating_cash_flow = self.get_value('operating_cash_flow')
+        capital_expenditures = self.get_value('capital_expenditures')
+        financing_cash_flow = self.get_value('financing_cash_flow')
+        current_assets = self.get_value('current_assets')
+        current_liabilities = self.get_value('current_liabilities')
+        inventory = self.get_value('inventory')
+        accounts_receivable = self.get_value('accounts_receivable')
+        cash_and_equivalents = self.get_value('cash_and_equivalents')
+        short_term_borrowing = self.get_value('short_term_borrowing')
+        prev_year_net_profit_after_tax = self.get_value('prev_year_net_profit_after_tax')
+        prev_year_operating_revenue = self.get_value('prev_year_operating_revenue')
+        prev_year_inventory = self.get_value('prev_year_inventory')
+        prev_year_accounts_receivable = self.get_value('prev_year_accounts_receivable')
+        total_liabilities = self.get_value('total_assets') - self.get_value('shareholders_equity') # 總負債 = 總資產 - 股東權益
+        prev_total_liabilities = self.get_value('prev_total_liabilities')
+        prev_total_assets = self.get_value('prev_total_assets')
+
+
+        # 獲利能力比率
+        ratios['gross_profit_margin'] = (operating_revenue - cost_of_goods_sold) / operating_revenue if operating_revenue != 0 else 0.0
+        ratios['operating_profit_margin'] = (operating_revenue - cost_of_goods_sold - operating_expenses) / operating_revenue if operating_revenue != 0 else 0.0
+        ratios['net_profit_margin'] = net_profit_after_tax / operating_revenue if operating_revenue != 0 else 0.0
+        ratios['roe'] = net_profit_after_tax / shareholders_equity if shareholders_equity != 0 else 0.0
+        ratios['roa'] = net_profit_after_tax / total_assets if total_assets != 0 else 0.0
+        ratios['net_profit_growth_rate'] = (net_profit_after_tax - prev_year_net_profit_after_tax) / prev_year_net_profit_after_tax if prev_year_net_profit_after_tax != 0 else 0.0
+        ratios['revenue_growth_rate'] = (operating_revenue - prev_year_operating_revenue) / prev_year_operating_revenue if prev_year_operating_revenue != 0 else 0.0
+        ratios['profit_cash_content'] = operating_cash_flow / net_profit_after_tax if net_profit_after_tax != 0 else 0.0
+
+        # 償債能力比率
+        ratios['current_ratio'] = current_assets / current_liabilities if current_liabilities != 0 else 0.0
+        ratios['quick_ratio'] = (current_assets - inventory) / current_liabilities if current_liabilities != 0 else 0.0
+        ebit = net_profit_before_tax + interest_expense
+        ratios['interest_coverage_ratio'] = ebit / interest_expense if interest_expense != 0 else float('inf')
+
+        # 營運效率比率
+        avg_inventory = (inventory + prev_year_inventory) / 2 if prev_year_inventory != 0 else inventory
+        ratios['inventory_turnover_rate'] = cost_of_goods_sold / avg_inventory if avg_inventory != 0 else 0.0
+        ratios['inventory_turnover_days'] = 365 / ratios['inventory_turnover_rate'] if ratios['inventory_turnover_rate'] != 0 else float('inf')
+
+        avg_accounts_receivable = (accounts_receivable + prev_year_accounts_receivable) / 2 if prev_year_accounts_receivable != 0 else accounts_receivable
+        ratios['accounts_receivable_turnover_rate'] = operating_revenue / avg_accounts_receivable if avg_accounts_receivable != 0 else 0.0
+        ratios['accounts_receivable_turnover_days'] = 365 / ratios['accounts_receivable_turnover_rate'] if ratios['accounts_receivable_turnover_rate'] != 0 else float('inf')
+
+        # 現金流量相關比率
+        ratios['free_cash_flow'] = operating_cash_flow - capital_expenditures
+        ratios['financing_to_operating_cash_flow_ratio'] = financing_cash_flow / operating_cash_flow if operating_cash_flow != 0 else 0.0
+
+        # 負債比率
+        ratios['debt_ratio'] = total_liabilities / total_assets if total_assets != 0 else 0.0
+
+        # 財務費用佔營收比例
+        ratios['financial_expense_to_revenue_ratio'] = interest_expense / operating_revenue if operating_revenue != 0 else 0.0
+
+        # 淨負債
+        ratios['net_debt'] = total_liabilities - cash_and_equivalents
+
+        return ratios
+
+    def assess_all(self, ratios):
+        """依 ANALYSIS_KEYS 的順序執行六項評估，回傳與 st.session_state.results 相同結構的 dict。"""
+        return {key: getattr(self, self.ANALYSIS_METHODS[key])(ratios) for key in self.ANALYSIS_KEYS}
+
+    def assess_profit_quality(self, ratios):
+        data = self.financial_data.data
+        score = 0
+        conclusion_list = [] # 使用列表來儲存多個結論
+        details = {}
+
+        # 獲取所需數據
+        profit_cash_content = ratios.get('profit_cash_content', 0.0)
+        ar_turnover_days = ratios.get('accounts_receivable_turnover_days', float('inf'))
+        non_recurring_gain_loss = self.get_value('non_recurring_gain_loss')
+        total_profit_for_non_recurring = self.get_value('total_profit') # 假設這個是計算非經常性損益佔比的基準利潤
+        net_profit_growth_rate = ratios.get('net_profit_growth_rate', 0.0)
+
+        # 計算非經常性損益佔比
+        non_recurring_profit_ratio = abs(non_recurring_gain_loss) / total_profit_for_non_recurring if total_profit_for_non_recurring != 0 else 0.0
+
+        # --- 是/否判斷 ---
+        is_profit_cash_content_high = profit_cash_content >= 1.0 # 獲利含金量 >= 100%
+        is_ar_days_short = ar_turnover_days <= 45 # 應收帳款周轉天數 <= 45天
+        is_non_recurring_low = non_recurring_profit_ratio <= 0.10 # 非經常性損益佔比 <= 10%
+        is_net_profit_growing = net_profit_growth_rate > 0 # 淨利成長率 > 0%
+
+        details['獲利含金量 >= 100%?'] = "是" if is_profit_cash_content_high else "否"
+        details['應收帳款周轉天數 <= 45天?'] = "是" if is_ar_days_short else "否"
+        details['非經常性損益佔比 <= 10%?'] = "是" if is_non_recurring_low else "否"
+        details['淨利成長率 > 0%?'] = "是" if is_net_profit_growing else "否"
+
+        # --- 評分邏輯 (級距定義於 SCORE_LADDERS) ---
+        ladders = SCORE_LADDERS['profit_quality']
+        score += ladders['profit_cash_content'].score(profit_cash_content) # 1. 獲利含金量 (30%)
+        score += ladders['ar_turnover_days'].score(ar_turnover_days) # 2. 應收帳款周轉天數 (30%)
+        score += ladders['non_recurring_profit_ratio'].score(non_recurring_profit_ratio) # 3. 非經常性損益佔比 <= 10% (15%)
+        score += ladders['net_profit_growth_rate'].score(net_profit_growth_rate) # 4. 淨利成長率 (25%)
+
+        # --- 結論 (根據是/否判斷組合) ---
+        if is_profit_cash_content_high and is_ar_days_short and is_non_recurring_low and is_net_profit_growing:
+            conclusion_list.append("獲利品質極佳。公司盈利能力強勁且穩定，現金流健康，應收帳款管理高效。")
+        elif is_profit_cash_content_high and is_ar_days_short and is_non_recurring_low and not is_net_profit_growing:
+            conclusion_list.append("獲利品質良好但成長動能不足。盈利質量高，但淨利潤未能持續增長，需關注市場變化。")
+        elif not is_profit_cash_content_high and is_ar_days_short and is_non_recurring_low and is_net_profit_growing:
+            conclusion_list.append("獲利品質有待提升。淨利潤增長強勁且應收帳款管理良好，但獲利含金量不足，需警惕利潤虛增。")
+        elif not is_ar_days_short and is_non_recurring_low:
+            conclusion_list.append("獲利品質存在疑慮，應收帳款回款慢是主要問題，可能影響現金流。")
+        elif not is_non_recurring_low:
+            conclusion_list.append("獲利品質不穩定，非經常性損益佔比較高，可能掩蓋核心業務的真實表現。")
+        else:
+            conclusion_list.append("獲利品質綜合判斷，需根據具體數據進一步分析。")
+
+        return {
+            'score': min(score, 100),
+            'conclusion': " ".join(conclusion_list),
+            'details': details
+        }
+
+    def assess_cash_flow(self, ratios):
+        data = self.financial_data.data
+        score = 0
+        conclusion_list = []
+        details = {}
+
+        # 獲取所需數據
+        operating_cash_flow = self.get_value('operating_cash_flow')
+        free_cash_flow = ratios.get('free_cash_flow', 0.0)
+        net_profit_after_tax = self.get_value('net_profit_after_tax')
+        investing_cash_flow = self.get_value('investing_cash_flow')
+        financing_cash_flow = self.get_value('financing_cash_flow')
+        capital_expenditures = self.get_value('capital_expenditures')
+        three_year_operating_cash_flows = data.get('three_year_operating_cash_flows', [0.0, 0.0, 0.0]) # 確保是列表
+
+        # 計算指標
+        op_cf_vs_net_profit = operating_cash_flow / net_profit_after_tax if net_profit_after_tax != 0 else 0.0
+        investing_cf_ratio_to_op_cf = investing_cash_flow / operating_cash_flow if operating_cash_flow != 0 else 0.0
+        financing_cf_ratio_to_op_cf = financing_cash_flow / operating_cash_flow if operating_cash_flow != 0 else 0.0
+
+        # --- 是/否判斷 ---
+        is_op_cf_positive = operating_cash_flow > 0
+        is_fcf_positive = free_cash_flow > 0
+        is_op_cf_gt_net_profit = op_cf_vs_net_profit > 1.0 # 營業現金流 > 淨利
+        is_investing_cf_negative = investing_cash_flow < 0 # 投資現金流為負 (通常表示投資擴張)
+        is_financing_cf_negative = financing_cash_flow < 0 # 融資現金流為負 (通常表示還債或回購股票)
+
+        details['營業現金流為正?'] = "是" if is_op_cf_positive else "否"
+        details['自由現金流為正?'] = "是" if is_fcf_positive else "否"
+        details['營業現金流 > 淨利?'] = "是" if is_op_cf_gt_net_profit else "否"
+        details['投資現金流為負?'] = "是" if is_investing_cf_negative else "否"
+        details['融資現金流為負?'] = "是" if is_financing_cf_negative else "否"
+
+        # --- 評分邏輯 (級距定義於 SCORE_LADDERS) ---
+        ladders = SCORE_LADDERS['cash_flow']
+        score += ladders['operating_cash_flow'].score(operating_cash_flow) # 1. 營業活動現金流 (30%)
+        score += ladders['free_cash_flow'].score(free_cash_flow) # 2. 自由現金流 (25%)
+        score += ladders['op_cf_vs_net_profit'].score(op_cf_vs_net_profit) # 3. 營業現金流 > 淨利 (20%)
+        # 4. 投資現金流為負 (15%) - 這裡文件描述較模糊，假設是投資現金流佔營業現金流的比例，且為負數
+        # 如果投資現金流是負的，且佔營業現金流的比例在合理範圍內，表示公司有在投資
+        score += ladders['investing_cf_ratio_to_op_cf'].score(investing_cf_ratio_to_op_cf)
+        score += ladders['financing_cf_ratio_to_op_cf'].score(financing_cf_ratio_to_op_cf) # 5. 融資現金流和營運現金流的比例 (10%)
+
+
+        # --- 結論 (根據是/否判斷組合) ---
+        # 邏輯架構（現金流量問題）
+        if is_op_cf_positive and is_fcf_positive and is_op_cf_gt_net_profit and is_investing_cf_negative and is_financing_cf_negative:
+            conclusion_list.append("公司有現金、投資、及有還債能力。現金流狀況極佳，各項指標表現優異，財務健康。")
+        elif is_op_cf_positive and (not is_op_cf_gt_net_profit) and is_investing_cf_negative and (not is_financing_cf_negative) and (not is_fcf_positive):
+            conclusion_list.append("大量進行投資中，期望未來會有回報。此為投資燒錢階段，需關注未來回報情況。")
+        elif (not is_op_cf_positive) and (not is_op_cf_gt_net_profit) and is_investing_cf_negative and (not is_financing_cf_negative) and (not is_fcf_positive):
+            conclusion_list.append("現金流入為負、投資燒錢，風險高。公司現金流狀況非常不佳，需警惕資金斷裂風險。")
+        elif is_op_cf_positive and is_op_cf_gt_net_profit and (not is_investing_cf_negative) and is_financing_cf_negative and is_fcf_positive:
+            conclusion_list.append("有穩定收入了，不再缺錢或借貸，可以開始賺錢了。公司現金流穩健，具備自我造血能力。")
+        elif not is_op_cf_positive:
+            conclusion_list.append("營業現金流為負，即使其他指標尚可，也可能隱藏獲利品質問題。")
+        elif is_op_cf_positive and not is_fcf_positive:
+            conclusion_list.append("營業現金流為正但自由現金流為負，現金在投資或營運上消耗較大，需警惕資金壓力。")
+        elif is_op_cf_positive and is_fcf_positive and not is_op_cf_gt_net_profit:
+            conclusion_list.append("營業現金流為正且自由現金流為正，但未顯著大於淨利，獲利含金量有待提高。")
+        elif is_op_cf_positive and is_fcf_positive and is_op_cf_gt_net_profit and not is_investing_cf_negative:
+            conclusion_list.append("多數指標良好，但投資現金流不是負值，可能表示投資活動不夠積極或沒有大量資本支出。")
+        elif is_op_cf_positive and is_fcf_positive and is_op_cf_gt_net_profit and is_investing_cf_negative and not is_financing_cf_negative:
+            conclusion_list.append("營運與投資現金流表現良好，但融資現金流不是負值，可能意味公司仍在依賴外部融資或有償還外部借款壓力。")
+        else:
+            conclusion_list.append("現金流狀況綜合判斷，需根據具體數據進一步分析。")
+
+        return {
+            'score': min(score, 100),
+            'conclusion': " ".join(conclusion_list),
+            'details': details
+        }
+
+    def assess_liquidity_risk(self, ratios):
+        data = self.financial_data.data
+        score = 0
+        conclusion_list = []
+        details = {}
+
+        # 獲取所需數據
+        current_ratio = ratios.get('current_ratio', 0.0)
+        quick_ratio = ratios.get('quick_ratio', 0.0)
+        operating_cash_flow = self.get_value('operating_cash_flow')
+        cash_and_equivalents = self.get_value('cash_and_equivalents')
+        short_term_borrowing = self.get_value('short_term_borrowing')
+        interest_expense = self.get_value('interest_expense')
+        prev_inventory_turnover_rate = self.get_value('prev_year_inventory_turnover_rate')
+        inventory_turnover_rate = ratios.get('inventory_turnover_rate', 0.0)
+        three_year_operating_cash_flows = data.get('three_year_operating_cash_flows', [0.0, 0.0, 0.0])
+
+        # 計算指標
+        cash_to_short_debt_ratio = cash_and_equivalents / short_term_borrowing if short_term_borrowing != 0 else float('inf')
+        op_cf_to_interest_coverage = operating_cash_flow / interest_expense if interest_expense != 0 else float('inf')
+
+        # 存貨周轉天數變化判斷
+        current_inv_days = 365 / inventory_turnover_rate if inventory_turnover_rate != 0 else float('inf')
+        prev_inv_days = 365 / prev_inventory_turnover_rate if prev_inventory_turnover_rate != 0 else float('inf')
+
+        is_inventory_days_stable_or_down = False
+        if prev_inv_days == float('inf') and current_inv_days == float('inf'):
+            is_inventory_days_stable_or_down = True # 都無限大，視為穩定
+        elif prev_inv_days == float('inf'): # 去年無限大，今年有值，視為改善
+            is_inventory_days_stable_or_down = True
+        elif current_inv_days <= prev_inv_days:
+            is_inventory_days_stable_or_down = True
+
+
+        # --- 是/否判斷 ---
+        is_current_ratio_ok = current_ratio > 2.0
+        is_quick_ratio_ok = quick_ratio > 1.0
+        is_op_cf_positive = operating_cash_flow > 0
+        is_cash_gt_short_debt = cash_to_short_debt_ratio >= 1.0
+        is_op_cf_covers_interest = op_cf_to_interest_coverage > 1.0
+
+        details['流動比率 > 2?'] = "是" if is_current_ratio_ok else "否"
+        details['速動比率 > 1?'] = "是" if is_quick_ratio_ok else "否"
+        details['營業現金流為正?'] = "是" if is_op_cf_positive else "否"
+        details['存貨周轉天數穩定或下降?'] = "是" if is_inventory_days_stable_or_down else "否"
+        details['現金及約當現金 > 短期借款?'] = "是" if is_cash_gt_short_debt else "否"
+        details['營業現金流能覆蓋利息支出?'] = "是" if is_op_cf_covers_interest else "否"
+
+        # --- 評分邏輯 (級距定義於 SCORE_LADDERS) ---
+        ladders = SCORE_LADDERS['liquidity']
+        # 1. 現金及約當現金 > 短期借款 (25%)
+        score += ladders['cash_to_short_debt_ratio'].score(cash_to_short_debt_ratio)
+
+        # 2. 營業現金流為正 (25%)
+        positive_op_cf_count = sum(1 for cf in three_year_operating_cash_flows if cf > 0)
+        is_op_cf_growing = all(three_year_operating_cash_flows[i] <= three_year_operating_cash_flows[i+1] for i in range(len(three_year_operating_cash_flows)-1)) if len(three_year_operating_cash_flows) > 1 else False
+
+        if positive_op_cf_count == 3 and is_op_cf_growing: score += 25
+        elif positive_op_cf_count == 3: score += 20 # 80% of 25
+        elif is_op_cf_positive: score += 15 # 60% of 25 (最近一年為正)
+        elif positive_op_cf_count == 2: score += 10 # 40% of 25
+        elif positive_op_cf_count == 1: score += 5 # 20% of 25
+        else: score += 0
+
+        # 3. 流動比率 > 2 (15%)
+        score += ladders['current_ratio'].score(current_ratio)
+
+        # 4. 存貨周轉天數穩定或下降 (15%)
+        if is_inventory_days_stable_or_down: score += 15
+        else: score += 0
+
+        # 5. 營業現金流能覆蓋利息支出 (10%)
+        score += ladders['op_cf_to_interest_coverage'].score(op_cf_to_interest_coverage)
+
+        # 6. 速動比率 > 1 (10%)
+        score += ladders['quick_ratio'].score(quick_ratio)
+
+        # --- 結論 (根據是/否判斷組合) ---
+        # 邏輯架構（流動性風險評估）
+        if is_current_ratio_ok and is_quick_ratio_ok and is_op_cf_positive and is_inventory_days_stable_or_down and is_cash_gt_short_debt and is_op_cf_covers_interest:
+            conclusion_list.append("公司短期流動性充足，無立即償債風險，現金管理穩健。財務狀況非常健康。")
+        elif is_current_ratio_ok and not is_quick_ratio_ok:
+            conclusion_list.append("流動性可能依賴存貨變現，需檢查存貨周轉率是否惡化。應警惕存貨積壓風險。")
+        elif (not is_current_ratio_ok) and (not is_quick_ratio_ok) and is_op_cf_positive:
+            conclusion_list.append("靠著本業現金流維持，但營運一出現問題便陷入資金困境。短期償債能力有疑慮，風險較高。")
+        elif is_current_ratio_ok and is_quick_ratio_ok and (not is_op_cf_positive):
+            conclusion_list.append("償債比率尚可，但現金流異常偏弱，需提防盈餘品質不佳導致短期資金風險。利潤可能未轉化為現金。")
+        elif is_inventory_days_stable_or_down and (not is_current_ratio_ok or not is_quick_ratio_ok or not is_op_cf_positive or not is_cash_gt_short_debt or not is_op_cf_covers_interest):
+            conclusion_list.append("有一定營運效率，但財務結構失衡、現金流不足，風險高。存貨管理良好，但整體流動性仍需改善。")
+        elif not is_op_cf_positive:
+            conclusion_list.append("即使流動比率達標，營運活動未產生現金，可能隱藏獲利品質問題。營業現金流為負是嚴重警訊。")
+        else:
+            conclusion_list.append("流動性風險綜合判斷，需根據具體數據進一步分析。")
+
+        return {
+            'score': min(score, 100),
+            'conclusion': " ".join(conclusion_list),
+            'details': details
+        }
+
+    def assess_debt_solvency(self, ratios):
+        data = self.financial_data.data
+        score = 0
+        conclusion_list = []
+        details = {}
+
+        # 獲取所需數據
+        interest_coverage_ratio = ratios.get('interest_coverage_ratio', 0.0)
+        roa = ratios.get('roa', 0.0)
+        cost_of_debt_interest_rate = self.get_value('cost_of_debt_interest_rate')
+        free_cash_flow = ratios.get('free_cash_flow', 0.0)
+        cash_dividends_paid = self.get_value('cash_dividends_paid')
+        debt_ratio = ratios.get('debt_ratio', 0.0)
+        financial_expense_to_revenue_ratio = ratios.get('financial_expense_to_revenue_ratio', 0.0)
+        prev_total_liabilities = self.get_value('prev_total_liabilities')
+        prev_total_assets = self.get_value('prev_total_assets')
+        prev_debt_ratio = prev_total_liabilities / prev_total_assets if prev_total_assets != 0 else 0.0
+
+        # --- 是/否判斷 ---
+        is_interest_coverage_good = interest_coverage_ratio > 3.0
+        is_roa_higher_than_debt_rate = roa > cost_of_debt_interest_rate if cost_of_debt_interest_rate != 0 else True # 如果沒有負債利率，預設為好
+        is_fcf_sufficient_for_dividend = (free_cash_flow >= cash_dividends_paid and cash_dividends_paid > 0) or (cash_dividends_paid == 0 and free_cash_flow >= 0) # FCF足以支付股利，或無股利且FCF為正
+        is_debt_ratio_high = debt_ratio > 0.50 # 負債比率 > 50%
+        is_financial_expense_high = financial_expense_to_revenue_ratio > 0.05 # 財務費用佔營收比例 > 5%
+        is_debt_ratio_increased = debt_ratio > prev_debt_ratio and prev_debt_ratio != 0 # 負債比率較去年上升
+
+        details['利息保障倍數 > 3?'] = "是" if is_interest_coverage_good else "否"
+        details['ROA > 負債利率?'] = "是" if is_roa_higher_than_debt_rate else "否"
+        details['自由現金流足以支付股利?'] = "是" if is_fcf_sufficient_for_dividend else "否"
+        details['負債比率 > 50%?'] = "是" if is_debt_ratio_high else "否"
+        details['財務費用佔營收比例 > 5%?'] = "是" if is_financial_expense_high else "否"
+        details['負債比率較去年上升?'] = "是" if is_debt_ratio_increased else "否"
+
+        # --- 評分邏輯 (級距定義於 SCORE_LADDERS) ---
+        ladders = SCORE_LADDERS['debt_solvency']
+        # 1. 利息保障倍數 (25%)
+        score += ladders['interest_coverage_ratio'].score(interest_coverage_ratio)
+
+        # 2. ROA 高於負債利率 (20%)
+        if is_roa_higher_than_debt_rate: score += 20
+        else: score += 0
+
+        # 3. 自由現金流足以支付股利 (20%)
+        if is_fcf_sufficient_for_dividend: score += 20
+        else: score += 0
+
+        # 4. 負債比率 (20%)
+        score += ladders['debt_ratio'].score(debt_ratio)
+
+        # 5. 財務費用佔營收比例 (15%)
+        score += ladders['financial_expense_to_revenue_ratio'].score(financial_expense_to_revenue_ratio)
+
+        # --- 結論 (根據是/否判斷組合) ---
+        # 邏輯架構（負債與償債能力）
+        if is_interest_coverage_good and (not is_debt_ratio_high): # 利息保障倍數「是」且負債比率不高
+            conclusion_list.append("負債少、賺錢亦夠還債，用錢有效率。公司財務結構穩健，償債能力強勁。")
+        elif is_interest_coverage_good and is_debt_ratio_high:
+            conclusion_list.append("雖負債高，但當前獲利足以支撐利息，需關注未來利率變動風險。公司槓桿運用較高，但償債能力暫無問題。")
+        elif is_debt_ratio_high and (not is_fcf_sufficient_for_dividend):
+            conclusion_list.append("高負債下現金生成不足，可能需借新還舊，財務風險升高。公司資金壓力較大，償債能力堪憂。")
+        elif (not is_interest_coverage_good) and (not is_roa_higher_than_debt_rate) and (not is_fcf_sufficient_for_dividend) and (not is_debt_ratio_high) and (not is_financial_expense_high):
+            conclusion_list.append("低負債且償債能力強，但可能過度保守，錯失槓桿獲利機會。公司財務狀況穩健，但成長潛力可能受限。")
+        elif not is_interest_coverage_good:
+            conclusion_list.append("利息保障倍數不足，償債壓力大。負債與償還能力不佳。")
+        elif is_interest_coverage_good and not is_roa_higher_than_debt_rate:
+            conclusion_list.append("雖然利息有保障，但資產報酬率低於負債利率，借款成本高於資產效益。負債與償還能力不佳。")
+        elif is_interest_coverage_good and is_roa_higher_than_debt_rate and not is_fcf_sufficient_for_dividend:
+            conclusion_list.append("有能力賺錢且資產效益高於負債成本，但自由現金流不足以支付股利，資金周轉可能緊張。負債與償還能力不佳。")
+        elif is_interest_coverage_good and is_roa_higher_than_debt_rate and is_fcf_sufficient_for_dividend and is_debt_ratio_high:
+            conclusion_list.append("多數指標良好，但負債比率仍高於50%，存在較高槓桿風險。負債與償還能力不佳。")
+        elif is_interest_coverage_good and is_roa_higher_than_debt_rate and is_fcf_sufficient_for_dividend and (not is_debt_ratio_high) and is_financial_expense_high:
+            conclusion_list.append("償債能力強且負債比率不高，但財務費用佔營收比例過高，顯示財務槓桿使用效率不佳。負債與償還能力不佳。")
+        else:
+            conclusion_list.append("負債與償債能力綜合判斷，需根據具體數據進一步分析。")
+
+        return {
+            'score': min(score, 100),
+            'conclusion': " ".join(conclusion_list),
+            'details': details
+        }
+
+    def assess_operational_efficiency(self, ratios):
+        data = self.financial_data.data
+        score = 0
+        conclusion_list = []
+        details = {}
+
+        # 獲取所需數據
+        inventory_turnover_rate = ratios.get('inventory_turnover_rate', 0.0)
+        prev_inventory_turnover_rate = self.get_value('prev_year_inventory_turnover_rate')
+        accounts_receivable_turnover_days = ratios.get('accounts_receivable_turnover_days', float('inf'))
+        prev_accounts_receivable_turnover_days = self.get_value('prev_year_accounts_receivable_turnover_days')
+        gross_profit_margin = ratios.get('gross_profit_margin', 0.0)
+        prev_gross_profit_margin = self.get_value('prev_year_gross_profit_margin')
+        operating_revenue = self.get_value('operating_revenue')
+        prev_year_operating_revenue = self.get_value('prev_year_operating_revenue')
+        industry_avg_revenue_growth_rate = self.get_value('industry_avg_revenue_growth_rate')
+        accounts_payable_days = self.get_value('accounts_payable_days')
+        # 假設有去年的應付帳款天數，如果沒有則用當前值
+        prev_accounts_payable_days = data.get('prev_year_accounts_payable_days', accounts_payable_days)
+        inventory = self.get_value('inventory')
+        prev_year_inventory = self.get_value('prev_year_inventory')
+        accounts_receivable = self.get_value('accounts_receivable')
+        prev_year_accounts_receivable = self.get_value('prev_year_accounts_receivable')
+
+
+        # 計算指標變化
+        inv_turnover_rate_change_pct = (inventory_turnover_rate - prev_inventory_turnover_rate) / prev_inventory_turnover_rate if prev_inventory_turnover_rate != 0 else 0.0
+        ar_days_change_pct = (accounts_receivable_turnover_days - prev_accounts_receivable_turnover_days) / prev_accounts_receivable_turnover_days if prev_accounts_receivable_turnover_days != 0 else 0.0
+        gross_margin_change_abs = abs(gross_profit_margin - prev_gross_profit_margin)
+        revenue_growth_rate = (operating_revenue - prev_year_operating_revenue) / prev_year_operating_revenue if prev_year_operating_revenue != 0 else 0.0
+        inventory_growth_rate = (inventory - prev_year_inventory) / prev_year_inventory if prev_year_inventory != 0 else 0.0
+        ap_days_change_pct = (accounts_payable_days - prev_accounts_payable_days) / prev_accounts_payable_days if prev_accounts_payable_days != 0 else 0.0
+        ar_growth_rate = (accounts_receivable - prev_year_accounts_receivable) / prev_year_accounts_receivable if prev_year_accounts_receivable != 0 else 0.0
+
+
+        # --- 是/否判斷 ---
+        is_inv_turnover_rate_down = inv_turnover_rate_change_pct < 0 # 存貨周轉率下降 (數值變小)
+        is_gross_margin_stable = gross_margin_change_abs <= 0.03 # 毛利率波動 <= 3% (絕對差值)
+        is_revenue_growth_gt_industry_avg = revenue_growth_rate > industry_avg_revenue_growth_rate
+        is_ar_days_stable_or_down = ar_days_change_pct <= 0 # 應收帳款周轉天數穩定或下降 (數值變小或不變)
+        is_ap_days_normal = abs(ap_days_change_pct) <= 0.05 # 應付帳款天數波動 <= 5%
+        is_revenue_inv_growth_sync = inventory_growth_rate <= revenue_growth_rate # 存貨成長率 <= 營收成長率
+        is_revenue_ar_growth_sync = ar_growth_rate <= revenue_growth_rate # 應收帳款成長率 <= 營收成長率
+
+        details['存貨周轉率下降?'] = "是" if is_inv_turnover_rate_down else "否"
+        details['毛利率維持穩定?'] = "是" if is_gross_margin_stable else "否"
+        details['營收成長率 > 同業平均?'] = "是" if is_revenue_growth_gt_industry_avg else "否"
+        details['應收帳款周轉天數穩定或下降?'] = "是" if is_ar_days_stable_or_down else "否"
+        details['應付帳款天數無明顯異常?'] = "是" if is_ap_days_normal else "否"
+        details['營收與存貨成長同步?'] = "是" if is_revenue_inv_growth_sync else "否"
+        details['營收與應收帳款成長同步?'] = "是" if is_revenue_ar_growth_sync else "否"
+
+
+        # --- 評分邏輯 (級距定義於 SCORE_LADDERS) ---
+        ladders = SCORE_LADDERS['op_efficiency']
+        # 1. 存貨周轉率變化 (25%)
+        score += ladders['inv_turnover_rate_change_pct'].score(inv_turnover_rate_change_pct)
+
+        # 2. 應收帳款周轉天數變化 (20%)
+        score += ladders['ar_days_change_pct'].score(ar_days_change_pct)
+
+        # 3. 營收與存貨成長同步性 (20%)
+        score += ladders['inventory_growth_rate'].score(inventory_growth_rate, base=revenue_growth_rate)
+
+        # 4. 毛利率穩定性 (15%)
+        score += ladders['gross_margin_change_abs'].score(gross_margin_change_abs)
+
+        # 5. 營收成長 vs. 同業 (10%)
+        revenue_growth_gap = revenue_growth_rate - industry_avg_revenue_growth_rate
+        score += ladders['revenue_growth_gap'].score(revenue_growth_gap)
+
+        # 6. 應付帳款天數異常 (5%)
+        if is_ap_days_normal: score += 5
+        else: score += 0
+
+        # 7. 營收與應收帳款成長同步 (5%)
+        score += ladders['ar_growth_rate'].score(ar_growth_rate, base=revenue_growth_rate)
+
+        # --- 結論 (根據是/否判斷組合) ---
+        # 邏輯架構（營運效率與周轉問題）
+        if (not is_inv_turnover_rate_down) and is_gross_margin_stable: # 存貨周轉率未下降(穩定/上升)且毛利率穩定
+            conclusion_list.append("營運效率良好，毛利穩定且存貨周轉情況不錯。這表示公司在營運和盈利能力上表現健康。")
+        elif is_inv_turnover_rate_down and (not is_gross_margin_stable):
+            conclusion_list.append("營運效率惡化，存貨周轉問題與毛利率波動並存，可能面臨滯銷或價格戰壓力。需警惕存貨跌價損失和盈利能力下降。")
+        elif (not is_inv_turnover_rate_down) and is_ar_days_stable_or_down:
+            conclusion_list.append("存貨和應收帳款周轉都表現良好，營運效率較高。這顯示公司資金回籠快，資產利用效率高。")
+        elif is_inv_turnover_rate_down and is_ap_days_normal and (not is_revenue_inv_growth_sync):
+            conclusion_list.append("存貨周轉率下降、營收與存貨成長不同步，儘管應付帳款天數正常，但整體營運效率不佳，可能存在存貨積壓問題。需警惕資金占用和經營風險。")
+        elif (not is_ar_days_stable_or_down) and (not is_revenue_growth_gt_industry_avg) and is_gross_margin_stable:
+            conclusion_list.append("毛利穩定且存貨周轉尚可，但應收帳款周轉惡化且營收成長不及同業。可能需提防客戶付款風險或市場份額流失。")
+        elif is_revenue_growth_gt_industry_avg and is_inv_turnover_rate_down:
+            conclusion_list.append("營收成長雖快，但存貨周轉率下降可能預示著盲目擴張或存貨管理問題。需警惕成長的質量。")
+        elif not (is_inv_turnover_rate_down or is_gross_margin_stable or is_revenue_growth_gt_industry_avg or is_ar_days_stable_or_down or is_ap_days_normal or is_revenue_inv_growth_sync or is_revenue_ar_growth_sync): # 若所有關鍵判斷皆為"否"
+            conclusion_list.append("各項營運效率指標均表現不佳，可能面臨嚴重的經營困境和資金壓力。建議立即審視公司策略。")
+        else:
+            conclusion_list.append("營運效率綜合判斷，需根據具體數據進一步分析。")
+
+        return {
+            'score': min(score, 100),
+            'conclusion': " ".join(conclusion_list),
+            'details': details
+        }
+
+    def assess_investment_expansion(self, ratios):
+        data = self.financial_data.data
+        score = 0
+        conclusion_list = []
+        details = {}
+
+        # 獲取所需數據
+        capital_expenditures = self.get_value('capital_expenditures')
+        operating_cash_flow = self.get_value('operating_cash_flow')
+        roe = ratios.get('roe', 0.0)
+        industry_avg_roe = self.get_value('industry_avg_roe')
+        current_debt_ratio = ratios.get('debt_ratio', 0.0) # 從 ratios 獲取
+        prev_total_liabilities = self.get_value('prev_total_liabilities')
+        prev_total_assets = self.get_value('prev_total_assets')
+        prev_debt_ratio = prev_total_liabilities / prev_total_assets if prev_total_assets != 0 else 0.0
+        free_cash_flow = ratios.get('free_cash_flow', 0.0)
+        net_debt = ratios.get('net_debt', 0.0)
+        prev_net_debt = self.get_value('prev_net_debt')
+        revenue = self.get_value('operating_revenue') # 假設營收用於FCF狀態判斷
+
+        # 計算指標
+        capex_to_ocf_ratio = capital_expenditures / operating_cash_flow if operating_cash_flow != 0 else 0.0
+        roe_diff_from_industry = roe - industry_avg_roe
+        net_debt_change_pct = (net_debt - prev_net_debt) / abs(prev_net_debt) if prev_net_debt != 0 else 0.0
+        debt_ratio_change_pct = (current_debt_ratio - prev_debt_ratio) / prev_debt_ratio if prev_debt_ratio != 0 else 0.0
+
+
+        # --- 是/否判斷 ---
+        is_capex_high = capex_to_ocf_ratio > 0.5 and capital_expenditures > 0 # 資本支出佔營業現金流比例 > 50%
+        is_roe_gt_industry_avg = roe_diff_from_industry > 0 # ROE > 同業平均
+        is_debt_ratio_increased = debt_ratio_change_pct > 0 # 負債比率較去年上升
+        is_fcf_positive = free_cash_flow > 0 # 自由現金流為正
+        is_net_debt_increased = net_debt_change_pct > 0 # 淨負債增加
+
+        details['資本支出佔營業現金流比例 > 50%?'] = "是" if is_capex_high else "否"
+        details['ROE > 同業平均?'] = "是" if is_roe_gt_industry_avg else "否"
+        details['負債比率較去年上升?'] = "是" if is_debt_ratio_increased else "否"
+        details['自由現金流為正?'] = "是" if is_fcf_positive else "否"
+        details['淨負債增加?'] = "是" if is_net_debt_increased else "否"
+
+        # --- 評分邏輯 (級距定義於 SCORE_LADDERS) ---
+        ladders = SCORE_LADDERS['inv_expansion']
+        # 1. 自由現金流狀態 (10分)
+        if revenue > 0: # 門檻為營收的 0% / 10% / 30%
+            score += ladders['free_cash_flow_to_revenue'].score(free_cash_flow, base=revenue)
+        else:
+            score += ladders['free_cash_flow_sign'].score(free_cash_flow)
+
+        # 2. 資本支出/營業現金流比例 (10分)
+        score += ladders['capex_to_ocf_ratio'].score(capex_to_ocf_ratio)
+
+        # 3. ROE 超過同業幅度 (10分)
+        score += ladders['roe_diff_from_industry'].score(roe_diff_from_industry)
+
+        # 4. 淨負債變動 (10分)
+        score += ladders['net_debt_change_pct'].score(net_debt_change_pct)
+
+        # 5. 負債比率變化 (10分)
+        score += ladders['debt_ratio_change_pct'].score(debt_ratio_change_pct)
+
+        # --- 結論 (根據是/否判斷組合) ---
+        # 邏輯架構（投資與擴張合理性）
+        if not is_fcf_positive: # 邏輯開端是檢查自由現金流
+            conclusion_list.append("自由現金流為負數，不論其他條件，公司短期內都面臨資金壓力，擴張與投資的可能性偏低。")
+            if is_capex_high and is_roe_gt_industry_avg and (not is_debt_ratio_increased) and (not is_net_debt_increased):
+                conclusion_list.append("然而，高資本支出帶來高回報且負債未顯著增加，顯示財務槓桿與資本支出同步提升，營運效率與投資回報皆表現亮眼，屬於具備良好資金運用能力的成長企業。")
+            elif is_capex_high and (not is_roe_gt_industry_avg):
+                conclusion_list.append("儘管高資本支出，但ROE未優於同業，投資效益未顯現，可能過度擴張或專案報酬率低。")
+            elif (not is_capex_high) and (not is_roe_gt_industry_avg) and (not is_debt_ratio_increased) and (not is_net_debt_increased):
+                conclusion_list.append("沒在花錢也沒賺錢，公司太保守或已無成長動能。")
+        else: # 自由現金流為正數
+            if is_capex_high and is_roe_gt_industry_avg:
+                conclusion_list.append("高投資帶來高回報，擴張策略有效。公司處於積極且有效的成長階段。")
+            elif is_capex_high and (not is_roe_gt_industry_avg):
+                conclusion_list.append("投資效益未顯現，可能過度擴張或專案報酬率低。需審慎評估投資專案回報。")
+            elif is_debt_ratio_increased:
+                conclusion_list.append("負債比率較去年上升，需評估是否過度依賴融資支撐擴張。公司擴張策略可能伴隨較高財務風險。")
+            elif is_roe_gt_industry_avg and (not is_capex_high):
+                conclusion_list.append("投資花得少，回報普通但沒亂擴張。公司擴張保守，但投資回報尚可接受。")
+            else:
+                conclusion_list.append("投資與擴張策略穩健，公司在成長的同時保持了健康的財務狀況。")
+
+        # 根據綜合分數給出總結性結論
+        overall_conclusion = ""
+        watch_score, growth_score, quality_score = CONCLUSION_SCORE_EDGES['inv_expansion'] # 20 / 30 / 40 分
+        if score >= quality_score:
+            overall_conclusion = "積極擴張且資金與回報俱佳，屬於「優質擴張企業」。"
+        elif score >= growth_score:
+            overall_conclusion = "穩健擴張中，部分指標如槓桿或現金流需持續觀察，屬於「成長型企業」。"
+        elif score >= watch_score:
+            overall_conclusion = "擴張或回報力道普通，或存在財務壓力，需審慎觀察。"
+        else: # <20分
+            overall_conclusion = "投資與擴張動能低，或槓桿風險過高，應審慎投資。"
+
+        return {
+            'score': min(score, 100),
+            'conclusion': " ".join(conclusion_list),
+            'overall_conclusion': overall_conclusion, # 加入綜合性結論
+            'details': details
+        }
+
+    @classmethod
+    def batch_cash_flow_history(cls, df, key='three_year_operating_cash_flows'):
+        """
+        將多年度現金流欄位轉為 (公司數, 最長年數) 的陣列，不足的年度以 NaN 補齊。
+        回傳 (陣列, 每家公司的實際年數)。
+        """
+        if isinstance(df, FinancialDataTable) and key == HISTORY_KEY:
+            return df.history, df.history_lengths
+        if key not in df.columns:
+            return np.zeros((len(df), 3)), np.full(len(df), 3, dtype=np.int64)
+        try:
+            # 常見情況：每列都是等長的數字列表，可直接轉成二維陣列
+            flows = np.array(df[key].tolist(), dtype=float)
+            if flows.ndim == 2:
+                return flows, np.full(len(df), flows.shape[1], dtype=np.int64)
+        except (ValueError, TypeError):
+            pass
+        try:
+            # CSV 中常見的等長逗號分隔字串 (例如 "100,120,130")；含空白項目或長度不一時改為逐筆轉換
+            flows = np.array([v.split(',') for v in df[key]], dtype=float)
+            if flows.ndim == 2:
+                return flows, np.full(len(df), flows.shape[1], dtype=np.int64)
+        except (AttributeError, ValueError, TypeError):
+            pass
+        histories = [_to_float_list(v) for v in df[key]]
+        lengths = np.fromiter(map(len, histories), dtype=np.int64, count=len(histories))
+        width = int(lengths.max()) if len(lengths) else 0
+        if len(histories) and (lengths == width).all():
+            return np.array(histories, dtype=float).reshape(len(histories), width), lengths
+        flows = np.full((len(histories), width), np.nan)
+        for i, h in enumerate(histories):
+            flows[i, :len(h)] = h
+        return flows, lengths
+
+    @classmethod
+    def score_batch(cls, df, ratios=None):
+        """
+        批次版本的六項 assess_* 評分：以 SCORE_LADDERS 對整個陣列做區間查表，不逐列分支。
+        ratios 為 calculate_ratios_batch 的結果 (未提供時自動計算)。
+        回傳以 ANALYSIS_KEYS 為欄位的分數 DataFrame，分數與逐筆呼叫 assess_* 完全一致。
+        """
+        if ratios is None:
+            ratios = cls.calculate_ratios_batch(df)
+        col = lambda key: cls.batch_column(df, key)
+        ratio = lambda key: ratios[key].to_numpy(dtype=float)
+        inf = float('inf')
+        scores = {}
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            operating_cash_flow = col('operating_cash_flow')
+            free_cash_flow = ratio('free_cash_flow')
+            revenue_growth_rate = _safe_divide(col('operating_revenue') - col('prev_year_operating_revenue'), col('prev_year_operating_revenue'))
+
+            # 獲利品質
+            ladders = SCORE_LADDERS['profit_quality']
+            non_recurring_profit_ratio = _safe_divide(np.abs(col('non_recurring_gain_loss')), col('total_profit'))
+            score = np.zeros(len(df))
+            score += ladders['profit_cash_content'].score_array(ratio('profit_cash_content'))
+            score += ladders['ar_turnover_days'].score_array(ratio('accounts_receivable_turnover_days'))
+            score += ladders['non_recurring_profit_ratio'].score_array(non_recurring_profit_ratio)
+            score += ladders['net_profit_growth_rate'].score_array(ratio('net_profit_growth_rate'))
+            scores['profit_quality'] = np.minimum(score, 100)
+
+            # 現金流量
+            ladders = SCORE_LADDERS['cash_flow']
+            score = np.zeros(len(df))
+            score += ladders['operating_cash_flow'].score_array(operating_cash_flow)
+            score += ladders['free_cash_flow'].score_array(free_cash_flow)
+            score += ladders['op_cf_vs_net_profit'].score_array(_safe_divide(operating_cash_flow, col('net_profit_after_tax')))
+            score += ladders['investing_cf_ratio_to_op_cf'].score_array(_safe_divide(col('investing_cash_flow'), operating_cash_flow))
+            score += ladders['financing_cf_ratio_to_op_cf'].score_array(_safe_divide(col('financing_cash_flow'), operating_cash_flow))
+            scores['cash_flow'] = np.minimum(score, 100)
+
+            # 流動性風險
+            ladders = SCORE_LADDERS['liquidity']
+            cash_to_short_debt_ratio = _safe_divide(col('cash_and_equivalents'), col('short_term_borrowing'), fill=inf)
+            op_cf_to_interest_coverage = _safe_divide(operating_cash_flow, col('interest_expense'), fill=inf)
+            current_inv_days = _safe_divide(365, ratio('inventory_turnover_rate'), fill=inf)
+            prev_inv_days = _safe_divide(365, col('prev_year_inventory_turnover_rate'), fill=inf)
+            is_inventory_days_stable_or_down = (prev_inv_days == inf) | (current_inv_days <= prev_inv_days)
+
+            flows, lengths = cls.batch_cash_flow_history(df)
+            positive_op_cf_count = (flows > 0).sum(axis=1)
+            pair_in_range = np.arange(max(flows.shape[1] - 1, 0))[None, :] < (lengths - 1)[:, None]
+            is_op_cf_growing = np.all((flows[:, :-1] <= flows[:, 1:]) | ~pair_in_range, axis=1) & (lengths > 1)
+            op_cf_history_points = np.select(
+                [(positive_op_cf_count == 3) & is_op_cf_growing, positive_op_cf_count == 3,
+                 operating_cash_flow > 0, positive_op_cf_count == 2, positive_op_cf_count == 1],
+                [25, 20, 15, 10, 5], default=0)
+
+            score = np.zeros(len(df))
+            score += ladders['cash_to_short_debt_ratio'].score_array(cash_to_short_debt_ratio)
+            score += op_cf_history_points
+            score += ladders['current_ratio'].score_array(ratio('current_ratio'))
+            score += np.where(is_inventory_days_stable_or_down, 15, 0)
+            score += ladders['op_cf_to_interest_coverage'].score_array(op_cf_to_interest_coverage)
+            score += ladders['quick_ratio'].score_array(ratio('quick_ratio'))
+            scores['liquidity'] = np.minimum(score, 100)
+
+            # 負債與償債能力
+            ladders = SCORE_LADDERS['debt_solvency']
+            cost_of_debt_interest_rate = col('cost_of_debt_interest_rate')
+            cash_dividends_paid = col('cash_dividends_paid')
+            is_roa_higher_than_debt_rate = np.where(cost_of_debt_interest_rate != 0, ratio('roa') > cost_of_debt_interest_rate, True)
+            is_fcf_sufficient_for_dividend = ((free_cash_flow >= cash_dividends_paid) & (cash_dividends_paid > 0)) | ((cash_dividends_paid == 0) & (free_cash_flow >= 0))
+            score = np.zeros(len(df))
+            score += ladders['interest_coverage_ratio'].score_array(ratio('interest_coverage_ratio'))
+            score += np.where(is_roa_higher_than_debt_rate, 20, 0)
+            score += np.where(is_fcf_sufficient_for_dividend, 20, 0)
+            score += ladders['debt_ratio'].score_array(ratio('debt_ratio'))
+            score += ladders['financial_expense_to_revenue_ratio'].score_array(ratio('financial_expense_to_revenue_ratio'))
+            scores['debt_solvency'] = np.minimum(score, 100)
+
+            # 營運效率與周轉
+            ladders = SCORE_LADDERS['op_efficiency']
+            prev_inventory_turnover_rate = col('prev_year_inventory_turnover_rate')
+            prev_ar_days = col('prev_year_accounts_receivable_turnover_days')
+            accounts_payable_days = col('accounts_payable_days') # 與 assess_operational_efficiency 相同，去年應付帳款天數沿用當期值
+            inv_turnover_rate_change_pct = _safe_divide(ratio('inventory_turnover_rate') - prev_inventory_turnover_rate, prev_inventory_turnover_rate)
+            ar_days_change_pct = _safe_divide(ratio('accounts_receivable_turnover_days') - prev_ar_days, prev_ar_days)
+            gross_margin_change_abs = np.abs(ratio('gross_profit_margin') - col('prev_year_gross_profit_margin'))
+            inventory_growth_rate = _safe_divide(col('inventory') - col('prev_year_inventory'), col('prev_year_inventory'))
+            ap_days_change_pct = _safe_divide(accounts_payable_days - accounts_payable_days, accounts_payable_days)
+            ar_growth_rate = _safe_divide(col('accounts_receivable') - col('prev_year_accounts_receivable'), col('prev_year_accounts_receivable'))
+            score = np.zeros(len(df))
+            score += ladders['inv_turnover_rate_change_pct'].score_array(inv_turnover_rate_change_pct)
+            score += ladders['ar_days_change_pct'].score_array(ar_days_change_pct)
+            score += ladders['inventory_growth_rate'].score_array(inventory_growth_rate, base=revenue_growth_rate)
+            score += ladders['gross_margin_change_abs'].score_array(gross_margin_change_abs)
+            score += ladders['revenue_growth_gap'].score_array(revenue_growth_rate - col('industry_avg_revenue_growth_rate'))
+            score += np.where(np.abs(ap_days_change_pct) <= 0.05, 5, 0)
+            score += ladders['ar_growth_rate'].score_array(ar_growth_rate, base=revenue_growth_rate)
+            scores['op_efficiency'] = np.minimum(score, 100)
+
+            # 投資與擴張合理性
+            ladders = SCORE_LADDERS['inv_expansion']
+            revenue = col('operating_revenue')
+            prev_debt_ratio = _safe_divide(col('prev_total_liabilities'), col('prev_total_assets'))
+            prev_net_debt = col('prev_net_debt')
+            score = np.zeros(len(df))
+            score += np.where(revenue > 0,
+                              ladders['free_cash_flow_to_revenue'].score_array(free_cash_flow, base=revenue),
+                              ladders['free_cash_flow_sign'].score_array(free_cash_flow))
+            score += ladders['capex_to_ocf_ratio'].score_array(_safe_divide(col('capital_expenditures'), operating_cash_flow))
+            score += ladders['roe_diff_from_industry'].score_array(ratio('roe') - col('industry_avg_roe'))
+            score += ladders['net_debt_change_pct'].score_array(_safe_divide(ratio('net_debt') - prev_net_debt, np.abs(prev_net_debt)))
+            score += ladders['debt_ratio_change_pct'].score_array(_safe_divide(ratio('debt_ratio') - prev_debt_ratio, prev_debt_ratio))
+            scores['inv_expansion'] = np.minimum(score, 100)
+
+        return pd.DataFrame(scores, index=df.index, columns=list(cls.ANALYSIS_KEYS))
+
+# 六項分析的顯示名稱 (鍵與 st.session_state.results 相同)
+ANALYSIS_TITLES = {
+    'profit_quality': "獲利品質分析", 'cash_flow': "現金流量分析", 'liquidity': "流動性風險評估",
+    'debt_solvency': "負債與償債能力", 'op_efficiency': "營運效率與周轉", 'inv_expansion': "投資與擴張合理性",
+}
+
+# 結論隨分數改變的門檻 (分數 >= 門檻即換成較高一級的結論)。
+# 其他分析的結論只依各項是/否判斷的組合，與分數無關，因此沒有門檻。
+CONCLUSION_SCORE_EDGES = {'inv_expansion': (20.0, 30.0, 40.0)}
+
+# 綜合報告「關鍵財務比率一覽」中的項目 (鍵 → 顯示名稱)，依顯示順序排列
+REPORT_RATIO_LABELS = {
+    'gross_profit_margin': '毛利率', 'operating_profit_margin': '營業利益率',
+    'net_profit_margin': '淨利率', 'roe': '股東權益報酬率 (ROE)',
+    'roa': '總資產報酬率 (ROA)', 'net_profit_growth_rate': '淨利成長率',
+    'revenue_growth_rate': '營收成長率', 'profit_cash_content': '獲利含金量',
+    'current_ratio': '流動比率', 'quick_ratio': '速動比率',
+    'interest_coverage_ratio': '利息保障倍數', 'inventory_turnover_rate': '存貨周轉率',
+    'accounts_receivable_turnover_days': '應收帳款周轉天數', 'free_cash_flow': '自由現金流',
+    'debt_ratio': '負債比率', 'financial_expense_to_revenue_ratio': '財務費用佔營收比例',
+    'net_debt': '淨負債', 'accounts_payable_days': '應付帳款天數',
+}
+
+def _resolve_report_format(key):
+    """依鍵名決定數值的顯示格式。只在載入模組時對每個鍵判斷一次。"""
+    if any(s in key for s in ['_margin', '_rate', '_ratio', 'roe', 'roa', 'growth']):
+        return lambda value: f"{value * 100:.2f}%"
+    if 'days' in key:
+        return lambda value: f"{value:.0f}天"
+    if any(s in key for s in ['cash_flow', 'profit', 'assets', 'debt', 'revenue', 'expenses', 'inventory']):
+        return lambda value: f"{value:,.2f} 元"
+    return lambda value: f"{value:.2f}"
+
+# 鍵 → 格式化函式 (數值為 float 時使用，其他型別以 str() 顯示)
+REPORT_FORMATTERS = {key: _resolve_report_format(key) for key in REPORT_RATIO_LABELS}
+_REPORT_NAME_WIDTH = max(len(name) for name in REPORT_RATIO_LABELS.values())
+_REPORT_PADDED_NAMES = tuple(name.ljust(_REPORT_NAME_WIDTH) for name in REPORT_RATIO_LABELS.values())
+_REPORT_HEADER_NAME = "比率名稱".ljust(_REPORT_NAME_WIDTH)
+_REPORT_ANALYSIS_TITLES = tuple(ANALYSIS_TITLES.values())
+
+# 已產生的報告內文 (不含帶時間的標題列)，以 (比率數值, 各項評分與結論) 為鍵
+REPORT_CACHE = LRUCache(max_entries=4096)
+
+def _format_report_value(key, value):
+    return REPORT_FORMATTERS[key](value) if isinstance(value, float) else str(value)
+
+def _report_heading():
+    return f"===== 綜合財務分析報告 ({datetime.now().strftime('%Y-%m-%d %H:%M')}) =====\n\n"
+
+def _render_report_body(display_values, summaries):
+    """由已格式化的比率數值與 (評分, 結論) 列表組出報告內文。"""
+    value_width = max(len(value) for value in display_values)
+    lines = ["--- 關鍵財務比率一覽 ---\n",
+             f"{_REPORT_HEADER_NAME} | {'數值'.ljust(value_width)}",
+             f"{'-' * _REPORT_NAME_WIDTH}-+-{'-' * value_width}"]
+    lines.extend(f"{name} | {value.ljust(value_width)}" for name, value in zip(_REPORT_PADDED_NAMES, display_values))
+    lines.append("\n")
+    for title, (score, conclusion) in zip(_REPORT_ANALYSIS_TITLES, summaries):
+        lines.append(f"--- {title} 總結 ---")
+        lines.append(f"評分: {score:.2f} / 100")
+        lines.append(f"結論: {conclusion}\n")
+    return "\n".join(lines)
+
+def generate_overall_report_text(calculator, ratios, *analysis_results):
+    """
+    生成綜合報告的文本內容。
+    內文以 (格式化後的比率數值, 各項評分與結論) 為鍵快取於 REPORT_CACHE，內容未變時只重新產生帶時間的標題列。
+    """
+    fd = calculator.financial_data
+    display_values = tuple(_format_report_value(key, ratios[key] if key in ratios else fd.get_data(key))
+                           for key in REPORT_RATIO_LABELS)
+    summaries = tuple((result.get('score', 0), result.get('conclusion', '無結論')) for result in analysis_results)
+    # 以顯示的文字為鍵：數值相等但顯示不同的情況 (1 與 1.0、-0.0 與 0.0) 不會共用內文
+    cache_key = (display_values, tuple((f"{score:.2f}", conclusion) for score, conclusion in summaries))
+    body = REPORT_CACHE.get_or_compute(cache_key, lambda: _render_report_body(display_values, summaries))
+    return _report_heading() + "\n" + body
+
+def generate_reports_batch(ratios, analysis_results, extra_values=None):
+    """
+    批次產生多家公司的綜合報告文字 (與逐筆呼叫 generate_overall_report_text 的結果相同)。
+    ratios 為 calculate_ratios_batch 的 DataFrame；analysis_results 為每家公司的評估結果列表
+    (每個元素為依 ANALYSIS_KEYS 排列的六項結果)；extra_values 提供不在 ratios 中的項目
+    (例如 {'accounts_payable_days': 陣列})。比率以整欄格式化，標題列整批共用一次。
+    """
+    extra_values = extra_values or {}
+    columns = []
+    for key, formatter in REPORT_FORMATTERS.items():
+        column = ratios[key] if key in ratios else extra_values.get(key, np.zeros(len(ratios)))
+        columns.append([formatter(value) for value in np.asarray(column, dtype=float).tolist()])
+    heading = _report_heading() + "\n"
+    reports = []
+    for display_values, results in zip(zip(*columns), analysis_results):
+        summaries = [(result.get('score', 0), result.get('conclusion', '無結論')) for result in results]
+        reports.append(heading + _render_report_body(display_values, summaries))
+    return reports
+
+def build_report(record):
+    """以單筆公司資料 (dict、pandas Series 或 FinancialData) 執行完整分析並產生綜合報告文字。"""
+    financial_data = record if isinstance(record, FinancialData) else FinancialData.from_record(record)
+    calculator = FinancialCalculator(financial_data)
+    ratios = calculator.calculate_ratios()
+    results = calculator.assess_all(ratios)
+    return generate_overall_report_text(calculator, ratios, *results.values())
+
+def build_reports(df, ratios=None):
+    """
+    批次版本的 build_report：比率以 calculate_ratios_batch 一次算出並整欄格式化，
+    六項評估 (結論文字需要逐筆判斷) 仍逐筆執行。回傳與 df 列順序相同的報告文字列表。
+    """
+    if ratios is None:
+        ratios = FinancialCalculator.calculate_ratios_batch(df)
+    if isinstance(df, FinancialDataTable):
+        financial_data = (df.row(i) for i in range(len(df)))
+    else:
+        financial_data = (FinancialData.from_record(record) for record in df.to_dict('records'))
+    analysis_results = [list(FinancialCalculator(fd).assess_all(ratio_row).values())
+                        for fd, ratio_row in zip(financial_data, ratios.to_dict('records'))]
+    extra_values = {'accounts_payable_days': FinancialCalculator.batch_column(df, 'accounts_payable_days')}
+    return generate_reports_batch(ratios, analysis_results, extra_values)
+
+def score_companies(df, with_ratios=True, with_report=False):
+    """
+    批次計算 df (DataFrame 或 FinancialDataTable) 中每家公司的比率與六項分數。
+    回傳識別欄位 (df 中不屬於 FinancialData 的欄位，例如公司名稱) + 比率欄位 + 分數欄位
+    (+ 逐筆產生的報告文字) 的 DataFrame，索引與 df 相同。
+    """
+    ratios = FinancialCalculator.calculate_ratios_batch(df)
+    scores = FinancialCalculator.score_batch(df, ratios)
+    if isinstance(df, FinancialDataTable):
+        ids = pd.DataFrame(index=df.index)
+    else:
+        reserved = set(FinancialData().data) | set(ratios.columns) | set(scores.columns)
+        ids = df[[c for c in df.columns if c not in reserved]]
+    result = pd.concat([ids, ratios, scores] if with_ratios else [ids, scores], axis=1)
+    if with_report:
+        result['report'] = build_reports(df, ratios)
+    return result
@@ -0,0 +1,160 @@
+"""
+增量重算：只重新執行輸入有變動的比率與評估。
+
+RATIO_INPUTS 與 ANALYSIS_INPUTS 記錄每個比率、每項 assess_* 評估實際讀取的 FinancialData 欄位與比率，
+由此建立「欄位 → 受影響的比率與評估」的相依圖。IncrementalAnalyzer 記住上次分析時的輸入，
+下次只重算受影響的評估，其餘沿用上次的結果。
+"""
+import math
+
+from financial_analysis import FinancialCalculator
+from instrumentation import Instrumentation
+
+# 每個比率讀取的 FinancialData 欄位 (對應 FinancialCalculator.calculate_ratios)
+RATIO_INPUTS = {
+    'gross_profit_margin': ('operating_revenue', 'cost_of_goods_sold'),
+    'operating_profit_margin': ('operating_revenue', 'cost_of_goods_sold', 'operating_expenses'),
+    'net_profit_margin': ('net_profit_after_tax', 'operating_revenue'),
+    'roe': ('net_profit_after_tax', 'shareholders_equity'),
+    'roa': ('net_profit_after_tax', 'total_assets'),
+    'net_profit_growth_rate': ('net_profit_after_tax', 'prev_year_net_profit_after_tax'),
+    'revenue_growth_rate': ('operating_revenue', 'prev_year_operating_revenue'),
+    'profit_cash_content': ('operating_cash_flow', 'net_profit_after_tax'),
+    'current_ratio': ('current_assets', 'current_liabilities'),
+    'quick_ratio': ('current_assets', 'inventory', 'current_liabilities'),
+    'interest_coverage_ratio': ('net_profit_before_tax', 'interest_expense'),
+    'inventory_turnover_rate': ('cost_of_goods_sold', 'inventory', 'prev_year_inventory'),
+    'inventory_turnover_days': ('cost_of_goods_sold', 'inventory', 'prev_year_inventory'),
+    'accounts_receivable_turnover_rate': ('operating_revenue', 'accounts_receivable', 'prev_year_accounts_receivable'),
+    'accounts_receivable_turnover_days': ('operating_revenue', 'accounts_receivable', 'prev_year_accounts_receivable'),
+    'free_cash_flow': ('operating_cash_flow', 'capital_expenditures'),
+    'financing_to_operating_cash_flow_ratio': ('financing_cash_flow', 'operating_cash_flow'),
+    'debt_ratio': ('total_assets', 'shareholders_equity'),
+    'financial_expense_to_revenue_ratio': ('interest_expense', 'operating_revenue'),
+    'net_debt': ('total_assets', 'shareholders_equity', 'cash_and_equivalents'),
+}
+
+# 每項評估直接讀取的欄位與比率 (對應各 assess_* 方法)
+ANALYSIS_INPUTS = {
+    'profit_quality': {
+        'fields': ('non_recurring_gain_loss', 'total_profit'),
+        'ratios': ('profit_cash_content', 'accounts_receivable_turnover_days', 'net_profit_growth_rate'),
+    },
+    'cash_flow': {
+        'fields': ('operating_cash_flow', 'net_profit_after_tax', 'investing_cash_flow', 'financing_cash_flow'),
+        'ratios': ('free_cash_flow',),
+    },
+    'liquidity': {
+        'fields': ('operating_cash_flow', 'cash_and_equivalents', 'short_term_borrowing', 'interest_expense',
+                   'prev_year_inventory_turnover_rate', 'three_year_operating_cash_flows'),
+        'ratios': ('current_ratio', 'quick_ratio', 'inventory_turnover_rate'),
+    },
+    'debt_solvency': {
+        'fields': ('cost_of_debt_interest_rate', 'cash_dividends_paid', 'prev_total_liabilities', 'prev_total_assets'),
+        'ratios': ('interest_coverage_ratio', 'roa', 'free_cash_flow', 'debt_ratio', 'financial_expense_to_revenue_ratio'),
+    },
+    'op_efficiency': {
+        'fields': ('prev_year_inventory_turnover_rate', 'prev_year_accounts_receivable_turnover_days',
+                   'prev_year_gross_profit_margin', 'operating_revenue', 'prev_year_operating_revenue',
+                   'industry_avg_revenue_growth_rate', 'accounts_payable_days', 'inventory', 'prev_year_inventory',
+                   'accounts_receivable', 'prev_year_accounts_receivable'),
+        'ratios': ('inventory_turnover_rate', 'accounts_receivable_turnover_days', 'gross_profit_margin'),
+    },
+    'inv_expansion': {
+        'fields': ('capital_expenditures', 'operating_cash_flow', 'industry_avg_roe', 'prev_total_liabilities',
+                   'prev_total_assets', 'prev_net_debt', 'operating_revenue'),
+        'ratios': ('roe', 'debt_ratio', 'free_cash_flow', 'net_debt'),
+    },
+}
+
+def build_dependency_graph():
+    """
+    建立相依圖：FinancialData 欄位 → {'ratios': 受影響的比率, 'analyses': 受影響的評估}。
+    評估除了直接讀取的欄位外，也會因為它讀取的比率改變而受影響。
+    """
+    graph = {}
+    def node(field):
+        return graph.setdefault(field, {'ratios': set(), 'analyses': set()})
+
+    for ratio, fields in RATIO_INPUTS.items():
+        for field in fields:
+            node(field)['ratios'].add(ratio)
+    for analysis, inputs in ANALYSIS_INPUTS.items():
+        for field in inputs['fields']:
+            node(field)['analyses'].add(analysis)
+        for ratio in inputs['ratios']:
+            for field in RATIO_INPUTS[ratio]:
+                node(field)['analyses'].add(analysis)
+    return graph
+
+DEPENDENCY_GRAPH = build_dependency_graph()
+
+_DISABLED = Instrumentation(enabled=False)
+
+def _same_value(a, b):
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+def _snapshot(data):
+    return {key: list(value) if isinstance(value, list) else value for key, value in data.items()}
+
+def affected_by(changed_fields):
+    """回傳 (受影響的比率, 受影響的評估)，依 RATIO_KEYS / ANALYSIS_KEYS 的順序排列。"""
+    ratios, analyses = set(), set()
+    for field in changed_fields:
+        node = DEPENDENCY_GRAPH.get(field, {'ratios': (), 'analyses': ()})
+        ratios.update(node['ratios'])
+        analyses.update(node['analyses'])
+    return ([r for r in FinancialCalculator.RATIO_KEYS if r in ratios],
+            [a for a in FinancialCalculator.ANALYSIS_KEYS if a in analyses])
+
+class IncrementalAnalyzer:
+    """
+    記住上次分析時的 FinancialData，下次分析時只重算輸入有變動的部分。
+    比率一次計算完成 (只有在受影響的比率存在時才重算)，六項評估則只重跑受影響的項目。
+    """
+    def __init__(self, calculator):
+        self.calculator = calculator
+        self._snapshot = None
+
+    def changed_fields(self):
+        """與上次分析相比有變動的欄位；尚未分析過時回傳所有欄位。"""
+        data = self.calculator.financial_data.data
+        if self._snapshot is None:
+            return list(data)
+        return [key for key, value in data.items() if key not in self._snapshot or not _same_value(value, self._snapshot[key])]
+
+    def mark_analyzed(self, data=None):
+        """
+        將 data (預設為目前的 FinancialData) 記為上次分析時的輸入，例如由資料庫載入保存的結果之後，
+        下次 run 只重算與 data 相比有變動的部分。
+        """
+        self._snapshot = _snapshot(self.calculator.financial_data.data if data is None else data)
+
+    def run(self, previous_ratios=None, previous_results=None, instrumentation=None):
+        """
+        執行分析並回傳 (ratios, results, 重新計算的評估鍵列表)。
+        previous_ratios / previous_results 為上次的結果 (例如 st.session_state 中保存的)；
+        缺少時一律完整重算。instrumentation 會分別量測比率計算與每項重算的評估。
+        """
+        instrumentation = instrumentation or _DISABLED
+        changed = self.changed_fields()
+        previous_results = previous_results or {}
+        if not previous_ratios or any(key not in previous_results for key in FinancialCalculator.ANALYSIS_KEYS):
+            changed = list(self.calculator.financial_data.data)
+        affected_ratios, affected_analyses = affected_by(changed)
+
+        if affected_ratios:
+            with instrumentation.stage('calculate_ratios'):
+                ratios = self.calculator.calculate_ratios()
+        else:
+            ratios = dict(previous_ratios)
+        results = dict(previous_results)
+        for key in affected_analyses:
+            method = FinancialCalculator.ANALYSIS_METHODS[key]
+            with instrumentation.stage(method):
+                results[key] = getattr(self.calculator, method)(ratios)
+
+        self._snapshot = _snapshot(self.calculator.financial_data.data)
+        return ratios, results, affected_analyses
@@ -0,0 +1,156 @@
+"""
+各階段的效能量測：檔案解析、calculate_ratios、六項評估、圖表繪製、報告文字產生。
+
+Instrumentation 預設關閉 (stage() 只多一次屬性檢查)，開啟後記錄每個階段的呼叫次數與耗時，
+並可選擇以 cProfile 收集函式層級的剖析資料、以 tracemalloc 記錄峰值記憶體。
+每次量測都會以一行 JSON 寫入 'instrumentation' logger，方便轉送到既有的監控系統，例如:
+    {"event": "stage", "stage": "calculate_ratios", "ms": 0.412, "count": 3, "session": "a1b2"}
+logger 預設沒有 handler (Python 只輸出 WARNING 以上)，需先呼叫 configure_logging() 才會實際輸出。
+"""
+from contextlib import contextmanager
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# 設定此環境變數 (任意非空值) 時，新建立的 Instrumentation 預設開啟，介面上也會顯示診斷面板
+ENV_FLAG = 'FINANCIAL_ANALYZER_DIAGNOSTICS'
+
+# 診斷 log 的輸出檔路徑；未設定時寫到標準錯誤
+LOG_FILE_ENV = 'FINANCIAL_ANALYZER_DIAGNOSTICS_LOG'
+
+def enabled_by_env():
+    return bool(os.environ.get(ENV_FLAG))
+
+def configure_logging(path=None):
+    """
+    讓 'instrumentation' logger 輸出 INFO 等級的 JSON 行：logger 與其上層都沒有 handler 時，
+    加上只輸出訊息本身的 handler，寫入 path 或環境變數 FINANCIAL_ANALYZER_DIAGNOSTICS_LOG 指定的檔案，
+    都未指定時寫到標準錯誤。已以 logging 設定檔等方式設定 handler 時只調整等級。可重複呼叫。
+    """
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if not logger.hasHandlers():
+        path = path or os.environ.get(LOG_FILE_ENV)
+        handler = logging.FileHandler(path, encoding='utf-8') if path else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    return logger
+
+class StageStats:
+    """單一階段的累計統計。"""
+    __slots__ = ('count', 'total', 'max', 'last', 'peak_bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.peak_bytes = None
+
+    def add(self, seconds, peak_bytes=None):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        if peak_bytes is not None:
+            self.peak_bytes = max(self.peak_bytes or 0, peak_bytes)
+
+class Instrumentation:
+    """
+    以 with instrumentation.stage('名稱'): ... 量測程式區塊。
+    巢狀的階段各自計時；cProfile 與 tracemalloc 只在最外層的階段啟動，避免重複啟動。
+    """
+    def __init__(self, enabled=None, profile=False, trace_memory=False, context=None):
+        self.enabled = enabled_by_env() if enabled is None else enabled
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.context = dict(context or {}) # 附加在每行 log 上的欄位，例如 session 代號
+        self._stats = {}
+        self._profiler = None
+        self._depth = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        if not self.enabled:
+            yield
+            return
+
+        outermost = self._depth == 0
+        profiler = self._start_profiler() if outermost and self.profile else None
+        tracing = outermost and self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        self._depth += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self._depth -= 1
+            peak_bytes = None
+            if tracing:
+                peak_bytes = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if profiler is not None:
+                profiler.disable()
+            self._record(name, seconds, peak_bytes, fields)
+
+    def _start_profiler(self):
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+        try:
+            self._profiler.enable()
+        except ValueError: # 其他剖析工具 (例如除錯器) 正在執行
+            return None
+        return self._profiler
+
+    def _record(self, name, seconds, peak_bytes, fields):
+        with self._lock:
+            stats = self._stats.setdefault(name, StageStats())
+            stats.add(seconds, peak_bytes)
+            count = stats.count
+        line = {'event': 'stage', 'stage': name, 'ms': round(seconds * 1000, 3), 'count': count}
+        if peak_bytes is not None:
+            line['peak_kib'] = round(peak_bytes / 1024, 1)
+        line.update(self.context)
+        line.update(fields)
+        logger.info(json.dumps(line, ensure_ascii=False, default=str))
+
+    def summary(self):
+        """每個階段一筆 dict (依累計耗時由大到小排列)，可直接轉為 DataFrame 顯示。"""
+        with self._lock:
+            items = list(self._stats.items())
+        rows = []
+        for name, stats in sorted(items, key=lambda item: item[1].total, reverse=True):
+            rows.append({
+                'stage': name, 'count': stats.count, 'total_ms': stats.total * 1000,
+                'mean_ms': stats.total * 1000 / stats.count, 'max_ms': stats.max * 1000,
+                'last_ms': stats.last * 1000,
+                'peak_kib': None if stats.peak_bytes is None else stats.peak_bytes / 1024,
+            })
+        return rows
+
+    def profile_text(self, limit=30, sort='cumulative'):
+        """cProfile 累計結果的文字報表；尚未收集任何剖析資料時回傳空字串。"""
+        if self._profiler is None:
+            return ''
+        stream = io.StringIO()
+        try:
+            pstats.Stats(self._profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        except TypeError: # 尚未有任何剖析資料
+            return ''
+        return stream.getvalue()
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._profiler = None
@@ -0,0 +1,70 @@
+"""
+以多程序 (process pool) 平行評分大量公司。
+
+每家公司的比率與六項評估只讀取該公司自己的數據，因此可以把資料切成多批，
+分送到各 CPU 核心計算。結果依輸入順序逐批產生：只要下一批算完就立刻交出，
+同時最多只有 max_pending 批在處理中，記憶體用量不隨輸入大小增加。
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import pandas as pd
+
+from financial_analysis import score_companies
+
+DEFAULT_CHUNK_SIZE = 10000
+
+def default_workers():
+    """預設使用所有可用的 CPU 核心。"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError: # sched_getaffinity 僅在部分平台提供
+        return os.cpu_count() or 1
+
+def split_frame(df, chunk_size=DEFAULT_CHUNK_SIZE):
+    """將 DataFrame 依序切成至多 chunk_size 列的多個區塊。"""
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+def score_chunks_parallel(chunks, workers=None, with_ratios=True, with_report=False, max_pending=None):
+    """
+    平行評分一連串 DataFrame 區塊，依輸入順序逐批產生 score_companies 的結果。
+    workers <= 1 時直接在目前程序中依序計算。
+    """
+    workers = workers or default_workers()
+    if workers <= 1:
+        for chunk in chunks:
+            yield score_companies(chunk, with_ratios=with_ratios, with_report=with_report)
+        return
+
+    max_pending = max_pending or workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_companies, chunk, with_ratios, with_report))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def score_frame_parallel(df, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, with_ratios=True, with_report=False):
+    """平行評分整個 DataFrame，回傳與 score_companies(df) 相同 (列順序也相同) 的結果。"""
+    results = list(score_chunks_parallel(split_frame(df, chunk_size), workers, with_ratios, with_report))
+    if not results:
+        return score_companies(df, with_ratios=with_ratios, with_report=with_report)
+    return pd.concat(results)
+
+def score_stream(chunks, writer, workers=None, with_ratios=True, with_report=False, progress=None):
+    """
+    串流評分：逐批評分 chunks 並立即交給 writer.write 寫出，不在記憶體中累積結果。
+    同時存在的只有讀取中、計算中 (至多 workers * 2 批) 與寫出中的區塊，峰值記憶體與輸入大小無關。
+    progress(已評分列數) 於每批寫出後呼叫。回傳已評分的列數。
+    """
+    rows = 0
+    for result in score_chunks_parallel(chunks, workers, with_ratios, with_report):
+        writer.write(result)
+        rows += len(result)
+        if progress is not None:
+            progress(rows)
+    return rows
@@ -0,0 +1,113 @@
+"""
+六項評分的排名：加權綜合分數的前 k 名、單項分數的後段 (例如最低 10%)。
+
+分數只在批次評分時計算一次，存成 (公司數, 6) 的連續矩陣；調整權重時只重算一次矩陣乘法，
+再以 argpartition 做部分選取 (O(n))，只排序選出的 k 筆，不對全部公司完整排序。
+串流評分的結果則以 TopKAccumulator 逐批合併，記憶體只保留 k 筆候選。
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from financial_analysis import FinancialCalculator
+
+def select_top_k(values, k, largest=True):
+    """
+    values 中最大 (或最小) 的 k 個位置，依名次排列，NaN 不列入。
+    以 argpartition 在 O(n) 內選出 k 筆，只對這 k 筆排序。
+    """
+    values = np.asarray(values, dtype=float)
+    candidates = np.flatnonzero(~np.isnan(values))
+    k = min(k, len(candidates))
+    if k <= 0:
+        return candidates[:0]
+    keys = -values[candidates] if largest else values[candidates]
+    if k < len(candidates):
+        part = np.argpartition(keys, k - 1)[:k]
+        candidates, keys = candidates[part], keys[part]
+    return candidates[np.argsort(keys, kind='stable')]
+
+def fraction_count(n, fraction):
+    """n 筆中「前 (或後) fraction」的筆數，至少 1 筆 (n 為 0 時為 0)。"""
+    return min(n, max(1, math.ceil(n * fraction))) if n else 0
+
+class Ranker:
+    """
+    scores 為 (公司數, len(keys)) 的分數矩陣 (欄位依 keys 排列)，labels 為結果中顯示的識別欄位。
+    weights 為 {分析鍵: 權重}，未列出的項目權重為 0；綜合分數 = 加權平均 (權重總和為 0 時為 NaN)。
+    """
+    def __init__(self, scores, keys=FinancialCalculator.ANALYSIS_KEYS, labels=None):
+        self.scores = np.ascontiguousarray(scores, dtype=float)
+        self.keys = tuple(keys)
+        if self.scores.ndim != 2 or self.scores.shape[1] != len(self.keys):
+            raise ValueError(f"scores must have shape (n, {len(self.keys)})")
+        self.labels = labels if labels is not None else pd.DataFrame(index=pd.RangeIndex(len(self.scores)))
+
+    @classmethod
+    def from_frame(cls, scored, keys=FinancialCalculator.ANALYSIS_KEYS):
+        """由 score_companies 的結果建立 (識別欄位為不屬於比率、分數與報告的欄位)。"""
+        reserved = set(FinancialCalculator.RATIO_KEYS) | set(keys) | {'report'}
+        labels = scored[[c for c in scored.columns if c not in reserved]].reset_index(drop=True)
+        return cls(scored[list(keys)].to_numpy(dtype=float), keys, labels)
+
+    def __len__(self):
+        return len(self.scores)
+
+    def weight_vector(self, weights):
+        return np.array([float(weights.get(key, 0.0)) for key in self.keys])
+
+    def composite(self, weights):
+        """所有公司的加權綜合分數 (一次矩陣乘法)。"""
+        vector = self.weight_vector(weights)
+        total = vector.sum()
+        if total == 0:
+            return np.full(len(self), np.nan)
+        return self.scores @ (vector / total)
+
+    def top(self, k, weights, largest=True):
+        """加權綜合分數最高 (或最低) 的 k 家公司：回傳 (列位置, 綜合分數)。"""
+        composite = self.composite(weights)
+        positions = select_top_k(composite, k, largest)
+        return positions, composite[positions]
+
+    def bottom_fraction(self, key, fraction=0.1):
+        """單項分數最低的 fraction (例如 0.1 即最後 10%) 的公司列位置，由低到高排列。"""
+        values = self.scores[:, self.keys.index(key)]
+        return select_top_k(values, fraction_count(int((~np.isnan(values)).sum()), fraction), largest=False)
+
+    def frame(self, positions, composite=None):
+        """positions 所指的列：名次 + 識別欄位 (+ 綜合分數) + 六項分數，索引為原始列位置。"""
+        result = self.labels.iloc[positions].copy()
+        result.index = pd.Index(positions, name='row')
+        result.insert(0, 'rank', np.arange(1, len(positions) + 1))
+        if composite is not None:
+            result['composite'] = composite
+        for i, key in enumerate(self.keys):
+            result[key] = self.scores[positions, i]
+        return result
+
+class TopKAccumulator:
+    """
+    逐批累積前 k 名 (例如串流評分時)：每批先以 argpartition 選出該批的前 k 名，
+    再與目前的候選合併重選，記憶體中只保留 k 筆候選與其資料列。
+    """
+    def __init__(self, k, largest=True):
+        self.k = k
+        self.largest = largest
+        self.values = np.empty(0)
+        self.rows = None
+
+    def add(self, values, rows):
+        """values 為這一批的排名依據 (陣列)，rows 為對應的 DataFrame (列順序相同)。"""
+        values = np.asarray(values, dtype=float)
+        best = select_top_k(values, self.k, self.largest)
+        batch_rows = rows.iloc[best]
+        merged_values = np.concatenate([self.values, values[best]])
+        merged_rows = batch_rows if self.rows is None else pd.concat([self.rows, batch_rows])
+        keep = select_top_k(merged_values, self.k, self.largest)
+        self.values, self.rows = merged_values[keep], merged_rows.iloc[keep]
+
+    def result(self):
+        """目前的前 k 名 (依名次排列) 的資料列。"""
+        return self.rows if self.rows is not None else pd.DataFrame()
@@ -0,0 +1,63 @@
+"""
+整批匯出綜合報告：每家公司一份報告文字，加上所有公司評分的合併 CSV，打包成一個 ZIP。
+
+報告由 score_chunks_parallel 逐批在多個程序中產生，主程序收到一批就立刻寫入 ZIP，
+合併的評分 CSV 先逐批寫入暫存檔，最後才放進 ZIP (ZIP 同時只能寫入一個檔案)。
+記憶體中只保留處理中的幾批資料，與公司總數無關。
+"""
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+
+from financial_analysis import FinancialCalculator
+from parallel import score_chunks_parallel
+
+SCORES_ENTRY = 'scores.csv'
+REPORTS_DIR = 'reports'
+# 檔名中不允許的字元 (Windows 與 ZIP 工具的限制) 以及空白，一律換成底線
+_UNSAFE_NAME_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+MAX_NAME_LENGTH = 80
+
+def report_entry_name(number, identifiers):
+    """
+    ZIP 中報告的檔名：序號 + 識別欄位 (例如公司名稱、代號)，例如 reports/000001_2330_台積電.txt。
+    序號保證檔名不重複，也讓解壓後的順序與輸入相同。
+    """
+    label = '_'.join(str(value) for value in identifiers if value == value and str(value).strip()) # value == value 排除 NaN
+    label = _UNSAFE_NAME_CHARS.sub('_', label).strip('_.')[:MAX_NAME_LENGTH]
+    return f"{REPORTS_DIR}/{number:06d}_{label}.txt" if label else f"{REPORTS_DIR}/{number:06d}.txt"
+
+def write_report_archive(chunks, target, workers=None, column_titles=None, progress=None):
+    """
+    評分 chunks (一連串 DataFrame) 中的每家公司並寫出 ZIP 至 target (路徑或可寫入的二進位檔案物件)。
+    ZIP 內含 reports/ 下每家公司一份 .txt 報告，以及 scores.csv (識別欄位 + 六項分數，
+    欄名可用 column_titles 對應，例如 ANALYSIS_TITLES)。
+    progress(已匯出的報告數) 於每批寫入後呼叫。
+    回傳 {'reports': 報告數, 'seconds': 耗時, 'reports_per_second': 每秒匯出的報告數}。
+    """
+    started = time.perf_counter()
+    count = 0
+    with tempfile.TemporaryFile('w+', encoding='utf-8-sig', newline='') as scores_file, \
+            zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        header = True
+        for result in score_chunks_parallel(chunks, workers, with_ratios=False, with_report=True):
+            reports = result.pop('report')
+            id_columns = [c for c in result.columns if c not in FinancialCalculator.ANALYSIS_KEYS]
+            identifiers = result[id_columns].itertuples(index=False, name=None)
+            for identifier, report in zip(identifiers, reports):
+                count += 1
+                archive.writestr(report_entry_name(count, identifier), report.encode('utf-8'))
+            scores = result.rename(columns=column_titles) if column_titles else result
+            scores.to_csv(scores_file, index=False, header=header)
+            header = False
+            if progress is not None:
+                progress(count)
+
+        scores_file.seek(0)
+        with archive.open(SCORES_ENTRY, 'w') as entry:
+            # TemporaryFile 以 utf-8-sig 寫入，重新以 bytes 讀取時 BOM 會一併保留，讓 Excel 正確辨識中文
+            shutil.copyfileobj(scores_file.buffer, entry)
+    seconds = time.perf_counter() - started
+    return {'reports': count, 'seconds': seconds, 'reports_per_second': count / seconds if seconds > 0 else 0.0}
@@ -0,0 +1,162 @@
+"""
+投資組合篩選器：以排序索引 (sorted index) 對比率、評分欄位做範圍查詢與前 k 名查詢。
+
+每個欄位第一次被查詢時建立一次排序索引 (argsort)，之後的查詢只需 searchsorted (O(log n))
+加上取出符合的位置，不需在每次 Streamlit 重新執行時掃描整個 DataFrame。
+多個條件時先以索引估算每個條件的筆數，從最少的條件開始，其餘條件只檢查剩下的候選列。
+欄位與欄位的比較 (例如 roe > industry_avg_roe) 無法使用索引，只在候選列上直接比較。
+"""
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+from financial_analysis import FinancialCalculator, FinancialDataTable
+from ranking import select_top_k
+
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le, '==': operator.eq}
+_CONDITION = re.compile(r'^\s*([A-Za-z_]\w*)\s*(>=|<=|==|>|<)\s*(\S+)\s*$')
+
+def parse_query(text):
+    """
+    將 "roe > industry_avg_roe, debt_ratio < 0.5, liquidity > 70" 解析為 [(欄位, 運算子, 數值或欄位名稱)]。
+    條件以逗號或換行分隔 (全部須同時成立)；格式錯誤時拋出 ValueError。
+    """
+    conditions = []
+    for part in re.split(r'[,\n]', text):
+        if not part.strip():
+            continue
+        match = _CONDITION.match(part)
+        if match is None:
+            raise ValueError(f"無法解析篩選條件: {part.strip()}")
+        column, op, operand = match.groups()
+        try:
+            operand = float(operand)
+        except ValueError:
+            if not re.fullmatch(r'[A-Za-z_]\w*', operand):
+                raise ValueError(f"無法解析篩選條件: {part.strip()}") from None
+        else:
+            if operand != operand: # NaN 與任何值比較都不成立 (±inf 可以)
+                raise ValueError(f"篩選條件的數值不可為 NaN: {part.strip()}")
+        conditions.append((column, op, operand))
+    return conditions
+
+class SortedIndex:
+    """單一欄位的排序索引：order 為由小到大的列位置，NaN 排在最後且不會被任何範圍查詢選中。"""
+    def __init__(self, values):
+        self.order = np.argsort(values, kind='stable')
+        self.sorted_values = values[self.order]
+        self.valid_count = len(values) - int(np.isnan(self.sorted_values).sum())
+
+    def bounds(self, op, value):
+        """符合「欄位 op value」的列在 order 中的範圍 [start, stop)；value 為 NaN 時沒有符合的列。"""
+        if value != value:
+            return 0, 0
+        search = lambda side: int(np.searchsorted(self.sorted_values[:self.valid_count], value, side=side))
+        if op == '>':
+            return search('right'), self.valid_count
+        if op == '>=':
+            return search('left'), self.valid_count
+        if op == '<':
+            return 0, search('left')
+        if op == '<=':
+            return 0, search('right')
+        return search('left'), search('right') # ==
+
+    def positions(self, op, value):
+        start, stop = self.bounds(op, value)
+        return self.order[start:stop]
+
+    def count(self, op, value):
+        start, stop = self.bounds(op, value)
+        return stop - start
+
+class Screener:
+    """
+    對一組等長的數值欄位提供篩選與前 k 名查詢，labels 為結果中顯示的識別欄位 (例如公司名稱)。
+    排序索引依需要建立並保留在物件中，同一個 Screener 可在多次查詢 (與 Streamlit 重新執行) 之間重複使用。
+    """
+    def __init__(self, columns, labels=None):
+        self.columns = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+        lengths = {len(values) for values in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError("all columns must have the same length")
+        self.size = lengths.pop() if lengths else 0
+        self.labels = labels if labels is not None else pd.DataFrame(index=pd.RangeIndex(self.size))
+        self._indexes = {}
+
+    @classmethod
+    def from_scores(cls, df, scored):
+        """
+        由輸入數據 df (DataFrame 或 FinancialDataTable) 與 score_companies(df, with_ratios=True) 的結果建立：
+        可查詢的欄位包含 FinancialData 的純量欄位、所有比率與六項分數。
+        """
+        columns = {key: FinancialCalculator.batch_column(df, key) for key in FinancialDataTable.FIELDS}
+        for key in FinancialCalculator.RATIO_KEYS + FinancialCalculator.ANALYSIS_KEYS:
+            columns[key] = scored[key].to_numpy(dtype=float)
+        id_columns = [c for c in scored.columns if c not in columns and c != 'report']
+        return cls(columns, scored[id_columns].reset_index(drop=True))
+
+    def __len__(self):
+        return self.size
+
+    def index(self, column):
+        """column 的排序索引 (第一次使用時建立)。"""
+        if column not in self._indexes:
+            self._indexes[column] = SortedIndex(self._column(column))
+        return self._indexes[column]
+
+    def _column(self, column):
+        if column not in self.columns:
+            raise KeyError(f"沒有可篩選的欄位 '{column}'")
+        return self.columns[column]
+
+    def filter(self, conditions):
+        """
+        回傳同時符合所有條件 [(欄位, 運算子, 數值或欄位名稱)] 的列位置 (由小到大)。
+        數值條件以排序索引取出，先處理筆數最少的條件；欄位比較與其餘條件只在候選列上檢查。
+        """
+        for column, op, operand in conditions:
+            self._column(column)
+            if isinstance(operand, str):
+                self._column(operand)
+            if op not in OPERATORS:
+                raise ValueError(f"不支援的運算子 '{op}'")
+        indexed = sorted(((c, op, v) for c, op, v in conditions if not isinstance(v, str)),
+                         key=lambda condition: self.index(condition[0]).count(condition[1], condition[2]))
+        if indexed:
+            column, op, value = indexed[0]
+            candidates = np.sort(self.index(column).positions(op, value))
+            remaining = indexed[1:] + [c for c in conditions if isinstance(c[2], str)]
+        else:
+            candidates = np.arange(self.size)
+            remaining = list(conditions)
+        for column, op, operand in remaining:
+            if not len(candidates):
+                break
+            other = self.columns[operand][candidates] if isinstance(operand, str) else operand
+            with np.errstate(invalid='ignore'):
+                candidates = candidates[OPERATORS[op](self.columns[column][candidates], other)]
+        return candidates
+
+    def top_k(self, column, k, largest=True, among=None):
+        """
+        column 最大 (或最小) 的 k 列位置，依名次排列，NaN 不列入。
+        among 為候選列位置 (例如 filter 的結果)；未指定時直接取排序索引的兩端，不需再排序。
+        """
+        if among is None:
+            index = self.index(column)
+            valid = index.order[:index.valid_count]
+            return valid[::-1][:k] if largest else valid[:k]
+        among = np.asarray(among)
+        return among[select_top_k(self._column(column)[among], k, largest)]
+
+    def frame(self, positions, columns=()):
+        """positions 所指的列：識別欄位 + 指定的欄位，索引為原始列位置。"""
+        result = self.labels.iloc[positions].copy()
+        result.index = pd.Index(positions, name='row')
+        for column in columns:
+            if column not in result.columns:
+                result[column] = self._column(column)[positions]
+        return result
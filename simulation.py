@@ -0,0 +1,157 @@
+"""
+蒙地卡羅敏感度模擬：對單一公司的 FinancialData 欄位加上估計誤差，觀察六項評分的分布。
+
+每個情境 (scenario) 是一列：未擾動的欄位以 np.broadcast_to 共用同一個數值 (不佔額外記憶體)，
+擾動的欄位乘上依分布抽樣的係數，整批交給 calculate_ratios_batch 與 score_batch，
+10 萬個情境只是一次向量化計算，沒有逐情境的 Python 迴圈。
+"""
+import numpy as np
+import pandas as pd
+
+from financial_analysis import CONCLUSION_SCORE_EDGES, HISTORY_KEY, FinancialCalculator, FinancialData, FinancialDataTable
+
+# 支援的分布：抽出乘在原始數值上的係數
+#   normal    係數 ~ 1 + N(0, 參數)，參數為相對標準差
+#   uniform   係數 ~ U(1 - 參數, 1 + 參數)
+#   lognormal 係數 ~ exp(N(0, 參數))，係數恆為正 (不會改變正負號)
+DISTRIBUTIONS = ('normal', 'uniform', 'lognormal')
+
+# 預設擾動的欄位：{欄位: (分布, 參數)}
+DEFAULT_PERTURBATIONS = {
+    'operating_cash_flow': ('normal', 0.10),
+    'inventory': ('normal', 0.10),
+    'accounts_receivable': ('normal', 0.10),
+    'net_profit_after_tax': ('normal', 0.05),
+    'operating_revenue': ('normal', 0.03),
+}
+
+DEFAULT_SCENARIOS = 10000
+
+# 結論與分數無關的分析 (CONCLUSION_SCORE_EDGES 以外) 使用的一般分數區間，並非任何評估的門檻
+GENERIC_SCORE_BAND_EDGES = (40.0, 70.0)
+
+def score_band_edges(key):
+    """分析 key 的評分區間門檻 (分數 >= 門檻即進入較高的區間)：有結論門檻時使用該門檻，否則為一般區間。"""
+    return CONCLUSION_SCORE_EDGES.get(key, GENERIC_SCORE_BAND_EDGES)
+
+def band_labels(edges):
+    """區間名稱，例如 (20, 30) → ("低於 20", "20 ~ 30", "30 以上")。"""
+    edges = [f"{edge:g}" for edge in edges]
+    return (f"低於 {edges[0]}", *(f"{low} ~ {high}" for low, high in zip(edges, edges[1:])), f"{edges[-1]} 以上")
+
+def draw_factors(distribution, parameter, size, rng):
+    """依分布抽出 size (整數或形狀) 個乘法係數。"""
+    if distribution == 'normal':
+        return 1.0 + rng.normal(0.0, parameter, size)
+    if distribution == 'uniform':
+        return rng.uniform(1.0 - parameter, 1.0 + parameter, size)
+    if distribution == 'lognormal':
+        return rng.lognormal(0.0, parameter, size)
+    raise ValueError(f"不支援的分布 '{distribution}' (支援 {', '.join(DISTRIBUTIONS)})")
+
+def scenario_table(financial_data, perturbations, scenarios, rng):
+    """
+    建立 scenarios 列的 FinancialDataTable 與每個擾動欄位的係數 {欄位: 陣列}。
+    近三年營業現金流 (HISTORY_KEY) 也可擾動，每一年各自抽樣；係數記錄三年的平均。
+    """
+    base = FinancialDataTable.from_records([financial_data])
+    columns = {key: np.broadcast_to(base[key], (scenarios,)) for key in base.FIELDS}
+    history = np.broadcast_to(base.history, (scenarios, base.history.shape[1]))
+    factors = {}
+    for key, (distribution, parameter) in perturbations.items():
+        if key == HISTORY_KEY:
+            year_factors = draw_factors(distribution, parameter, history.shape, rng)
+            history = history * year_factors
+            factors[key] = year_factors.mean(axis=1)
+        elif key in columns:
+            factors[key] = draw_factors(distribution, parameter, scenarios, rng)
+            columns[key] = columns[key] * factors[key]
+        else:
+            raise KeyError(f"FinancialData 沒有欄位 '{key}'")
+    lengths = np.broadcast_to(base.history_lengths, (scenarios,))
+    return FinancialDataTable.from_arrays(columns, history, lengths), factors
+
+class SimulationResult:
+    """
+    模擬結果：scores 為每個情境的六項分數，base_scores 為未擾動時的分數，factors 為各擾動欄位的係數。
+    band_edges 為 {分析鍵: 區間門檻}，未列出的分析使用 score_band_edges()。
+    """
+    def __init__(self, scores, base_scores, factors, band_edges=None):
+        self.scores = scores
+        self.base_scores = base_scores
+        self.factors = factors
+        band_edges = band_edges or {}
+        self.band_edges = {key: tuple(band_edges.get(key, score_band_edges(key))) for key in scores.columns}
+
+    def __len__(self):
+        return len(self.scores)
+
+    def summary(self):
+        """每項分析的基準分數、平均、標準差與 5% / 50% / 95% 分位數。"""
+        values = self.scores.to_numpy()
+        p5, p50, p95 = np.percentile(values, [5, 50, 95], axis=0)
+        return pd.DataFrame({
+            'base': self.base_scores, 'mean': values.mean(axis=0), 'std': values.std(axis=0),
+            'p5': p5, 'p50': p50, 'p95': p95,
+        }, index=self.scores.columns)
+
+    def _bands(self, key, values):
+        return np.searchsorted(np.asarray(self.band_edges[key]), values, side='right')
+
+    def band_probabilities(self):
+        """
+        每項分析一列：區間門檻 'edges'、門檻的依據 'basis' ('conclusion' 為結論改變的分數，'generic' 為一般區間)、
+        基準分數所在的區間 'base_band'，以及落在較低 / 相同 / 較高區間的機率；'crossing' 為跨出基準區間的機率。
+        """
+        rows = {}
+        for key in self.scores.columns:
+            bands = self._bands(key, self.scores[key].to_numpy())
+            base_band = int(self._bands(key, self.base_scores[key]))
+            rows[key] = {
+                'edges': " / ".join(f"{edge:g}" for edge in self.band_edges[key]),
+                'basis': 'conclusion' if self.band_edges[key] == CONCLUSION_SCORE_EDGES.get(key) else 'generic',
+                'base_band': band_labels(self.band_edges[key])[base_band],
+                'below': (bands < base_band).mean(), 'same': (bands == base_band).mean(),
+                'above': (bands > base_band).mean(), 'crossing': (bands != base_band).mean(),
+            }
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+    def band_distribution(self, key):
+        """單項分數落在各區間的機率 (DataFrame：區間名稱 → 情境比例)。"""
+        edges = self.band_edges[key]
+        counts = np.bincount(self._bands(key, self.scores[key].to_numpy()), minlength=len(edges) + 1)
+        return pd.DataFrame({'share': counts / len(self)}, index=pd.Index(band_labels(edges), name='band'))
+
+    def sensitivity(self):
+        """
+        各擾動欄位的係數與各項分數的相關係數 (情境之間)，絕對值越大表示該欄位的誤差對分數影響越大。
+        分數沒有變化的項目為 0。
+        """
+        factors = np.column_stack(list(self.factors.values()))
+        scores = self.scores.to_numpy()
+        factor_dev = factors - factors.mean(axis=0)
+        score_dev = scores - scores.mean(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = (factor_dev.T @ score_dev) / np.outer(np.sqrt((factor_dev ** 2).sum(axis=0)), np.sqrt((score_dev ** 2).sum(axis=0)))
+        return pd.DataFrame(np.nan_to_num(correlation), index=list(self.factors), columns=self.scores.columns)
+
+    def histogram(self, key, bins=20):
+        """單項分數的分布 (DataFrame：區間起點 → 情境比例)，分數範圍為 0 ~ 100。"""
+        counts, edges = np.histogram(self.scores[key].to_numpy(), bins=bins, range=(0, 100))
+        return pd.DataFrame({'share': counts / len(self)}, index=pd.Index(edges[:-1], name='score'))
+
+def simulate(financial_data, perturbations=None, scenarios=DEFAULT_SCENARIOS, seed=None, band_edges=None):
+    """
+    對 financial_data (FinancialData 或 dict) 執行 scenarios 個情境的蒙地卡羅模擬。
+    perturbations 為 {欄位: (分布, 參數)}，預設為 DEFAULT_PERTURBATIONS；seed 固定時結果可重現。
+    band_edges 可指定部分分析的評分區間門檻 {分析鍵: 門檻}，其餘使用 score_band_edges()。
+    """
+    if not isinstance(financial_data, FinancialData):
+        financial_data = FinancialData.from_record(financial_data)
+    perturbations = DEFAULT_PERTURBATIONS if perturbations is None else perturbations
+    rng = np.random.default_rng(seed)
+
+    table, factors = scenario_table(financial_data, perturbations, scenarios, rng)
+    scores = FinancialCalculator.score_batch(table)
+    base_scores = FinancialCalculator.score_batch(FinancialDataTable.from_records([financial_data])).iloc[0]
+    return SimulationResult(scores, base_scores, factors, band_edges)
@@ -0,0 +1,234 @@
+"""
+本機的 SQLite 資料庫：保存每家公司每一期的 FinancialData 快照、比率與六項 assess_* 評估結果。
+
+三個資料表都以 (公司, 期別) 為主鍵：
+    snapshots  每個 FinancialData 欄位一欄，外加快照的雜湊值 data_hash 與更新時間
+    ratios     每個比率一欄
+    results    每項評估一列 (分數、結論，以及完整的評估結果 JSON)，另以 (analysis, score) 建立索引供依分數查詢
+載入時比對 data_hash：數據沒有變動就直接沿用資料庫中的結果；有變動時單一公司只重算受影響的評估
+(IncrementalAnalyzer)，多公司只重新評分有變動的列。
+"""
+from datetime import datetime
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from financial_analysis import HISTORY_KEY, FinancialCalculator, FinancialData, FinancialDataTable, score_companies
+from incremental import IncrementalAnalyzer
+
+STORE_ENV = 'FINANCIAL_ANALYZER_DB'
+DEFAULT_STORE_PATH = 'financial_analyzer.db'
+DEFAULT_PERIOD = '' # 未指定期別時使用
+
+_FIELD_COLUMNS = ', '.join(f'{key} REAL' for key in FinancialDataTable.FIELDS)
+_RATIO_COLUMNS = ', '.join(f'{key} REAL' for key in FinancialCalculator.RATIO_KEYS)
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS snapshots (
+    company TEXT NOT NULL, period TEXT NOT NULL, data_hash INTEGER NOT NULL, updated_at TEXT NOT NULL,
+    {_FIELD_COLUMNS}, {HISTORY_KEY} TEXT,
+    PRIMARY KEY (company, period)
+);
+CREATE TABLE IF NOT EXISTS ratios (
+    company TEXT NOT NULL, period TEXT NOT NULL, {_RATIO_COLUMNS},
+    PRIMARY KEY (company, period)
+);
+CREATE TABLE IF NOT EXISTS results (
+    company TEXT NOT NULL, period TEXT NOT NULL, analysis TEXT NOT NULL,
+    score REAL, conclusion TEXT, result TEXT,
+    PRIMARY KEY (company, period, analysis)
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_period ON snapshots (period);
+CREATE INDEX IF NOT EXISTS results_by_score ON results (analysis, score);
+"""
+
+def default_store_path():
+    """環境變數 FINANCIAL_ANALYZER_DB 指定的路徑，未設定時為目前目錄下的 financial_analyzer.db。"""
+    return os.environ.get(STORE_ENV) or DEFAULT_STORE_PATH
+
+def _combine(hashes, values):
+    return hashes * np.uint64(1000003) ^ pd.util.hash_array(np.ascontiguousarray(values, dtype=float))
+
+def snapshot_hashes(df):
+    """
+    每家公司 FinancialData 的 64 位元雜湊值 (int64 陣列)，df 為 DataFrame 或 FinancialDataTable。
+    先依計算器的規則轉換欄位，所以同樣的數據不論來自手動輸入或檔案、CSV 字串或列表，雜湊值都相同；
+    多年度現金流只納入實際的年數 (補齊用的 NaN 不影響雜湊值)。
+    """
+    table = df if isinstance(df, FinancialDataTable) else FinancialDataTable.from_frame(df)
+    hashes = np.zeros(len(table), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for key in table.FIELDS:
+            hashes = _combine(hashes, table[key])
+        for year in range(table.history.shape[1]):
+            hashes = np.where(year < table.history_lengths, _combine(hashes, table.history[:, year]), hashes)
+    return hashes.view(np.int64)
+
+def _history_text(values):
+    return ','.join(repr(float(v)) for v in values)
+
+def _optional_float(value):
+    return float('nan') if value is None else value
+
+class FinancialStore:
+    """
+    path 為資料庫檔案路徑 (':memory:' 為僅存在記憶體中的資料庫)，未指定時使用 default_store_path()。
+    同一個連線可在多個執行緒 (例如 Streamlit 的多個工作階段) 間共用，所有存取以鎖保護。
+    """
+    def __init__(self, path=None):
+        self.path = path or default_store_path()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, snapshot_rows, ratio_rows, result_rows):
+        fields = FinancialDataTable.FIELDS + (HISTORY_KEY,)
+        snapshot_sql = (f"INSERT OR REPLACE INTO snapshots (company, period, data_hash, updated_at, {', '.join(fields)}) "
+                        f"VALUES ({', '.join('?' * (len(fields) + 4))})")
+        ratio_sql = (f"INSERT OR REPLACE INTO ratios (company, period, {', '.join(FinancialCalculator.RATIO_KEYS)}) "
+                     f"VALUES ({', '.join('?' * (len(FinancialCalculator.RATIO_KEYS) + 2))})")
+        with self._lock, self._connection:
+            self._connection.executemany(snapshot_sql, snapshot_rows)
+            self._connection.executemany(ratio_sql, ratio_rows)
+            self._connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", result_rows)
+
+    def save(self, company, period, financial_data, ratios, results):
+        """保存單一公司一期的 FinancialData、比率 (dict) 與六項評估結果 (assess_all 的 dict)。"""
+        company, period = str(company), str(period)
+        table = FinancialDataTable.from_records([financial_data])
+        snapshot = (company, period, int(snapshot_hashes(table)[0]), datetime.now().isoformat(timespec='seconds'),
+                    *(float(table[key][0]) for key in table.FIELDS), _history_text(table.get_value(0, HISTORY_KEY)))
+        ratio_row = (company, period, *(ratios.get(key) for key in FinancialCalculator.RATIO_KEYS))
+        result_rows = [(company, period, key, result['score'], result['conclusion'],
+                        json.dumps(result, ensure_ascii=False, default=str))
+                       for key, result in results.items()]
+        self._write([snapshot], [ratio_row], result_rows)
+
+    def load(self, company, period=DEFAULT_PERIOD):
+        """
+        讀取單一公司一期的資料，回傳 {'financial_data', 'ratios', 'results', 'data_hash', 'updated_at'}；
+        沒有資料時回傳 None。只有分數 (由 score_frame 保存) 而沒有完整評估結果時 'results' 為 None。
+        """
+        company, period = str(company), str(period)
+        with self._lock:
+            cursor = self._connection.execute("SELECT * FROM snapshots WHERE company = ? AND period = ?", (company, period))
+            snapshot = cursor.fetchone()
+            if snapshot is None:
+                return None
+            snapshot = dict(zip([d[0] for d in cursor.description], snapshot))
+            cursor = self._connection.execute("SELECT * FROM ratios WHERE company = ? AND period = ?", (company, period))
+            ratio_row = cursor.fetchone()
+            ratio_names = [d[0] for d in cursor.description]
+            result_rows = self._connection.execute(
+                "SELECT analysis, result FROM results WHERE company = ? AND period = ?", (company, period)).fetchall()
+
+        financial_data = FinancialData.from_record({key: snapshot[key] for key in FinancialData().data if key in snapshot})
+        ratios = {}
+        if ratio_row is not None:
+            ratios = {key: _optional_float(value) for key, value in zip(ratio_names, ratio_row) if key in FinancialCalculator.RATIO_KEYS}
+        results = {analysis: json.loads(result) for analysis, result in result_rows if result is not None}
+        if any(key not in results for key in FinancialCalculator.ANALYSIS_KEYS):
+            results = None
+        return {'financial_data': financial_data, 'ratios': ratios, 'results': results,
+                'data_hash': snapshot['data_hash'], 'updated_at': snapshot['updated_at']}
+
+    def analyze(self, company, period, financial_data, instrumentation=None):
+        """
+        分析單一公司一期並保存結果，回傳 (ratios, results, 重新計算的評估鍵列表)。
+        資料庫中的快照與 financial_data 相同時直接回傳保存的結果 (不重新計算)；
+        不同時以 IncrementalAnalyzer 只重算輸入有變動的評估。
+        """
+        stored = self.load(company, period)
+        if stored is not None and stored['results'] is not None \
+                and stored['data_hash'] == int(snapshot_hashes(FinancialDataTable.from_records([financial_data]))[0]):
+            return stored['ratios'], stored['results'], []
+        analyzer = IncrementalAnalyzer(FinancialCalculator(financial_data))
+        previous_ratios = previous_results = None
+        if stored is not None:
+            analyzer.mark_analyzed(stored['financial_data'].data)
+            previous_ratios, previous_results = stored['ratios'], stored['results']
+        ratios, results, recomputed = analyzer.run(previous_ratios, previous_results, instrumentation)
+        self.save(company, period, financial_data, ratios, results)
+        return ratios, results, recomputed
+
+    def _stored_hashes(self, companies, periods):
+        """(公司, 期別) 各列在資料庫中快照的雜湊值 (int64 陣列) 與是否存在的遮罩。"""
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TEMP TABLE IF NOT EXISTS request_keys (position INTEGER, company TEXT, period TEXT)")
+            self._connection.execute("DELETE FROM request_keys")
+            self._connection.executemany("INSERT INTO request_keys VALUES (?, ?, ?)", zip(range(len(companies)), companies, periods))
+            rows = self._connection.execute(
+                "SELECT k.position, s.data_hash FROM request_keys k "
+                "JOIN snapshots s ON s.company = k.company AND s.period = k.period").fetchall()
+        hashes = np.zeros(len(companies), dtype=np.int64)
+        found = np.zeros(len(companies), dtype=bool)
+        if rows:
+            positions, stored = np.array(rows, dtype=np.int64).T
+            hashes[positions], found[positions] = stored, True
+        return hashes, found
+
+    def score_frame(self, df, company_column, period_column=None):
+        """
+        多公司版本的 score_companies(df)，並將結果保存至資料庫：df 每列一家公司，company_column (與 period_column) 為鍵。
+        只有新的或快照雜湊值不同的列寫回資料庫；資料庫中相同的快照 (包括單一公司分析保存的完整評估結果) 保持不變。
+        整批分數一律以向量化計算：2 萬家公司評分約 0.05 秒，由資料庫讀回比率與分數反而需要約 0.5 秒。
+        回傳 (與 score_companies 相同的結果, 寫回的列數)。
+        """
+        companies = df[company_column].astype(str).tolist()
+        periods = df[period_column].astype(str).tolist() if period_column else [DEFAULT_PERIOD] * len(df)
+        table = FinancialDataTable.from_frame(df)
+        hashes = snapshot_hashes(table)
+        stored, found = self._stored_hashes(companies, periods)
+        changed = np.flatnonzero(~found | (stored != hashes))
+
+        scored = score_companies(df)
+        if len(changed):
+            subset = FinancialDataTable.from_arrays({key: table[key][changed] for key in table.FIELDS},
+                                                    table.history[changed], table.history_lengths[changed])
+            self._write_scores(subset, [companies[i] for i in changed], [periods[i] for i in changed],
+                               hashes[changed], scored.iloc[changed])
+        return scored, len(changed)
+
+    def _write_scores(self, table, companies, periods, hashes, computed):
+        updated_at = datetime.now().isoformat(timespec='seconds')
+        field_values = [table[key].tolist() for key in table.FIELDS]
+        histories = [_history_text(table.history[i, :table.history_lengths[i]]) for i in range(len(table))]
+        snapshot_rows = zip(companies, periods, hashes.tolist(), [updated_at] * len(table), *field_values, histories)
+        ratio_rows = zip(companies, periods, *(computed[key].tolist() for key in FinancialCalculator.RATIO_KEYS))
+        result_rows = [(company, period, key, score, None, None)
+                       for key in FinancialCalculator.ANALYSIS_KEYS
+                       for company, period, score in zip(companies, periods, computed[key].tolist())]
+        self._write(snapshot_rows, ratio_rows, result_rows)
+
+    def entries(self, limit=None):
+        """資料庫中的公司與期別 (依更新時間由新到舊，limit 為最多筆數) 及六項分數。"""
+        with self._lock:
+            snapshots = pd.read_sql_query("SELECT company, period, updated_at FROM snapshots ORDER BY updated_at DESC LIMIT ?",
+                                          self._connection, params=(-1 if limit is None else limit,))
+            scores = pd.read_sql_query(
+                "SELECT r.company, r.period, r.analysis, r.score FROM "
+                "(SELECT company, period FROM snapshots ORDER BY updated_at DESC LIMIT ?) s "
+                "JOIN results r ON r.company = s.company AND r.period = s.period",
+                self._connection, params=(-1 if limit is None else limit,))
+        scores = scores.pivot(index=['company', 'period'], columns='analysis', values='score')
+        return snapshots.join(scores.reindex(columns=FinancialCalculator.ANALYSIS_KEYS), on=['company', 'period'])
+
+    def delete(self, company, period=DEFAULT_PERIOD):
+        company, period = str(company), str(period)
+        with self._lock, self._connection:
+            for table in ('snapshots', 'ratios', 'results'):
+                self._connection.execute(f"DELETE FROM {table} WHERE company = ? AND period = ?", (company, period))
@@ -0,0 +1,309 @@
+"""
+多期財務數據的時間序列模型：每家公司 N 期 (年或季) 的數據存在同一個連續陣列中。
+
+FinancialData 以 prev_year_* / prev_* 與 three_year_operating_cash_flows 等固定欄位保存歷史，
+只能表達「今年與去年」。FinancialTimeSeries 改存每期實際申報的欄位 (PERIOD_FIELDS)，
+形狀為 (欄位數, 公司數, 期數)，期別由舊到新排列；prev_* 欄位與近三年營業現金流由相鄰期別推導。
+成長率、平均餘額、周轉率變化與各期評分都以整個陣列一次計算，
+例如全市場 10 年的比率與評分是一次 calculate_ratios_batch / score_batch，而不是重跑 10 次。
+"""
+import operator
+
+import numpy as np
+import pandas as pd
+
+from financial_analysis import FinancialCalculator, FinancialDataTable, _safe_divide
+
+# 每期實際申報的欄位；prev_* 欄位由前一期推導，不需另外輸入
+PERIOD_FIELDS = tuple(key for key in FinancialDataTable.FIELDS if not key.startswith('prev_'))
+
+# prev_* 欄位 → 前一期的原始欄位
+PREVIOUS_FIELDS = {
+    'prev_year_net_profit_after_tax': 'net_profit_after_tax',
+    'prev_year_operating_revenue': 'operating_revenue',
+    'prev_year_inventory': 'inventory',
+    'prev_year_accounts_receivable': 'accounts_receivable',
+    'prev_total_assets': 'total_assets',
+}
+# prev_* 欄位 → 前一期的比率 (calculate_ratios 的鍵)
+PREVIOUS_RATIOS = {
+    'prev_year_inventory_turnover_rate': 'inventory_turnover_rate',
+    'prev_year_accounts_receivable_turnover_days': 'accounts_receivable_turnover_days',
+    'prev_year_gross_profit_margin': 'gross_profit_margin',
+    'prev_net_debt': 'net_debt',
+}
+# 推導 three_year_operating_cash_flows 時使用的期數
+CASH_FLOW_HISTORY_PERIODS = 3
+
+# 滾動指標 (rolling_metrics 的鍵) 的顯示名稱
+ROLLING_METRIC_TITLES = {
+    'ttm_revenue': "近四季營收 (TTM)", 'ttm_net_profit': "近四季稅後淨利 (TTM)",
+    'ttm_revenue_growth': "TTM 營收年增率", 'rolling_roe': "滾動 ROE",
+    'ar_days_moving_average': "應收帳款周轉天數 (移動平均)",
+}
+
+# 預設的趨勢警示規則：(說明, rolling_metrics 的鍵, 運算子, 門檻)
+DEFAULT_ALERT_RULES = (
+    ("TTM 營收較一年前衰退超過 10%", 'ttm_revenue_growth', '<', -0.10),
+    ("滾動 ROE 低於 5%", 'rolling_roe', '<', 0.05),
+    ("應收帳款周轉天數移動平均超過 90 天", 'ar_days_moving_average', '>', 90),
+)
+_ALERT_OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+def _shift(values, lag=1, fill=0.0):
+    """沿期別軸 (最後一軸) 向後移 lag 期：結果的第 t 期為原本的第 t - lag 期，前 lag 期以 fill 補齊。"""
+    shifted = np.full(values.shape, fill, dtype=float)
+    if lag < values.shape[-1]:
+        shifted[..., lag:] = values[..., :values.shape[-1] - lag]
+    return shifted
+
+def _rolling_sums(values, valid, window):
+    """
+    沿期別軸的滾動加總與有效期數：以累積和相減 (cumsum[t] - cumsum[t - window]) 計算，
+    每個位置 O(1)，整個序列 O(期數)，不隨 window 變大而變慢。
+    """
+    padded = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+    np.cumsum(np.where(valid, values, 0.0), axis=-1, out=padded[..., 1:])
+    counts = np.zeros(padded.shape, dtype=np.int64)
+    np.cumsum(valid, axis=-1, out=counts[..., 1:])
+    start = np.maximum(np.arange(values.shape[-1]) + 1 - window, 0)
+    return padded[..., 1:] - padded[..., start], counts[..., 1:] - counts[..., start]
+
+class FinancialTimeSeries:
+    """
+    values[欄位, 公司, 期別] 為 float64 連續陣列 (欄位依 PERIOD_FIELDS 排列)，
+    observed[公司, 期別] 標示該公司在該期是否有數據；未申報的期別在計算時視為 0 (與 FinancialData 的預設值相同)，
+    在回傳的比率與評分中則為 NaN。
+    """
+    FIELDS = PERIOD_FIELDS
+
+    def __init__(self, values, companies, periods, observed=None):
+        self.values = np.ascontiguousarray(values, dtype=float)
+        self.companies = pd.Index(companies)
+        self.periods = pd.Index(periods)
+        expected = (len(self.FIELDS), len(self.companies), len(self.periods))
+        if self.values.shape != expected:
+            raise ValueError(f"values must have shape {expected}, got {self.values.shape}")
+        if observed is None:
+            observed = ~np.isnan(self.values).all(axis=0)
+        self.observed = np.asarray(observed, dtype=bool)
+        self._positions = {key: i for i, key in enumerate(self.FIELDS)}
+
+    @classmethod
+    def from_long_frame(cls, df, company_column='company_id', period_column='period'):
+        """
+        由長格式 DataFrame (每列為一家公司的一期) 建立。公司依首次出現的順序排列，期別依排序後由舊到新排列。
+        欄位轉換規則與 FinancialCalculator.batch_column 相同，缺少的欄位以 0 填滿。
+        """
+        company_codes, companies = pd.factorize(df[company_column])
+        period_codes, periods = pd.factorize(df[period_column], sort=True)
+        if (company_codes < 0).any() or (period_codes < 0).any():
+            raise ValueError(f"'{company_column}' 與 '{period_column}' 欄位不可有空值")
+        cells = company_codes * len(periods) + period_codes
+        if len(np.unique(cells)) != len(cells):
+            raise ValueError("每家公司的每個期別只能有一列數據")
+
+        values = np.zeros((len(cls.FIELDS), len(companies), len(periods)))
+        for i, key in enumerate(cls.FIELDS):
+            values[i, company_codes, period_codes] = FinancialCalculator.batch_column(df, key)
+        observed = np.zeros((len(companies), len(periods)), dtype=bool)
+        observed[company_codes, period_codes] = True
+        return cls(values, companies, periods, observed)
+
+    def __len__(self):
+        return len(self.companies)
+
+    @property
+    def n_periods(self):
+        return len(self.periods)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.observed.nbytes
+
+    def field(self, key):
+        """單一欄位的 (公司數, 期數) 檢視，未申報的期別為 0。"""
+        return self.values[self._positions[key]]
+
+    def _values(self, key_or_values):
+        return self.field(key_or_values) if isinstance(key_or_values, str) else np.asarray(key_or_values, dtype=float)
+
+    def to_long_frame(self, company_column='company_id', period_column='period'):
+        """轉回長格式 DataFrame (只含有數據的公司-期別)。"""
+        company_positions, period_positions = np.nonzero(self.observed)
+        df = pd.DataFrame({company_column: self.companies[company_positions], period_column: self.periods[period_positions]})
+        for i, key in enumerate(self.FIELDS):
+            df[key] = self.values[i][company_positions, period_positions]
+        return df
+
+    # --- 跨期別的向量化計算 ---
+    def growth_rate(self, key_or_values, lag=1):
+        """
+        每期相對於 lag 期前的成長率 ((本期 - 前期) / 前期，前期為 0 時為 0，與 calculate_ratios 相同)。
+        回傳 (公司數, 期數)，沒有前期數據的期別為 NaN。key_or_values 可為欄位名稱或 (公司數, 期數) 陣列。
+        """
+        values = self._values(key_or_values)
+        previous = _shift(values, lag)
+        with np.errstate(invalid='ignore', over='ignore'):
+            growth = _safe_divide(values - previous, previous)
+        return np.where(self.observed & _shift(self.observed, lag, fill=False).astype(bool), growth, np.nan)
+
+    def average_balance(self, key):
+        """每期的平均餘額 ((本期 + 前期) / 2，前期為 0 時只用本期，與存貨、應收帳款周轉率的算法相同)。"""
+        values = self.field(key)
+        previous = _shift(values)
+        return np.where(previous != 0, (values + previous) / 2, values)
+
+    def mean(self, key_or_values):
+        """每家公司所有有數據期別的平均值 (忽略 NaN 與 inf)；沒有任何期別時為 NaN。"""
+        values = self._values(key_or_values)
+        valid = self.observed & np.isfinite(values)
+        count = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(valid, values, 0.0).sum(axis=1) / count
+
+    def trend_slope(self, key_or_values):
+        """
+        每家公司各期數值的最小平方法斜率 (每期的平均變化量)，一次算出所有公司。
+        忽略未申報與非有限值的期別；有效期別少於兩期時為 NaN。
+        """
+        values = self._values(key_or_values)
+        valid = self.observed & np.isfinite(values)
+        x = np.broadcast_to(np.arange(self.n_periods, dtype=float), values.shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            count = valid.sum(axis=1)
+            x_mean = np.where(valid, x, 0.0).sum(axis=1) / count
+            y_mean = np.where(valid, values, 0.0).sum(axis=1) / count
+            dx = np.where(valid, x - x_mean[:, None], 0.0)
+            dy = np.where(valid, values - y_mean[:, None], 0.0)
+            slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        return np.where(count >= 2, slope, np.nan)
+
+    # --- 滾動視窗 (例如近四季) ---
+    def rolling_sum(self, key_or_values, window, min_periods=None):
+        """
+        每期往前 window 期 (含本期) 的加總，例如季資料 window=4 即為 TTM。
+        視窗內有效期數 (有數據且為有限值) 少於 min_periods (預設 window) 時為 NaN。
+        """
+        values = self._values(key_or_values)
+        valid = self.observed & np.isfinite(values)
+        sums, counts = _rolling_sums(values, valid, window)
+        return np.where(counts >= (window if min_periods is None else min_periods), sums, np.nan)
+
+    def rolling_mean(self, key_or_values, window, min_periods=None):
+        """每期往前 window 期有效數值的平均 (忽略未申報與 inf)，有效期數少於 min_periods (預設 window) 時為 NaN。"""
+        values = self._values(key_or_values)
+        valid = self.observed & np.isfinite(values)
+        sums, counts = _rolling_sums(values, valid, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts >= (window if min_periods is None else min_periods), sums / counts, np.nan)
+
+    def rolling_metrics(self, window=4, periods_per_year=4):
+        """
+        季資料的滾動趨勢指標 ({鍵: (公司數, 期數) 陣列}，鍵見 ROLLING_METRIC_TITLES)：
+        ttm_revenue / ttm_net_profit 為近 window 期加總，ttm_revenue_growth 為 TTM 營收相對一年前的成長率，
+        rolling_roe 為 TTM 稅後淨利 / 視窗內平均股東權益，
+        ar_days_moving_average 為應收帳款周轉天數的移動平均 (calculate_ratios 以 365 天計算，
+        季資料的單季營收需除以 periods_per_year 換算回實際天數)。年資料請用 window=1, periods_per_year=1。
+        """
+        ttm_revenue = self.rolling_sum('operating_revenue', window)
+        ttm_net_profit = self.rolling_sum('net_profit_after_tax', window)
+        average_equity = self.rolling_mean('shareholders_equity', window)
+        previous_ttm_revenue = _shift(ttm_revenue, periods_per_year, fill=np.nan)
+        with np.errstate(invalid='ignore', over='ignore'):
+            ttm_revenue_growth = np.where(np.isnan(previous_ttm_revenue), np.nan,
+                                          _safe_divide(ttm_revenue - previous_ttm_revenue, previous_ttm_revenue))
+            rolling_roe = np.where(np.isnan(ttm_net_profit) | np.isnan(average_equity), np.nan,
+                                   _safe_divide(ttm_net_profit, average_equity))
+        ar_days = self.ratio_history()['accounts_receivable_turnover_days'] / periods_per_year
+        return {
+            'ttm_revenue': ttm_revenue, 'ttm_net_profit': ttm_net_profit, 'ttm_revenue_growth': ttm_revenue_growth,
+            'rolling_roe': rolling_roe, 'ar_days_moving_average': self.rolling_mean(ar_days, window),
+        }
+
+    def metric_frame(self, metrics, company):
+        """單一公司 (依位置) 各期的指標 DataFrame (索引為期別、欄位為指標顯示名稱)，供趨勢圖使用。"""
+        return pd.DataFrame({ROLLING_METRIC_TITLES.get(key, key): values[company] for key, values in metrics.items()},
+                            index=self.periods)
+
+    def trend_alerts(self, metrics, rules=DEFAULT_ALERT_RULES, period=-1):
+        """
+        以警示規則檢查指定期別 (依位置，預設最新一期) 的指標，所有公司一次比較。
+        回傳觸發的警示 DataFrame (company、period、rule、metric、value)，依規則順序排列。
+        """
+        position = range(self.n_periods)[period]
+        frames = []
+        for description, key, op, threshold in rules:
+            values = metrics[key][:, position]
+            with np.errstate(invalid='ignore'):
+                hit = np.flatnonzero(_ALERT_OPERATORS[op](values, threshold))
+            frames.append(pd.DataFrame({
+                'company': self.companies[hit], 'period': self.periods[position], 'rule': description,
+                'metric': key, 'value': values[hit],
+            }))
+        return pd.concat(frames, ignore_index=True)
+
+    # --- 與既有計算器的銜接 ---
+    def _cash_flow_history(self, operating_cash_flow):
+        """每期的近 CASH_FLOW_HISTORY_PERIODS 期營業現金流 (由舊到新)，第一期之前不足的部分不列入。"""
+        n, p = operating_cash_flow.shape
+        width = min(CASH_FLOW_HISTORY_PERIODS, p)
+        lengths = np.minimum(np.arange(p) + 1, width)
+        history = np.full((n, p, width), np.nan)
+        for lag in range(width):
+            periods = np.arange(lag, p)
+            history[:, periods, lengths[periods] - 1 - lag] = operating_cash_flow[:, periods - lag]
+        return history.reshape(n * p, width), np.tile(lengths, n).astype(np.int16)
+
+    def _stacked(self):
+        """
+        所有公司、所有期別疊成一個 FinancialDataTable (公司優先排列，共 公司數 × 期數 列) 與其比率。
+        每期的比率只用到當期與前一期的原始欄位，因此先算出所有期別的比率，
+        再把前一期的比率填入 prev_* 欄位，評分時即可一次完成。
+        """
+        n, p = len(self), self.n_periods
+        filled = np.where(self.observed, self.values, 0.0)
+        columns = {key: filled[i] for i, key in enumerate(self.FIELDS)}
+        for previous_key, key in PREVIOUS_FIELDS.items():
+            columns[previous_key] = _shift(columns[key])
+        columns['prev_total_liabilities'] = _shift(columns['total_assets'] - columns['shareholders_equity'])
+        history, lengths = self._cash_flow_history(columns['operating_cash_flow'])
+        index = pd.MultiIndex.from_product([self.companies, self.periods], names=['company', 'period'])
+
+        flat = {key: value.reshape(n * p) for key, value in columns.items()}
+        ratios = FinancialCalculator.calculate_ratios_batch(FinancialDataTable.from_arrays(flat, history, lengths, index))
+        # 前一期未申報時 prev_* 比率為 0 (與第一期、FinancialData 的預設值相同)，不沿用補 0 後算出的比率 (例如無限大的週轉天數)
+        previous_observed = _shift(self.observed, fill=False).astype(bool)
+        for previous_key, key in PREVIOUS_RATIOS.items():
+            shifted = _shift(ratios[key].to_numpy().reshape(n, p))
+            flat[previous_key] = np.where(previous_observed, shifted, 0.0).reshape(n * p)
+        return FinancialDataTable.from_arrays(flat, history, lengths, index), ratios
+
+    def stacked_table(self):
+        """所有公司、所有期別 (含推導出的 prev_* 欄位) 的 FinancialDataTable，索引為 (company, period)。"""
+        return self._stacked()[0]
+
+    def period_table(self, period=-1):
+        """
+        單一期別 (依位置，預設最新一期) 的 FinancialDataTable，prev_* 欄位由前一期推導，
+        可直接交給 score_companies、calculate_ratios_batch 等既有的批次函式。
+        """
+        position = range(self.n_periods)[period]
+        rows = np.arange(len(self)) * self.n_periods + position
+        table = self.stacked_table()
+        columns = {key: table[key][rows] for key in table.FIELDS}
+        return FinancialDataTable.from_arrays(columns, table.history[rows], table.history_lengths[rows], self.companies)
+
+    def ratio_history(self):
+        """所有期別的比率：{比率鍵: (公司數, 期數) 陣列}，未申報的期別為 NaN。"""
+        _, ratios = self._stacked()
+        return {key: self._unstack(ratios[key].to_numpy()) for key in FinancialCalculator.RATIO_KEYS}
+
+    def score_history(self):
+        """所有期別的六項評分：{分析鍵: (公司數, 期數) 陣列}，未申報的期別為 NaN。一次 score_batch 算完。"""
+        table, ratios = self._stacked()
+        scores = FinancialCalculator.score_batch(table, ratios)
+        return {key: self._unstack(scores[key].to_numpy()) for key in FinancialCalculator.ANALYSIS_KEYS}
+
+    def _unstack(self, flat):
+        return np.where(self.observed, flat.reshape(len(self), self.n_periods), np.nan)
@@ -1,764 +1,26 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-plt.rcParams['font.sans-serif'] = ['Heiti TC', 'Apple LiGothic', 'Arial Unicode MS']  
-plt.rcParams['axes.unicode_minus'] = False
+import copy
 from datetime import datetime
-import io
-
-# --- 財務數據儲存類別 (No changes needed) ---
-class FinancialData:
-    def __init__(self):
-        # 初始化所有財務數據，提供預設值
-        self.data = {
-            'operating_revenue': 0.0,
-            'cost_of_goods_sold': 0.0,
-            'operating_expenses': 0.0,
-            'net_profit_after_tax': 0.0,
-            'shareholders_equity': 0.0,
-            'total_assets': 0.0,
-            'current_assets': 0.0,
-            'current_liabilities': 0.0,
-            'inventory': 0.0,
-            'accounts_receivable': 0.0,
-            'interest_expense': 0.0,
-            'net_profit_before_tax': 0.0,
-            'operating_cash_flow': 0.0,
-            'investing_cash_flow': 0.0,
-            'financing_cash_flow': 0.0,
-            'capital_expenditures': 0.0,
-            'cash_dividends_paid': 0.0,
-            'non_recurring_gain_loss': 0.0,
-            'total_profit': 0.0, # 通常指稅前利潤或淨利潤，用於非經常性損益佔比
-            'cash_and_equivalents': 0.0,
-            'short_term_borrowing': 0.0,
-            'accounts_payable_days': 0.0, # 假設已知或手動輸入
-            'prev_year_net_profit_after_tax': 0.0,
-            'prev_year_operating_revenue': 0.0,
-            'prev_year_inventory': 0.0, # 去年存貨
-            'prev_year_accounts_receivable': 0.0, # 去年應收帳款
-            'prev_year_inventory_turnover_rate': 0.0,
-            'prev_year_accounts_receivable_turnover_days': 0.0,
-            'prev_year_gross_profit_margin': 0.0, # 去年毛利率
-            'industry_avg_roe': 0.0,
-            'industry_avg_revenue_growth_rate': 0.0,
-            'cost_of_debt_interest_rate': 0.0, # 負債利率，例如 0.03 代表 3%
-            'prev_total_liabilities': 0.0,
-            'prev_total_assets': 0.0,
-            'prev_net_debt': 0.0,
-            'three_year_operating_cash_flows': [0.0, 0.0, 0.0] # 近三年營業現金流
-        }
-
-    def update_data(self, key, value):
-        if key in self.data:
-            self.data[key] = value
-        else:
-            st.warning(f"Warning: Key '{key}' not found in financial data.")
-
-    def get_data(self, key):
-        return self.data.get(key, 0.0)
-
-# --- 財務計算與評估類別 (No changes needed) ---
-class FinancialCalculator:
-    def __init__(self, financial_data):
-        self.financial_data = financial_data
-
-    def get_value(self, key, default=0.0):
-        """Helper to safely get data values, converting to float."""
-        value = self.financial_data.get_data(key)
-        if value is None or (isinstance(value, str) and value.strip() == ''):
-            return default
-        try:
-            return float(value)
-        except ValueError:
-            return default
-        except TypeError: # For cases where value might be a list but float is expected
-            return default
-
-    def calculate_ratios(self):
-        data = self.financial_data.data
-        ratios = {}
-
-        # 獲取所有必要的原始數據
-        operating_revenue = self.get_value('operating_revenue')
-        cost_of_goods_sold = self.get_value('cost_of_goods_sold')
-        operating_expenses = self.get_value('operating_expenses')
-        net_profit_after_tax = self.get_value('net_profit_after_tax')
-        shareholders_equity = self.get_value('shareholders_equity')
-        total_assets = self.get_value('total_assets')
-        net_profit_before_tax = self.get_value('net_profit_before_tax')
-        interest_expense = self.get_value('interest_expense')
-        operating_cash_flow = self.get_value('operating_cash_flow')
-        capital_expenditures = self.get_value('capital_expenditures')
-        financing_cash_flow = self.get_value('financing_cash_flow')
-        current_assets = self.get_value('current_assets')
-        current_liabilities = self.get_value('current_liabilities')
-        inventory = self.get_value('inventory')
-        accounts_receivable = self.get_value('accounts_receivable')
-        cash_and_equivalents = self.get_value('cash_and_equivalents')
-        short_term_borrowing = self.get_value('short_term_borrowing')
-        prev_year_net_profit_after_tax = self.get_value('prev_year_net_profit_after_tax')
-        prev_year_operating_revenue = self.get_value('prev_year_operating_revenue')
-        prev_year_inventory = self.get_value('prev_year_inventory')
-        prev_year_accounts_receivable = self.get_value('prev_year_accounts_receivable')
-        total_liabilities = self.get_value('total_assets') - self.get_value('shareholders_equity') # 總負債 = 總資產 - 股東權益
-        prev_total_liabilities = self.get_value('prev_total_liabilities')
-        prev_total_assets = self.get_value('prev_total_assets')
-
-
-        # 獲利能力比率
-        ratios['gross_profit_margin'] = (operating_revenue - cost_of_goods_sold) / operating_revenue if operating_revenue != 0 else 0.0
-        ratios['operating_profit_margin'] = (operating_revenue - cost_of_goods_sold - operating_expenses) / operating_revenue if operating_revenue != 0 else 0.0
-        ratios['net_profit_margin'] = net_profit_after_tax / operating_revenue if operating_revenue != 0 else 0.0
-        ratios['roe'] = net_profit_after_tax / shareholders_equity if shareholders_equity != 0 else 0.0
-        ratios['roa'] = net_profit_after_tax / total_assets if total_assets != 0 else 0.0
-        ratios['net_profit_growth_rate'] = (net_profit_after_tax - prev_year_net_profit_after_tax) / prev_year_net_profit_after_tax if prev_year_net_profit_after_tax != 0 else 0.0
-        ratios['revenue_growth_rate'] = (operating_revenue - prev_year_operating_revenue) / prev_year_operating_revenue if prev_year_operating_revenue != 0 else 0.0
-        ratios['profit_cash_content'] = operating_cash_flow / net_profit_after_tax if net_profit_after_tax != 0 else 0.0
-
-        # 償債能力比率
-        ratios['current_ratio'] = current_assets / current_liabilities if current_liabilities != 0 else 0.0
-        ratios['quick_ratio'] = (current_assets - inventory) / current_liabilities if current_liabilities != 0 else 0.0
-        ebit = net_profit_before_tax + interest_expense
-        ratios['interest_coverage_ratio'] = ebit / interest_expense if interest_expense != 0 else float('inf')
-
-        # 營運效率比率
-        avg_inventory = (inventory + prev_year_inventory) / 2 if prev_year_inventory != 0 else inventory
-        ratios['inventory_turnover_rate'] = cost_of_goods_sold / avg_inventory if avg_inventory != 0 else 0.0
-        ratios['inventory_turnover_days'] = 365 / ratios['inventory_turnover_rate'] if ratios['inventory_turnover_rate'] != 0 else float('inf')
-
-        avg_accounts_receivable = (accounts_receivable + prev_year_accounts_receivable) / 2 if prev_year_accounts_receivable != 0 else accounts_receivable
-        ratios['accounts_receivable_turnover_rate'] = operating_revenue / avg_accounts_receivable if avg_accounts_receivable != 0 else 0.0
-        ratios['accounts_receivable_turnover_days'] = 365 / ratios['accounts_receivable_turnover_rate'] if ratios['accounts_receivable_turnover_rate'] != 0 else float('inf')
-
-        # 現金流量相關比率
-        ratios['free_cash_flow'] = operating_cash_flow - capital_expenditures
-        ratios['financing_to_operating_cash_flow_ratio'] = financing_cash_flow / operating_cash_flow if operating_cash_flow != 0 else 0.0
-
-        # 負債比率
-        ratios['debt_ratio'] = total_liabilities / total_assets if total_assets != 0 else 0.0
-
-        # 財務費用佔營收比例
-        ratios['financial_expense_to_revenue_ratio'] = interest_expense / operating_revenue if operating_revenue != 0 else 0.0
-
-        # 淨負債
-        ratios['net_debt'] = total_liabilities - cash_and_equivalents
-
-        return ratios
-
-    def assess_profit_quality(self, ratios):
-        data = self.financial_data.data
-        score = 0
-        conclusion_list = [] # 使用列表來儲存多個結論
-        details = {}
-
-        # 獲取所需數據
-        profit_cash_content = ratios.get('profit_cash_content', 0.0)
-        ar_turnover_days = ratios.get('accounts_receivable_turnover_days', float('inf'))
-        non_recurring_gain_loss = self.get_value('non_recurring_gain_loss')
-        total_profit_for_non_recurring = self.get_value('total_profit') # 假設這個是計算非經常性損益佔比的基準利潤
-        net_profit_growth_rate = ratios.get('net_profit_growth_rate', 0.0)
-
-        # 計算非經常性損益佔比
-        non_recurring_profit_ratio = abs(non_recurring_gain_loss) / total_profit_for_non_recurring if total_profit_for_non_recurring != 0 else 0.0
-
-        # --- 是/否判斷 ---
-        is_profit_cash_content_high = profit_cash_content >= 1.0 # 獲利含金量 >= 100%
-        is_ar_days_short = ar_turnover_days <= 45 # 應收帳款周轉天數 <= 45天
-        is_non_recurring_low = non_recurring_profit_ratio <= 0.10 # 非經常性損益佔比 <= 10%
-        is_net_profit_growing = net_profit_growth_rate > 0 # 淨利成長率 > 0%
-
-        details['獲利含金量 >= 100%?'] = "是" if is_profit_cash_content_high else "否"
-        details['應收帳款周轉天數 <= 45天?'] = "是" if is_ar_days_short else "否"
-        details['非經常性損益佔比 <= 10%?'] = "是" if is_non_recurring_low else "否"
-        details['淨利成長率 > 0%?'] = "是" if is_net_profit_growing else "否"
-
-        # --- 評分邏輯 (根據文件中的分數區間) ---
-        # 1. 獲利含金量 (30%)
-        if profit_cash_content >= 1.0: score += 30
-        elif 0.8 <= profit_cash_content < 1.0: score += 24 # 80% of 30
-        elif 0.7 <= profit_cash_content < 0.8: score += 21 # 70% of 30
-        elif 0.5 <= profit_cash_content < 0.7: score += 16.5 # 55% of 30
-        elif 0.35 <= profit_cash_content < 0.5: score += 9 # 30% of 30
-        elif 0.0 <= profit_cash_content < 0.35: score += 6 # 20% of 30
-        else: score += 3 # 10% of 30 (for negative)
-
-        # 2. 應收帳款周轉天數 (30%)
-        if ar_turnover_days <= 20: score += 30
-        elif 21 <= ar_turnover_days <= 45: score += 24 # 80% of 30
-        elif 46 <= ar_turnover_days <= 90: score += 18 # 60% of 30
-        elif 91 <= ar_turnover_days <= 140: score += 12 # 40% of 30
-        else: score += 3 # 10% of 30
-
-        # 3. 非經常性損益佔比 <= 10% (15%)
-        score += (15 if is_non_recurring_low else 7.5) # 100% or 50% of 15
-
-        # 4. 淨利成長率 (25%)
-        if net_profit_growth_rate >= 0.70: score += 25
-        elif 0.30 <= net_profit_growth_rate < 0.70: score += 20 # 80% of 25
-        elif 0.0 <= net_profit_growth_rate < 0.30: score += 15 # 60% of 25
-        else: score += 10 # 40% of 25 (for negative)
-
-        # --- 結論 (根據是/否判斷組合) ---
-        if is_profit_cash_content_high and is_ar_days_short and is_non_recurring_low and is_net_profit_growing:
-            conclusion_list.append("獲利品質極佳。公司盈利能力強勁且穩定，現金流健康，應收帳款管理高效。")
-        elif is_profit_cash_content_high and is_ar_days_short and is_non_recurring_low and not is_net_profit_growing:
-            conclusion_list.append("獲利品質良好但成長動能不足。盈利質量高，但淨利潤未能持續增長，需關注市場變化。")
-        elif not is_profit_cash_content_high and is_ar_days_short and is_non_recurring_low and is_net_profit_growing:
-            conclusion_list.append("獲利品質有待提升。淨利潤增長強勁且應收帳款管理良好，但獲利含金量不足，需警惕利潤虛增。")
-        elif not is_ar_days_short and is_non_recurring_low:
-            conclusion_list.append("獲利品質存在疑慮，應收帳款回款慢是主要問題，可能影響現金流。")
-        elif not is_non_recurring_low:
-            conclusion_list.append("獲利品質不穩定，非經常性損益佔比較高，可能掩蓋核心業務的真實表現。")
-        else:
-            conclusion_list.append("獲利品質綜合判斷，需根據具體數據進一步分析。")
-
-        return {
-            'score': min(score, 100),
-            'conclusion': " ".join(conclusion_list),
-            'details': details
-        }
-
-    def assess_cash_flow(self, ratios):
-        data = self.financial_data.data
-        score = 0
-        conclusion_list = []
-        details = {}
-
-        # 獲取所需數據
-        operating_cash_flow = self.get_value('operating_cash_flow')
-        free_cash_flow = ratios.get('free_cash_flow', 0.0)
-        net_profit_after_tax = self.get_value('net_profit_after_tax')
-        investing_cash_flow = self.get_value('investing_cash_flow')
-        financing_cash_flow = self.get_value('financing_cash_flow')
-        capital_expenditures = self.get_value('capital_expenditures')
-        three_year_operating_cash_flows = data.get('three_year_operating_cash_flows', [0.0, 0.0, 0.0]) # 確保是列表
-
-        # 計算指標
-        op_cf_vs_net_profit = operating_cash_flow / net_profit_after_tax if net_profit_after_tax != 0 else 0.0
-        investing_cf_ratio_to_op_cf = investing_cash_flow / operating_cash_flow if operating_cash_flow != 0 else 0.0
-        financing_cf_ratio_to_op_cf = financing_cash_flow / operating_cash_flow if operating_cash_flow != 0 else 0.0
-
-        # --- 是/否判斷 ---
-        is_op_cf_positive = operating_cash_flow > 0
-        is_fcf_positive = free_cash_flow > 0
-        is_op_cf_gt_net_profit = op_cf_vs_net_profit > 1.0 # 營業現金流 > 淨利
-        is_investing_cf_negative = investing_cash_flow < 0 # 投資現金流為負 (通常表示投資擴張)
-        is_financing_cf_negative = financing_cash_flow < 0 # 融資現金流為負 (通常表示還債或回購股票)
-
-        details['營業現金流為正?'] = "是" if is_op_cf_positive else "否"
-        details['自由現金流為正?'] = "是" if is_fcf_positive else "否"
-        details['營業現金流 > 淨利?'] = "是" if is_op_cf_gt_net_profit else "否"
-        details['投資現金流為負?'] = "是" if is_investing_cf_negative else "否"
-        details['融資現金流為負?'] = "是" if is_financing_cf_negative else "否"
-
-        # --- 評分邏輯 (根據文件中的分數區間) ---
-        # 1. 營業活動現金流 (30%)
-        if operating_cash_flow > 5000000: score += 30
-        elif 2000000 <= operating_cash_flow <= 5000000: score += 21 # 70% of 30
-        elif 500000 <= operating_cash_flow < 2000000: score += 12 # 40% of 30
-        elif 0 <= operating_cash_flow < 500000: score += 7.5 # 25% of 30
-        else: score += 0
-
-        # 2. 自由現金流 (25%)
-        if free_cash_flow > 3000000: score += 25
-        elif 1000000 <= free_cash_flow <= 3000000: score += 17.5 # 70% of 25
-        elif 500000 <= free_cash_flow < 1000000: score += 10 # 40% of 25
-        elif -500000 <= free_cash_flow < 500000: score += 6.25 # 25% of 25
-        else: score += 0
-
-        # 3. 營業現金流 > 淨利 (20%)
-        if op_cf_vs_net_profit >= 1.5: score += 20
-        elif 1.0 <= op_cf_vs_net_profit < 1.5: score += 14 # 70% of 20
-        elif 0.7 <= op_cf_vs_net_profit < 1.0: score += 8 # 40% of 20
-        elif 0.3 <= op_cf_vs_net_profit < 0.7: score += 5 # 25% of 20
-        else: score += 0
-
-        # 4. 投資現金流為負 (15%) - 這裡文件描述較模糊，假設是投資現金流佔營業現金流的比例，且為負數
-        # 如果投資現金流是負的，且佔營業現金流的比例在合理範圍內，表示公司有在投資
-        if investing_cf_ratio_to_op_cf < 0 and abs(investing_cf_ratio_to_op_cf) <= 0.5: # 負數且佔比不大於50%
-            score += 15
-        elif investing_cf_ratio_to_op_cf < 0 and abs(investing_cf_ratio_to_op_cf) > 0.5: # 負數且佔比較大
-            score += 7.5 # 50% of 15
-        else: # 正數或零
-            score += 0
-
-        # 5. 融資現金流和營運現金流的比例 (10%)
-        if -0.3 <= financing_cf_ratio_to_op_cf <= 0.3: score += 10
-        elif 0.3 < financing_cf_ratio_to_op_cf <= 1.0: score += 8 # 80% of 10
-        elif -1.0 <= financing_cf_ratio_to_op_cf < -0.3: score += 7 # 70% of 10
-        elif financing_cf_ratio_to_op_cf > 1.0: score += 4 # 40% of 10
-        else: score += 3 # 30% of 10 (for < -1.0)
-
-
-        # --- 結論 (根據是/否判斷組合) ---
-        # 邏輯架構（現金流量問題）
-        if is_op_cf_positive and is_fcf_positive and is_op_cf_gt_net_profit and is_investing_cf_negative and is_financing_cf_negative:
-            conclusion_list.append("公司有現金、投資、及有還債能力。現金流狀況極佳，各項指標表現優異，財務健康。")
-        elif is_op_cf_positive and (not is_op_cf_gt_net_profit) and is_investing_cf_negative and (not is_financing_cf_negative) and (not is_fcf_positive):
-            conclusion_list.append("大量進行投資中，期望未來會有回報。此為投資燒錢階段，需關注未來回報情況。")
-        elif (not is_op_cf_positive) and (not is_op_cf_gt_net_profit) and is_investing_cf_negative and (not is_financing_cf_negative) and (not is_fcf_positive):
-            conclusion_list.append("現金流入為負、投資燒錢，風險高。公司現金流狀況非常不佳，需警惕資金斷裂風險。")
-        elif is_op_cf_positive and is_op_cf_gt_net_profit and (not is_investing_cf_negative) and is_financing_cf_negative and is_fcf_positive:
-            conclusion_list.append("有穩定收入了，不再缺錢或借貸，可以開始賺錢了。公司現金流穩健，具備自我造血能力。")
-        elif not is_op_cf_positive:
-            conclusion_list.append("營業現金流為負，即使其他指標尚可，也可能隱藏獲利品質問題。")
-        elif is_op_cf_positive and not is_fcf_positive:
-            conclusion_list.append("營業現金流為正但自由現金流為負，現金在投資或營運上消耗較大，需警惕資金壓力。")
-        elif is_op_cf_positive and is_fcf_positive and not is_op_cf_gt_net_profit:
-            conclusion_list.append("營業現金流為正且自由現金流為正，但未顯著大於淨利，獲利含金量有待提高。")
-        elif is_op_cf_positive and is_fcf_positive and is_op_cf_gt_net_profit and not is_investing_cf_negative:
-            conclusion_list.append("多數指標良好，但投資現金流不是負值，可能表示投資活動不夠積極或沒有大量資本支出。")
-        elif is_op_cf_positive and is_fcf_positive and is_op_cf_gt_net_profit and is_investing_cf_negative and not is_financing_cf_negative:
-            conclusion_list.append("營運與投資現金流表現良好，但融資現金流不是負值，可能意味公司仍在依賴外部融資或有償還外部借款壓力。")
-        else:
-            conclusion_list.append("現金流狀況綜合判斷，需根據具體數據進一步分析。")
-
-        return {
-            'score': min(score, 100),
-            'conclusion': " ".join(conclusion_list),
-            'details': details
-        }
-
-    def assess_liquidity_risk(self, ratios):
-        data = self.financial_data.data
-        score = 0
-        conclusion_list = []
-        details = {}
-
-        # 獲取所需數據
-        current_ratio = ratios.get('current_ratio', 0.0)
-        quick_ratio = ratios.get('quick_ratio', 0.0)
-        operating_cash_flow = self.get_value('operating_cash_flow')
-        cash_and_equivalents = self.get_value('cash_and_equivalents')
-        short_term_borrowing = self.get_value('short_term_borrowing')
-        interest_expense = self.get_value('interest_expense')
-        prev_inventory_turnover_rate = self.get_value('prev_year_inventory_turnover_rate')
-        inventory_turnover_rate = ratios.get('inventory_turnover_rate', 0.0)
-        three_year_operating_cash_flows = data.get('three_year_operating_cash_flows', [0.0, 0.0, 0.0])
-
-        # 計算指標
-        cash_to_short_debt_ratio = cash_and_equivalents / short_term_borrowing if short_term_borrowing != 0 else float('inf')
-        op_cf_to_interest_coverage = operating_cash_flow / interest_expense if interest_expense != 0 else float('inf')
-
-        # 存貨周轉天數變化判斷
-        current_inv_days = 365 / inventory_turnover_rate if inventory_turnover_rate != 0 else float('inf')
-        prev_inv_days = 365 / prev_inventory_turnover_rate if prev_inventory_turnover_rate != 0 else float('inf')
-
-        is_inventory_days_stable_or_down = False
-        if prev_inv_days == float('inf') and current_inv_days == float('inf'):
-            is_inventory_days_stable_or_down = True # 都無限大，視為穩定
-        elif prev_inv_days == float('inf'): # 去年無限大，今年有值，視為改善
-            is_inventory_days_stable_or_down = True
-        elif current_inv_days <= prev_inv_days:
-            is_inventory_days_stable_or_down = True
-
-
-        # --- 是/否判斷 ---
-        is_current_ratio_ok = current_ratio > 2.0
-        is_quick_ratio_ok = quick_ratio > 1.0
-        is_op_cf_positive = operating_cash_flow > 0
-        is_cash_gt_short_debt = cash_to_short_debt_ratio >= 1.0
-        is_op_cf_covers_interest = op_cf_to_interest_coverage > 1.0
-
-        details['流動比率 > 2?'] = "是" if is_current_ratio_ok else "否"
-        details['速動比率 > 1?'] = "是" if is_quick_ratio_ok else "否"
-        details['營業現金流為正?'] = "是" if is_op_cf_positive else "否"
-        details['存貨周轉天數穩定或下降?'] = "是" if is_inventory_days_stable_or_down else "否"
-        details['現金及約當現金 > 短期借款?'] = "是" if is_cash_gt_short_debt else "否"
-        details['營業現金流能覆蓋利息支出?'] = "是" if is_op_cf_covers_interest else "否"
-
-        # --- 評分邏輯 (根據文件中的分數區間) ---
-        # 1. 現金及約當現金 > 短期借款 (25%)
-        if cash_to_short_debt_ratio >= 2.0: score += 25
-        elif 1.0 <= cash_to_short_debt_ratio < 2.0: score += 16.7 # 2/3 of 25
-        elif 0.5 <= cash_to_short_debt_ratio < 1.0: score += 8.3 # 1/3 of 25
-        else: score += 0
-
-        # 2. 營業現金流為正 (25%)
-        positive_op_cf_count = sum(1 for cf in three_year_operating_cash_flows if cf > 0)
-        is_op_cf_growing = all(three_year_operating_cash_flows[i] <= three_year_operating_cash_flows[i+1] for i in range(len(three_year_operating_cash_flows)-1)) if len(three_year_operating_cash_flows) > 1 else False
-
-        if positive_op_cf_count == 3 and is_op_cf_growing: score += 25
-        elif positive_op_cf_count == 3: score += 20 # 80% of 25
-        elif is_op_cf_positive: score += 15 # 60% of 25 (最近一年為正)
-        elif positive_op_cf_count == 2: score += 10 # 40% of 25
-        elif positive_op_cf_count == 1: score += 5 # 20% of 25
-        else: score += 0
-
-        # 3. 流動比率 > 2 (15%)
-        if current_ratio > 3.0: score += 15
-        elif 2.5 <= current_ratio <= 3.0: score += 12 # 80% of 15
-        elif 2.0 <= current_ratio < 2.5: score += 9 # 60% of 15
-        elif 1.5 <= current_ratio < 2.0: score += 6 # 40% of 15
-        elif 1.0 <= current_ratio < 1.5: score += 3 # 20% of 15
-        else: score += 0
-
-        # 4. 存貨周轉天數穩定或下降 (15%)
-        if is_inventory_days_stable_or_down: score += 15
-        else: score += 0
-
-        # 5. 營業現金流能覆蓋利息支出 (10%)
-        if op_cf_to_interest_coverage > 5.0: score += 10
-        elif 3.0 <= op_cf_to_interest_coverage <= 5.0: score += 8 # 80% of 10
-        elif 1.0 <= op_cf_to_interest_coverage < 3.0: score += 6 # 60% of 10
-        elif 0.5 <= op_cf_to_interest_coverage < 1.0: score += 4 # 40% of 10
-        elif 0.2 <= op_cf_to_interest_coverage < 0.5: score += 2 # 20% of 10
-        else: score += 0
-
-        # 6. 速動比率 > 1 (10%)
-        if quick_ratio > 2.0: score += 10
-        elif 1.5 <= quick_ratio <= 2.0: score += 8 # 80% of 10
-        elif 1.2 <= quick_ratio < 1.5: score += 6 # 60% of 10
-        elif 1.0 <= quick_ratio < 1.2: score += 4 # 40% of 10
-        elif 0.7 <= quick_ratio < 1.0: score += 2 # 20% of 10
-        else: score += 0
-
-        # --- 結論 (根據是/否判斷組合) ---
-        # 邏輯架構（流動性風險評估）
-        if is_current_ratio_ok and is_quick_ratio_ok and is_op_cf_positive and is_inventory_days_stable_or_down and is_cash_gt_short_debt and is_op_cf_covers_interest:
-            conclusion_list.append("公司短期流動性充足，無立即償債風險，現金管理穩健。財務狀況非常健康。")
-        elif is_current_ratio_ok and not is_quick_ratio_ok:
-            conclusion_list.append("流動性可能依賴存貨變現，需檢查存貨周轉率是否惡化。應警惕存貨積壓風險。")
-        elif (not is_current_ratio_ok) and (not is_quick_ratio_ok) and is_op_cf_positive:
-            conclusion_list.append("靠著本業現金流維持，但營運一出現問題便陷入資金困境。短期償債能力有疑慮，風險較高。")
-        elif is_current_ratio_ok and is_quick_ratio_ok and (not is_op_cf_positive):
-            conclusion_list.append("償債比率尚可，但現金流異常偏弱，需提防盈餘品質不佳導致短期資金風險。利潤可能未轉化為現金。")
-        elif is_inventory_days_stable_or_down and (not is_current_ratio_ok or not is_quick_ratio_ok or not is_op_cf_positive or not is_cash_gt_short_debt or not is_op_cf_covers_interest):
-            conclusion_list.append("有一定營運效率，但財務結構失衡、現金流不足，風險高。存貨管理良好，但整體流動性仍需改善。")
-        elif not is_op_cf_positive:
-            conclusion_list.append("即使流動比率達標，營運活動未產生現金，可能隱藏獲利品質問題。營業現金流為負是嚴重警訊。")
-        else:
-            conclusion_list.append("流動性風險綜合判斷，需根據具體數據進一步分析。")
-
-        return {
-            'score': min(score, 100),
-            'conclusion': " ".join(conclusion_list),
-            'details': details
-        }
-
-    def assess_debt_solvency(self, ratios):
-        data = self.financial_data.data
-        score = 0
-        conclusion_list = []
-        details = {}
-
-        # 獲取所需數據
-        interest_coverage_ratio = ratios.get('interest_coverage_ratio', 0.0)
-        roa = ratios.get('roa', 0.0)
-        cost_of_debt_interest_rate = self.get_value('cost_of_debt_interest_rate')
-        free_cash_flow = ratios.get('free_cash_flow', 0.0)
-        cash_dividends_paid = self.get_value('cash_dividends_paid')
-        debt_ratio = ratios.get('debt_ratio', 0.0)
-        financial_expense_to_revenue_ratio = ratios.get('financial_expense_to_revenue_ratio', 0.0)
-        prev_total_liabilities = self.get_value('prev_total_liabilities')
-        prev_total_assets = self.get_value('prev_total_assets')
-        prev_debt_ratio = prev_total_liabilities / prev_total_assets if prev_total_assets != 0 else 0.0
-
-        # --- 是/否判斷 ---
-        is_interest_coverage_good = interest_coverage_ratio > 3.0
-        is_roa_higher_than_debt_rate = roa > cost_of_debt_interest_rate if cost_of_debt_interest_rate != 0 else True # 如果沒有負債利率，預設為好
-        is_fcf_sufficient_for_dividend = (free_cash_flow >= cash_dividends_paid and cash_dividends_paid > 0) or (cash_dividends_paid == 0 and free_cash_flow >= 0) # FCF足以支付股利，或無股利且FCF為正
-        is_debt_ratio_high = debt_ratio > 0.50 # 負債比率 > 50%
-        is_financial_expense_high = financial_expense_to_revenue_ratio > 0.05 # 財務費用佔營收比例 > 5%
-        is_debt_ratio_increased = debt_ratio > prev_debt_ratio and prev_debt_ratio != 0 # 負債比率較去年上升
-
-        details['利息保障倍數 > 3?'] = "是" if is_interest_coverage_good else "否"
-        details['ROA > 負債利率?'] = "是" if is_roa_higher_than_debt_rate else "否"
-        details['自由現金流足以支付股利?'] = "是" if is_fcf_sufficient_for_dividend else "否"
-        details['負債比率 > 50%?'] = "是" if is_debt_ratio_high else "否"
-        details['財務費用佔營收比例 > 5%?'] = "是" if is_financial_expense_high else "否"
-        details['負債比率較去年上升?'] = "是" if is_debt_ratio_increased else "否"
-
-        # --- 評分邏輯 (根據文件中的分數區間) ---
-        # 1. 利息保障倍數 (25%)
-        if interest_coverage_ratio > 5.0: score += 25
-        elif 3.0 <= interest_coverage_ratio <= 5.0: score += 20 # 80% of 25
-        elif 1.0 <= interest_coverage_ratio < 3.0: score += 10 # 40% of 25
-        else: score += 0
-
-        # 2. ROA 高於負債利率 (20%)
-        if is_roa_higher_than_debt_rate: score += 20
-        else: score += 0
-
-        # 3. 自由現金流足以支付股利 (20%)
-        if is_fcf_sufficient_for_dividend: score += 20
-        else: score += 0
-
-        # 4. 負債比率 (20%)
-        if debt_ratio < 0.30: score += 20
-        elif 0.30 <= debt_ratio < 0.50: score += 15 # 75% of 20
-        elif 0.50 <= debt_ratio < 0.70: score += 10 # 50% of 20
-        elif 0.70 <= debt_ratio < 0.90: score += 5 # 25% of 20
-        else: score += 0
-
-        # 5. 財務費用佔營收比例 (15%)
-        if financial_expense_to_revenue_ratio < 0.01: score += 15
-        elif 0.01 <= financial_expense_to_revenue_ratio < 0.03: score += 10 # 66% of 15
-        elif 0.03 <= financial_expense_to_revenue_ratio < 0.05: score += 5 # 33% of 15
-        else: score += 0
-
-        # --- 結論 (根據是/否判斷組合) ---
-        # 邏輯架構（負債與償債能力）
-        if is_interest_coverage_good and (not is_debt_ratio_high): # 利息保障倍數「是」且負債比率不高
-            conclusion_list.append("負債少、賺錢亦夠還債，用錢有效率。公司財務結構穩健，償債能力強勁。")
-        elif is_interest_coverage_good and is_debt_ratio_high:
-            conclusion_list.append("雖負債高，但當前獲利足以支撐利息，需關注未來利率變動風險。公司槓桿運用較高，但償債能力暫無問題。")
-        elif is_debt_ratio_high and (not is_fcf_sufficient_for_dividend):
-            conclusion_list.append("高負債下現金生成不足，可能需借新還舊，財務風險升高。公司資金壓力較大，償債能力堪憂。")
-        elif (not is_interest_coverage_good) and (not is_roa_higher_than_debt_rate) and (not is_fcf_sufficient_for_dividend) and (not is_debt_ratio_high) and (not is_financial_expense_high):
-            conclusion_list.append("低負債且償債能力強，但可能過度保守，錯失槓桿獲利機會。公司財務狀況穩健，但成長潛力可能受限。")
-        elif not is_interest_coverage_good:
-            conclusion_list.append("利息保障倍數不足，償債壓力大。負債與償還能力不佳。")
-        elif is_interest_coverage_good and not is_roa_higher_than_debt_rate:
-            conclusion_list.append("雖然利息有保障，但資產報酬率低於負債利率，借款成本高於資產效益。負債與償還能力不佳。")
-        elif is_interest_coverage_good and is_roa_higher_than_debt_rate and not is_fcf_sufficient_for_dividend:
-            conclusion_list.append("有能力賺錢且資產效益高於負債成本，但自由現金流不足以支付股利，資金周轉可能緊張。負債與償還能力不佳。")
-        elif is_interest_coverage_good and is_roa_higher_than_debt_rate and is_fcf_sufficient_for_dividend and is_debt_ratio_high:
-            conclusion_list.append("多數指標良好，但負債比率仍高於50%，存在較高槓桿風險。負債與償還能力不佳。")
-        elif is_interest_coverage_good and is_roa_higher_than_debt_rate and is_fcf_sufficient_for_dividend and (not is_debt_ratio_high) and is_financial_expense_high:
-            conclusion_list.append("償債能力強且負債比率不高，但財務費用佔營收比例過高，顯示財務槓桿使用效率不佳。負債與償還能力不佳。")
-        else:
-            conclusion_list.append("負債與償債能力綜合判斷，需根據具體數據進一步分析。")
-
-        return {
-            'score': min(score, 100),
-            'conclusion': " ".join(conclusion_list),
-            'details': details
-        }
-
-    def assess_operational_efficiency(self, ratios):
-        data = self.financial_data.data
-        score = 0
-        conclusion_list = []
-        details = {}
-
-        # 獲取所需數據
-        inventory_turnover_rate = ratios.get('inventory_turnover_rate', 0.0)
-        prev_inventory_turnover_rate = self.get_value('prev_year_inventory_turnover_rate')
-        accounts_receivable_turnover_days = ratios.get('accounts_receivable_turnover_days', float('inf'))
-        prev_accounts_receivable_turnover_days = self.get_value('prev_year_accounts_receivable_turnover_days')
-        gross_profit_margin = ratios.get('gross_profit_margin', 0.0)
-        prev_gross_profit_margin = self.get_value('prev_year_gross_profit_margin')
-        operating_revenue = self.get_value('operating_revenue')
-        prev_year_operating_revenue = self.get_value('prev_year_operating_revenue')
-        industry_avg_revenue_growth_rate = self.get_value('industry_avg_revenue_growth_rate')
-        accounts_payable_days = self.get_value('accounts_payable_days')
-        # 假設有去年的應付帳款天數，如果沒有則用當前值
-        prev_accounts_payable_days = data.get('prev_year_accounts_payable_days', accounts_payable_days)
-        inventory = self.get_value('inventory')
-        prev_year_inventory = self.get_value('prev_year_inventory')
-        accounts_receivable = self.get_value('accounts_receivable')
-        prev_year_accounts_receivable = self.get_value('prev_year_accounts_receivable')
-
-
-        # 計算指標變化
-        inv_turnover_rate_change_pct = (inventory_turnover_rate - prev_inventory_turnover_rate) / prev_inventory_turnover_rate if prev_inventory_turnover_rate != 0 else 0.0
-        ar_days_change_pct = (accounts_receivable_turnover_days - prev_accounts_receivable_turnover_days) / prev_accounts_receivable_turnover_days if prev_accounts_receivable_turnover_days != 0 else 0.0
-        gross_margin_change_abs = abs(gross_profit_margin - prev_gross_profit_margin)
-        revenue_growth_rate = (operating_revenue - prev_year_operating_revenue) / prev_year_operating_revenue if prev_year_operating_revenue != 0 else 0.0
-        inventory_growth_rate = (inventory - prev_year_inventory) / prev_year_inventory if prev_year_inventory != 0 else 0.0
-        ap_days_change_pct = (accounts_payable_days - prev_accounts_payable_days) / prev_accounts_payable_days if prev_accounts_payable_days != 0 else 0.0
-        ar_growth_rate = (accounts_receivable - prev_year_accounts_receivable) / prev_year_accounts_receivable if prev_year_accounts_receivable != 0 else 0.0
-
-
-        # --- 是/否判斷 ---
-        is_inv_turnover_rate_down = inv_turnover_rate_change_pct < 0 # 存貨周轉率下降 (數值變小)
-        is_gross_margin_stable = gross_margin_change_abs <= 0.03 # 毛利率波動 <= 3% (絕對差值)
-        is_revenue_growth_gt_industry_avg = revenue_growth_rate > industry_avg_revenue_growth_rate
-        is_ar_days_stable_or_down = ar_days_change_pct <= 0 # 應收帳款周轉天數穩定或下降 (數值變小或不變)
-        is_ap_days_normal = abs(ap_days_change_pct) <= 0.05 # 應付帳款天數波動 <= 5%
-        is_revenue_inv_growth_sync = inventory_growth_rate <= revenue_growth_rate # 存貨成長率 <= 營收成長率
-        is_revenue_ar_growth_sync = ar_growth_rate <= revenue_growth_rate # 應收帳款成長率 <= 營收成長率
-
-        details['存貨周轉率下降?'] = "是" if is_inv_turnover_rate_down else "否"
-        details['毛利率維持穩定?'] = "是" if is_gross_margin_stable else "否"
-        details['營收成長率 > 同業平均?'] = "是" if is_revenue_growth_gt_industry_avg else "否"
-        details['應收帳款周轉天數穩定或下降?'] = "是" if is_ar_days_stable_or_down else "否"
-        details['應付帳款天數無明顯異常?'] = "是" if is_ap_days_normal else "否"
-        details['營收與存貨成長同步?'] = "是" if is_revenue_inv_growth_sync else "否"
-        details['營收與應收帳款成長同步?'] = "是" if is_revenue_ar_growth_sync else "否"
-
-
-        # --- 評分邏輯 (根據文件中的分數區間) ---
-        # 1. 存貨周轉率變化 (25%)
-        if inv_turnover_rate_change_pct > 0.10: score += 25
-        elif 0.0 <= inv_turnover_rate_change_pct <= 0.10: score += 20 # 80% of 25
-        elif -0.10 <= inv_turnover_rate_change_pct < 0.0: score += 10 # 40% of 25
-        else: score += 0 # < -0.10
-
-        # 2. 應收帳款周轉天數變化 (20%)
-        if ar_days_change_pct < -0.10: score += 20 # 天數大幅減少
-        elif -0.10 <= ar_days_change_pct <= 0.05: score += 15 # 天數小幅減少或穩定
-        elif 0.05 < ar_days_change_pct <= 0.20: score += 5 # 天數增加 5%~20%
-        else: score += 0 # > 0.20
-
-        # 3. 營收與存貨成長同步性 (20%)
-        if is_revenue_inv_growth_sync: score += 20
-        elif inventory_growth_rate <= revenue_growth_rate + 0.05: score += 10 # 存貨成長率 > 營收成長率 5% 以內
-        elif inventory_growth_rate <= revenue_growth_rate + 0.15: score += 5 # 存貨成長率 > 營收成長率 5%~15%
-        else: score += 0
-
-        # 4. 毛利率穩定性 (15%)
-        if gross_margin_change_abs <= 0.03: score += 15
-        elif gross_margin_change_abs <= 0.05: score += 10 # 波動 3%~5%
-        elif gross_margin_change_abs <= 0.10: score += 5 # 波動 5%~10%
-        else: score += 0
-
-        # 5. 營收成長 vs. 同業 (10%)
-        revenue_growth_gap = revenue_growth_rate - industry_avg_revenue_growth_rate
-        if revenue_growth_gap > 0.02: score += 10
-        elif abs(revenue_growth_gap) <= 0.02: score += 7 # 與同業差距 ±2% 以內
-        elif revenue_growth_gap >= -0.05: score += 3 # 低於同業 2%~5%
-        else: score += 0
-
-        # 6. 應付帳款天數異常 (5%)
-        if is_ap_days_normal: score += 5
-        else: score += 0
-
-        # 7. 營收與應收帳款成長同步 (5%)
-        if is_revenue_ar_growth_sync: score += 5
-        elif ar_growth_rate <= revenue_growth_rate + 0.05: score += 3 # 應收帳款成長率 > 營收成長率 5% 以內
-        else: score += 0
-
-        # --- 結論 (根據是/否判斷組合) ---
-        # 邏輯架構（營運效率與周轉問題）
-        if (not is_inv_turnover_rate_down) and is_gross_margin_stable: # 存貨周轉率未下降(穩定/上升)且毛利率穩定
-            conclusion_list.append("營運效率良好，毛利穩定且存貨周轉情況不錯。這表示公司在營運和盈利能力上表現健康。")
-        elif is_inv_turnover_rate_down and (not is_gross_margin_stable):
-            conclusion_list.append("營運效率惡化，存貨周轉問題與毛利率波動並存，可能面臨滯銷或價格戰壓力。需警惕存貨跌價損失和盈利能力下降。")
-        elif (not is_inv_turnover_rate_down) and is_ar_days_stable_or_down:
-            conclusion_list.append("存貨和應收帳款周轉都表現良好，營運效率較高。這顯示公司資金回籠快，資產利用效率高。")
-        elif is_inv_turnover_rate_down and is_ap_days_normal and (not is_revenue_inv_growth_sync):
-            conclusion_list.append("存貨周轉率下降、營收與存貨成長不同步，儘管應付帳款天數正常，但整體營運效率不佳，可能存在存貨積壓問題。需警惕資金占用和經營風險。")
-        elif (not is_ar_days_stable_or_down) and (not is_revenue_growth_gt_industry_avg) and is_gross_margin_stable:
-            conclusion_list.append("毛利穩定且存貨周轉尚可，但應收帳款周轉惡化且營收成長不及同業。可能需提防客戶付款風險或市場份額流失。")
-        elif is_revenue_growth_gt_industry_avg and is_inv_turnover_rate_down:
-            conclusion_list.append("營收成長雖快，但存貨周轉率下降可能預示著盲目擴張或存貨管理問題。需警惕成長的質量。")
-        elif not (is_inv_turnover_rate_down or is_gross_margin_stable or is_revenue_growth_gt_industry_avg or is_ar_days_stable_or_down or is_ap_days_normal or is_revenue_inv_growth_sync or is_revenue_ar_growth_sync): # 若所有關鍵判斷皆為"否"
-            conclusion_list.append("各項營運效率指標均表現不佳，可能面臨嚴重的經營困境和資金壓力。建議立即審視公司策略。")
-        else:
-            conclusion_list.append("營運效率綜合判斷，需根據具體數據進一步分析。")
-
-        return {
-            'score': min(score, 100),
-            'conclusion': " ".join(conclusion_list),
-            'details': details
-        }
-
-    def assess_investment_expansion(self, ratios):
-        data = self.financial_data.data
-        score = 0
-        conclusion_list = []
-        details = {}
-
-        # 獲取所需數據
-        capital_expenditures = self.get_value('capital_expenditures')
-        operating_cash_flow = self.get_value('operating_cash_flow')
-        roe = ratios.get('roe', 0.0)
-        industry_avg_roe = self.get_value('industry_avg_roe')
-        current_debt_ratio = ratios.get('debt_ratio', 0.0) # 從 ratios 獲取
-        prev_total_liabilities = self.get_value('prev_total_liabilities')
-        prev_total_assets = self.get_value('prev_total_assets')
-        prev_debt_ratio = prev_total_liabilities / prev_total_assets if prev_total_assets != 0 else 0.0
-        free_cash_flow = ratios.get('free_cash_flow', 0.0)
-        net_debt = ratios.get('net_debt', 0.0)
-        prev_net_debt = self.get_value('prev_net_debt')
-        revenue = self.get_value('operating_revenue') # 假設營收用於FCF狀態判斷
-
-        # 計算指標
-        capex_to_ocf_ratio = capital_expenditures / operating_cash_flow if operating_cash_flow != 0 else 0.0
-        roe_diff_from_industry = roe - industry_avg_roe
-        net_debt_change_pct = (net_debt - prev_net_debt) / abs(prev_net_debt) if prev_net_debt != 0 else 0.0
-        debt_ratio_change_pct = (current_debt_ratio - prev_debt_ratio) / prev_debt_ratio if prev_debt_ratio != 0 else 0.0
-
-
-        # --- 是/否判斷 ---
-        is_capex_high = capex_to_ocf_ratio > 0.5 and capital_expenditures > 0 # 資本支出佔營業現金流比例 > 50%
-        is_roe_gt_industry_avg = roe_diff_from_industry > 0 # ROE > 同業平均
-        is_debt_ratio_increased = debt_ratio_change_pct > 0 # 負債比率較去年上升
-        is_fcf_positive = free_cash_flow > 0 # 自由現金流為正
-        is_net_debt_increased = net_debt_change_pct > 0 # 淨負債增加
-
-        details['資本支出佔營業現金流比例 > 50%?'] = "是" if is_capex_high else "否"
-        details['ROE > 同業平均?'] = "是" if is_roe_gt_industry_avg else "否"
-        details['負債比率較去年上升?'] = "是" if is_debt_ratio_increased else "否"
-        details['自由現金流為正?'] = "是" if is_fcf_positive else "否"
-        details['淨負債增加?'] = "是" if is_net_debt_increased else "否"
-
-        # --- 評分邏輯 (根據文件中的分數區間) ---
-        # 1. 自由現金流狀態 (10分)
-        if revenue > 0: # Avoid division by zero
-            if free_cash_flow > 0.3 * revenue: score += 10 # 充裕現金流 (>+30%營收)
-            elif free_cash_flow > 0.1 * revenue: score += 8 # 穩定現金流 (+10%~+30%營收)
-            elif free_cash_flow > 0: score += 5 # 小幅正現金流 (0~+10%營收)
-            else: score += 2 # 負數 (現金流困難)
-        elif free_cash_flow > 0: score += 5
-        else: score += 2
-
-        # 2. 資本支出/營業現金流比例 (10分)
-        if capex_to_ocf_ratio > 0.8: score += 10
-        elif capex_to_ocf_ratio > 0.5: score += 8
-        elif capex_to_ocf_ratio > 0.2: score += 5
-        else: score += 2
-
-        # 3. ROE 超過同業幅度 (10分)
-        if roe_diff_from_industry > 0.05: score += 10 # 高 >5%
-        elif roe_diff_from_industry > 0.02: score += 8 # 高 2%~5%
-        elif abs(roe_diff_from_industry) <= 0.02: score += 5 # ±2%內
-        else: score += 2 # 低於同業
-
-        # 4. 淨負債變動 (10分)
-        if net_debt_change_pct < -0.05: score += 10 # 減少 (>5%)
-        elif -0.05 <= net_debt_change_pct <= 0.05: score += 8 # 小幅增加 (0~5%)
-        elif 0.05 < net_debt_change_pct <= 0.15: score += 5 # 中幅增加 (5%~15%)
-        else: score += 2 # 大幅增加 (>15%)
-
-        # 5. 負債比率變化 (10分)
-        if debt_ratio_change_pct < -0.05: score += 10 # 減少 (>5%)
-        elif -0.05 <= debt_ratio_change_pct <= 0.05: score += 8 # 小幅上升 (0~5%)
-        elif 0.05 < debt_ratio_change_pct <= 0.15: score += 5 # 中幅上升 (5%~15%)
-        else: score += 2 # 大幅上升 (>15%)
-
-        # --- 結論 (根據是/否判斷組合) ---
-        # 邏輯架構（投資與擴張合理性）
-        if not is_fcf_positive: # 邏輯開端是檢查自由現金流
-            conclusion_list.append("自由現金流為負數，不論其他條件，公司短期內都面臨資金壓力，擴張與投資的可能性偏低。")
-            if is_capex_high and is_roe_gt_industry_avg and (not is_debt_ratio_increased) and (not is_net_debt_increased):
-                conclusion_list.append("然而，高資本支出帶來高回報且負債未顯著增加，顯示財務槓桿與資本支出同步提升，營運效率與投資回報皆表現亮眼，屬於具備良好資金運用能力的成長企業。")
-            elif is_capex_high and (not is_roe_gt_industry_avg):
-                conclusion_list.append("儘管高資本支出，但ROE未優於同業，投資效益未顯現，可能過度擴張或專案報酬率低。")
-            elif (not is_capex_high) and (not is_roe_gt_industry_avg) and (not is_debt_ratio_increased) and (not is_net_debt_increased):
-                conclusion_list.append("沒在花錢也沒賺錢，公司太保守或已無成長動能。")
-        else: # 自由現金流為正數
-            if is_capex_high and is_roe_gt_industry_avg:
-                conclusion_list.append("高投資帶來高回報，擴張策略有效。公司處於積極且有效的成長階段。")
-            elif is_capex_high and (not is_roe_gt_industry_avg):
-                conclusion_list.append("投資效益未顯現，可能過度擴張或專案報酬率低。需審慎評估投資專案回報。")
-            elif is_debt_ratio_increased:
-                conclusion_list.append("負債比率較去年上升，需評估是否過度依賴融資支撐擴張。公司擴張策略可能伴隨較高財務風險。")
-            elif is_roe_gt_industry_avg and (not is_capex_high):
-                conclusion_list.append("投資花得少，回報普通但沒亂擴張。公司擴張保守，但投資回報尚可接受。")
-            else:
-                conclusion_list.append("投資與擴張策略穩健，公司在成長的同時保持了健康的財務狀況。")
-
-        # 根據綜合分數給出總結性結論
-        overall_conclusion = ""
-        if score >= 40:
-            overall_conclusion = "積極擴張且資金與回報俱佳，屬於「優質擴張企業」。"
-        elif score >= 30:
-            overall_conclusion = "穩健擴張中，部分指標如槓桿或現金流需持續觀察，屬於「成長型企業」。"
-        elif score >= 20:
-            overall_conclusion = "擴張或回報力道普通，或存在財務壓力，需審慎觀察。"
-        else: # <20分
-            overall_conclusion = "投資與擴張動能低，或槓桿風險過高，應審慎投資。"
-
-        return {
-            'score': min(score, 100),
-            'conclusion': " ".join(conclusion_list),
-            'overall_conclusion': overall_conclusion, # 加入綜合性結論
-            'details': details
-        }
+import hashlib
+import os
+import pickle
+import tempfile
+import uuid
+
+from caching import LRUCache, canonical_hash
+from charts import FONT_REGISTRY, bar_chart_png, bar_chart_spec, line_chart_png, line_chart_spec
+from data_io import file_format, frame_to_parquet_bytes, iter_company_chunks, open_chunk_writer, read_uploaded_table
+from financial_analysis import ANALYSIS_TITLES, FinancialCalculator, FinancialData, generate_overall_report_text, score_companies
+from incremental import IncrementalAnalyzer
+from instrumentation import Instrumentation, configure_logging, enabled_by_env
+from parallel import default_workers, score_chunks_parallel, split_frame
+from ranking import Ranker, TopKAccumulator
+from report_export import write_report_archive
+from screener import Screener, parse_query
+from simulation import DEFAULT_PERTURBATIONS, DISTRIBUTIONS, simulate
+from store import DEFAULT_PERIOD, FinancialStore
+from timeseries import ROLLING_METRIC_TITLES, FinancialTimeSeries
 
 # --- 財務術語小百科字典 (No changes needed) ---
 TERMS_GLOSSARY = {
@@ -820,93 +82,201 @@ TERMS_GLOSSARY = {
 }
 
 # --- Streamlit Helper Functions ---
-def plot_bar_chart(labels, values, title):
+# 上傳檔案解析結果的快取上限 (每個伺服器程序共用)
+UPLOAD_CACHE_MAX_ENTRIES = 16
+UPLOAD_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+@st.cache_resource
+def get_upload_cache():
+    """全程序共用的上傳檔案快取，以 DataFrame 實際佔用的記憶體計算大小。"""
+    return LRUCache(
+        max_entries=UPLOAD_CACHE_MAX_ENTRIES,
+        max_bytes=UPLOAD_CACHE_MAX_BYTES,
+        sizeof=lambda df: int(df.memory_usage(deep=True).sum()),
+    )
+
+def load_uploaded_file(uploaded_file):
     """
-    繪製一個簡單的條形圖並返回 Matplotlib Figure。
+    解析上傳的檔案，並以檔案內容的 SHA-256 作為快取鍵：
+    同一份檔案在每個伺服器程序只解析一次，所有 session 共用 (回傳的 DataFrame 請勿直接修改)。
     """
-    plt.rcParams['font.sans-serif'] = ['Microsoft JhengHei', 'Arial Unicode MS', 'SimHei']
-    plt.rcParams['axes.unicode_minus'] = False
-
-    fig, ax = plt.subplots(figsize=(8, 5)) # Increased size for better readability
-    bars = ax.bar(labels, values, color='skyblue')
-    ax.set_title(title + " - 關鍵指標", fontsize=14)
-    ax.tick_params(axis='x', rotation=45, labelsize=10)  # ✅ 正確
-    ax.yaxis.get_major_formatter().set_scientific(False)
-
-    # 根據數值範圍調整y軸標籤格式
-    if values: # Check if values list is not empty
-        max_val = max(values) if values else 0
-        min_val = min(values) if values else 0
-        if max_val > 1000:
-            ax.ticklabel_format(style='plain', axis='y', useOffset=False)
-            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'{x:,.0f}'))
-        elif -1.0 <= min_val and max_val <= 1.0 and not all(v == 0 for v in values):
-            ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda y, _: '{:.0%}'.format(y)))
-
-    plt.tight_layout() # Adjust layout to prevent labels overlapping
-    return fig
-
-def generate_overall_report_text(calculator, ratios, *analysis_results):
+    raw_bytes = uploaded_file.getvalue()
+    cache_key = (hashlib.sha256(raw_bytes).hexdigest(), file_format(uploaded_file.name))
+
+    def parse():
+        with get_instrumentation().stage('parse_upload', bytes=len(raw_bytes)):
+            return read_uploaded_table(uploaded_file.name, raw_bytes)
+    return get_upload_cache().get_or_compute(cache_key, parse)
+
+# 超過此大小的 CSV 不整份解析，只預覽前幾列，評分時以串流方式逐批處理
+STREAMING_UPLOAD_BYTES = 50 * 1024 * 1024
+STREAMING_CHUNK_ROWS = 20000
+STREAMING_PREVIEW_ROWS = 5
+# 串流評分時保留的綜合分數 (六項平均) 前幾名
+STREAMING_TOP_K = 100
+
+def is_streaming_upload(uploaded_file):
+    return file_format(uploaded_file.name) == 'csv' and uploaded_file.size > STREAMING_UPLOAD_BYTES
+
+def preview_uploaded_file(uploaded_file):
+    """只讀取檔案的前 STREAMING_PREVIEW_ROWS 列。"""
+    uploaded_file.seek(0)
+    return next(iter_company_chunks(uploaded_file, STREAMING_PREVIEW_ROWS, file_name=uploaded_file.name))
+
+def stream_score_upload(uploaded_file):
     """
-    生成綜合報告的文本內容。
+    串流評分大型 CSV：逐批讀取、評分並寫入磁碟上的暫存 CSV，記憶體中只保留目前這一批，
+    同時以 TopKAccumulator 保留六項平均分數最高的 STREAMING_TOP_K 家公司。
+    回傳 {'path': 暫存檔路徑, 'rows': 公司數, 'name': 上傳檔名, 'top': 前幾名的 DataFrame}。
     """
-    fd = calculator.financial_data
-    report_lines = []
-
-    report_lines.append(f"===== 綜合財務分析報告 ({datetime.now().strftime('%Y-%m-%d %H:%M')}) =====\n\n")
-    report_lines.append("--- 關鍵財務比率一覽 ---\n")
-
-    key_ratios_to_report = {
-        'gross_profit_margin': '毛利率', 'operating_profit_margin': '營業利益率',
-        'net_profit_margin': '淨利率', 'roe': '股東權益報酬率 (ROE)',
-        'roa': '總資產報酬率 (ROA)', 'net_profit_growth_rate': '淨利成長率',
-        'revenue_growth_rate': '營收成長率', 'profit_cash_content': '獲利含金量',
-        'current_ratio': '流動比率', 'quick_ratio': '速動比率',
-        'interest_coverage_ratio': '利息保障倍數', 'inventory_turnover_rate': '存貨周轉率',
-        'accounts_receivable_turnover_days': '應收帳款周轉天數', 'free_cash_flow': '自由現金流',
-        'debt_ratio': '負債比率', 'financial_expense_to_revenue_ratio': '財務費用佔營收比例',
-        'net_debt': '淨負債', 'accounts_payable_days': '應付帳款天數',
-    }
-
-    table_data = []
-    for key, display_name in key_ratios_to_report.items():
-        value = ratios.get(key, fd.get_data(key))
-        display_value = ""
-        if isinstance(value, float):
-            if any(s in key for s in ['_margin', '_rate', '_ratio', 'roe', 'roa', 'growth']):
-                display_value = f"{value * 100:.2f}%"
-            elif 'days' in key:
-                display_value = f"{value:.0f}天"
-            elif any(s in key for s in ['cash_flow', 'profit', 'assets', 'debt', 'revenue', 'expenses', 'inventory']):
-                display_value = f"{value:,.2f} 元"
-            else:
-                display_value = f"{value:.2f}"
-        else:
-            display_value = str(value)
-        table_data.append([display_name, display_value])
-
-    # Simple text table formatting
-    if table_data:
-        col_widths = [max(len(str(item)) for item in col) for col in zip(*table_data)]
-        header = " | ".join(str(item).ljust(width) for item, width in zip(["比率名稱", "數值"], col_widths))
-        separator = "-+-".join('-' * width for width in col_widths)
-        report_lines.append(header)
-        report_lines.append(separator)
-        for row in table_data:
-            report_lines.append(" | ".join(str(item).ljust(width) for item, width in zip(row, col_widths)))
-    report_lines.append("\n")
-
-    analysis_titles = [
-        "獲利品質分析", "現金流量分析", "流動性風險評估",
-        "負債與償債能力", "營運效率與周轉", "投資與擴張合理性"
-    ]
-
-    for i, result in enumerate(analysis_results):
-        report_lines.append(f"--- {analysis_titles[i]} 總結 ---")
-        report_lines.append(f"評分: {result.get('score', 0):.2f} / 100")
-        report_lines.append(f"結論: {result.get('conclusion', '無結論')}\n")
-
-    return "\n".join(report_lines)
+    previous = st.session_state.get('stream_result')
+    if previous and os.path.exists(previous['path']):
+        os.remove(previous['path'])
+
+    uploaded_file.seek(0)
+    progress = st.progress(0.0, text="串流評分中…")
+    def report_progress(rows):
+        progress.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0), text=f"已評分 {rows:,} 家公司…")
+
+    # utf-8-sig 與一般下載的 CSV 相同，讓 Excel 正確辨識中文欄位
+    with tempfile.NamedTemporaryFile('w', prefix='batch_scores_', suffix='.csv', delete=False,
+                                     encoding='utf-8-sig', newline='') as output:
+        with get_instrumentation().stage('stream_score', bytes=uploaded_file.size):
+            writer = open_chunk_writer(output, 'csv')
+            rows = 0
+            top = TopKAccumulator(STREAMING_TOP_K)
+            # 欄位與 score_all_companies 相同 (識別欄位 + 六項分數)
+            for result in score_chunks_parallel(iter_company_chunks(uploaded_file, STREAMING_CHUNK_ROWS, file_name=uploaded_file.name),
+                                                workers=1, with_ratios=False):
+                result = result.rename(columns=ANALYSIS_TITLES)
+                writer.write(result)
+                top.add(result[list(ANALYSIS_TITLES.values())].mean(axis=1), result)
+                rows += len(result)
+                report_progress(rows)
+    progress.empty()
+    return {'path': output.name, 'rows': rows, 'name': uploaded_file.name, 'top': top.result()}
+
+# 整批匯出報告時每批的公司數 (每批分送到一個工作程序產生報告)
+REPORT_EXPORT_CHUNK_ROWS = 2000
+# 每次匯出最多使用的工作程序數：匯出在 Streamlit 伺服器程序中執行，多個 session 同時匯出時程序數會相乘，
+# 不像 cli.py 預設使用所有 CPU 核心
+REPORT_EXPORT_MAX_WORKERS = 2
+
+def export_report_archive(chunks, fraction_done, source_name):
+    """
+    平行產生 chunks 中每家公司的綜合報告，寫入磁碟上的暫存 ZIP (含合併的評分 CSV)。
+    fraction_done(已匯出的報告數) 回傳 0~1 的進度。
+    回傳 {'path': 暫存檔路徑, 'name': 上傳檔名, 'reports': 報告數, 'seconds': 耗時, 'reports_per_second': 每秒報告數}。
+    """
+    previous = st.session_state.get('report_archive')
+    if previous and os.path.exists(previous['path']):
+        os.remove(previous['path'])
+
+    progress = st.progress(0.0, text="產生報告中…")
+    def report_progress(count):
+        progress.progress(min(fraction_done(count), 1.0), text=f"已產生 {count:,} 份報告…")
+
+    with tempfile.NamedTemporaryFile('wb', prefix='reports_', suffix='.zip', delete=False) as output:
+        with get_instrumentation().stage('report_export'):
+            workers = min(REPORT_EXPORT_MAX_WORKERS, default_workers())
+            stats = write_report_archive(chunks, output, workers=workers, column_titles=ANALYSIS_TITLES,
+                                         progress=report_progress)
+    progress.empty()
+    return {'path': output.name, 'name': source_name, **stats}
+
+# 已繪製圖表 PNG 的快取上限 (每個伺服器程序共用)
+CHART_CACHE_MAX_ENTRIES = 256
+CHART_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# 分析結果 (比率與六項評估) 的快取上限，以 FinancialData 內容的雜湊值為鍵 (每個伺服器程序共用)
+RESULT_CACHE_MAX_ENTRIES = 4096
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+@st.cache_resource
+def get_result_cache():
+    """全程序共用的分析結果快取：同一份財務數據不論由哪個 session 輸入，比率與評估只計算一次 (以序列化後的長度計算大小)。"""
+    return LRUCache(max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES,
+                    sizeof=lambda value: len(pickle.dumps(value)))
+
+def run_analysis():
+    """
+    執行所有分析並更新 st.session_state 的 ratios / results，回傳重新計算的評估鍵列表。
+    先以 canonical_hash(financial_data.data) 查詢共用快取，命中時取用深複製 (session 之間不共用可變的 dict)；
+    未命中時只重算本 session 中輸入有變動的比率與評估，再存入快取。
+    """
+    cache = get_result_cache()
+    key = canonical_hash(st.session_state.financial_data.data)
+    cached = cache.get(key)
+    if cached is not None:
+        st.session_state.ratios, st.session_state.results = copy.deepcopy(cached)
+        st.session_state.analyzer.mark_analyzed()
+        return []
+    st.session_state.ratios, st.session_state.results, recomputed = st.session_state.analyzer.run(
+        st.session_state.ratios, st.session_state.results, instrumentation=get_instrumentation()
+    )
+    cache.put(key, copy.deepcopy((st.session_state.ratios, st.session_state.results)))
+    return recomputed
+
+@st.cache_resource
+def get_store():
+    """全程序共用的 SQLite 資料庫 (路徑可用環境變數 FINANCIAL_ANALYZER_DB 指定)。"""
+    return FinancialStore()
+
+@st.cache_resource
+def warm_up_fonts():
+    """每個伺服器程序第一次以 matplotlib 繪圖的執行中，在背景解析中文字型並載入 matplotlib 字型快取，不延遲畫面。"""
+    return FONT_REGISTRY.warm_up()
+
+@st.cache_resource
+def get_chart_cache():
+    """全程序共用的圖表 PNG 快取。"""
+    return LRUCache(max_entries=CHART_CACHE_MAX_ENTRIES, max_bytes=CHART_CACHE_MAX_BYTES, sizeof=len)
+
+def _chart_key_values(values):
+    """快取鍵中的數值：NaN 以 None 表示 (NaN != NaN，否則含 NaN 的圖表永遠不會命中快取)。"""
+    return tuple(None if v != v else float(v) for v in values)
+
+def render_bar_chart_png(labels, values, title):
+    """
+    將條形圖輸出為 PNG bytes，並以 (labels, values, title) 快取：
+    內容未變的圖表在重新執行時不會重新繪製。
+    """
+    cache_key = (tuple(labels), _chart_key_values(values), title)
+
+    def render():
+        with get_instrumentation().stage('render_chart', title=title):
+            return bar_chart_png(labels, values, title)
+    return get_chart_cache().get_or_compute(cache_key, render)
+
+def render_line_chart_png(periods, series, title):
+    """趨勢折線圖的 PNG bytes，與條形圖共用同一個快取。"""
+    cache_key = ('line', tuple(str(p) for p in periods),
+                 tuple((name, _chart_key_values(values)) for name, values in series.items()), title)
+
+    def render():
+        with get_instrumentation().stage('render_chart', title=title):
+            return line_chart_png(periods, series, title)
+    return get_chart_cache().get_or_compute(cache_key, render)
+
+# 圖表顯示方式：vega-lite 只送出數據由瀏覽器繪製 (預設)，matplotlib 由伺服器繪製 PNG；預設值可用環境變數設定
+CHART_BACKEND_ENV = 'FINANCIAL_ANALYZER_CHARTS'
+CHART_BACKENDS = {'vega-lite': "互動圖表 (瀏覽器繪製)", 'matplotlib': "PNG 圖片 (伺服器繪製)"}
+
+def chart_backend():
+    default = os.environ.get(CHART_BACKEND_ENV, 'vega-lite')
+    return st.session_state.get('chart_backend', default if default in CHART_BACKENDS else 'vega-lite')
+
+def show_chart(spec, render_png, title):
+    """
+    顯示一張圖表。vega-lite 模式只送出 spec (標籤與數值) 由瀏覽器繪製，重新執行時伺服器不需繪圖；
+    matplotlib 版本保留為「下載 PNG」，render_png 只在點擊下載時才執行。
+    """
+    if chart_backend() == 'matplotlib':
+        st.image(render_png())
+        return
+    st.vega_lite_chart(spec)
+    st.download_button("💾 下載圖表 (PNG)", data=render_png, file_name=f"{title}.png", mime="image/png",
+                       key=f"chart_png_{title}", on_click='ignore')
 
 def display_analysis_tab(result, title, labels, values):
     """
@@ -921,14 +291,229 @@ def display_analysis_tab(result, title, labels, values):
 
     # Chart
     if labels and values:
-        fig = plot_bar_chart(labels, values, title)
-        st.pyplot(fig)
+        show_chart(bar_chart_spec(labels, values, title), lambda: render_bar_chart_png(labels, values, title), title)
     else:
         st.info("無足夠數據繪製圖表。")
 
+SIMULATION_SCENARIOS = (10_000, 20_000, 50_000, 100_000)
+SIMULATION_DISTRIBUTIONS = {'normal': "常態分布", 'uniform': "均勻分布", 'lognormal': "對數常態 (不改變正負號)"}
+SIMULATION_BAND_BASES = {'conclusion': "結論門檻", 'generic': "一般區間 (非評估門檻)"}
+SIMULATION_BAND_COLUMNS = {'edges': "區間門檻", 'basis': "依據", 'base_band': "基準區間", 'below': "較低區間",
+                           'same': "相同區間", 'above': "較高區間", 'crossing': "跨出基準區間"}
+
+def field_label(key):
+    """欄位的中文名稱 (取自 TERMS_GLOSSARY 的第一段)。"""
+    return TERMS_GLOSSARY.get(key, key).split(' (')[0]
+
+def display_simulation_tab(financial_data):
+    """敏感度模擬分頁：選擇要擾動的欄位與誤差大小，觀察六項評分的分布與跨越評分區間的機率。"""
+    st.header("蒙地卡羅敏感度模擬")
+    st.caption("對選取的欄位乘上隨機誤差係數，以向量化計算一次評分所有情境，評估分數對輸入估計誤差的穩健程度。")
+    fields = st.multiselect("要擾動的欄位", list(FinancialData().data), default=list(DEFAULT_PERTURBATIONS),
+                            format_func=field_label, key="simulation_fields")
+    col_dist, col_error, col_count = st.columns(3)
+    distribution = col_dist.selectbox("誤差分布", DISTRIBUTIONS, format_func=SIMULATION_DISTRIBUTIONS.get, key="simulation_distribution")
+    error = col_error.slider("相對誤差 (標準差或範圍)", 0.01, 0.5, 0.1, 0.01, key="simulation_error")
+    scenarios = col_count.select_slider("情境數", SIMULATION_SCENARIOS, value=SIMULATION_SCENARIOS[0], key="simulation_scenarios")
+    if st.button("🎲 執行模擬", disabled=not fields):
+        with get_instrumentation().stage('simulation', scenarios=scenarios):
+            st.session_state.simulation = simulate(financial_data, {key: (distribution, error) for key in fields}, scenarios)
+
+    simulation = st.session_state.get('simulation')
+    if simulation is None:
+        return
+    st.subheader(f"評分分布 ({len(simulation):,} 個情境)")
+    st.dataframe(simulation.summary().rename(index=ANALYSIS_TITLES, columns={
+        'base': "基準分數", 'mean': "平均", 'std': "標準差", 'p5': "5%", 'p50': "中位數", 'p95': "95%"}).round(2))
+    st.subheader("跨越評分區間的機率")
+    st.caption("「結論門檻」為結論隨之改變的分數；其他分析的結論只依各項是/否判斷，與分數無關，改以一般分數區間呈現分數的變動幅度。")
+    probabilities = simulation.band_probabilities()
+    probabilities['basis'] = probabilities['basis'].map(SIMULATION_BAND_BASES)
+    st.dataframe(probabilities.rename(index=ANALYSIS_TITLES, columns=SIMULATION_BAND_COLUMNS)
+                 .style.format("{:.1%}", subset=[SIMULATION_BAND_COLUMNS[c] for c in ('below', 'same', 'above', 'crossing')]))
+    key = st.selectbox("分數分布", FinancialCalculator.ANALYSIS_KEYS, format_func=ANALYSIS_TITLES.get, key="simulation_histogram")
+    st.bar_chart(simulation.histogram(key))
+    st.dataframe(simulation.band_distribution(key).rename(columns={'share': "情境比例"}).rename_axis("區間").style.format("{:.1%}"))
+    with st.expander("各欄位誤差與分數的相關係數"):
+        st.dataframe(simulation.sensitivity().rename(index=field_label, columns=ANALYSIS_TITLES).round(2))
+
+def score_all_companies(df):
+    """
+    多公司模式：以批次計算一次評分 df 中的每一列，回傳 (六項分數的結果表, 篩選器, 排名器)。
+    df 含 company_id (與 period) 欄位時，評分結果同時保存至資料庫。
+    df 中不屬於 FinancialData 的欄位 (例如公司名稱、代號) 會保留在最前面作為識別欄位；
+    篩選器可查詢 FinancialData 欄位、所有比率與六項分數，排名器保存六項分數矩陣供調整權重時重算排名。
+    """
+    with get_instrumentation().stage('batch_score', rows=len(df)):
+        if TREND_COMPANY_COLUMN in df.columns:
+            # 有公司代號時一併保存至資料庫 (只寫回新的或數據有變動的公司)
+            period_column = TREND_PERIOD_COLUMN if TREND_PERIOD_COLUMN in df.columns else None
+            scored, written = get_store().score_frame(df, TREND_COMPANY_COLUMN, period_column)
+            st.toast(f"已將 {written} 筆新的或有變動的公司數據存入資料庫。", icon="💾")
+        else:
+            scored = score_companies(df)
+        screener = Screener.from_scores(df, scored)
+        ranker = Ranker.from_frame(scored)
+        results = scored.drop(columns=list(FinancialCalculator.RATIO_KEYS)).rename(columns=ANALYSIS_TITLES)
+    return results, screener, ranker
+
+RANKING_MODES = ("加權綜合分數前 k 名", "單項分數後段")
+
+def display_ranking(ranker):
+    """排名面板：拖曳權重即重新排名 (只重算加權與部分選取，不重新評分)。"""
+    st.subheader("🏆 排名")
+    mode = st.radio("排名方式", RANKING_MODES, horizontal=True, key="ranking_mode")
+    if mode == RANKING_MODES[0]:
+        weight_columns = st.columns(len(ranker.keys))
+        weights = {key: column.slider(ANALYSIS_TITLES[key], 0.0, 5.0, 1.0, 0.5, key=f"ranking_weight_{key}")
+                   for column, key in zip(weight_columns, ranker.keys)}
+        k = st.number_input("前 k 名", min_value=1, value=100, step=10, key="ranking_k")
+        if sum(weights.values()) == 0:
+            st.warning("請至少為一項分數設定大於 0 的權重。")
+            return
+        with get_instrumentation().stage('ranking', rows=len(ranker)):
+            positions, composite = ranker.top(int(k), weights)
+        st.dataframe(ranker.frame(positions, composite).rename(columns={**ANALYSIS_TITLES, 'rank': "名次", 'composite': "綜合分數"}))
+    else:
+        col_key, col_fraction = st.columns(2)
+        key = col_key.selectbox("分數項目", ranker.keys, format_func=ANALYSIS_TITLES.get, index=1, key="ranking_key")
+        percent = col_fraction.slider("最低的百分比", 1, 50, 10, key="ranking_percent")
+        with get_instrumentation().stage('ranking', rows=len(ranker)):
+            positions = ranker.bottom_fraction(key, percent / 100)
+        st.caption(f"{ANALYSIS_TITLES[key]}最低的 {percent}%：共 {len(positions):,} 家公司，顯示前 {min(len(positions), SCREENER_DISPLAY_ROWS):,} 家。")
+        st.dataframe(ranker.frame(positions[:SCREENER_DISPLAY_ROWS]).rename(columns={**ANALYSIS_TITLES, 'rank': "名次"}))
+
+# 篩選結果最多顯示的列數 (筆數仍為全部符合的公司數)
+SCREENER_DISPLAY_ROWS = 1000
+
+def display_screener(screener):
+    """篩選器面板：條件以排序索引查詢，可再依任一欄位取前 k 名。"""
+    st.subheader("🔎 篩選器")
+    query = st.text_input("篩選條件 (以逗號分隔，全部須成立)", value="roe > industry_avg_roe, debt_ratio < 0.5, liquidity > 70",
+                          key="screener_query", help="欄位可為 FinancialData 欄位、比率或六項分數的鍵，例如 roe、debt_ratio、liquidity；"
+                                                      "運算子為 > >= < <= ==，右側可為數值或另一個欄位。")
+    sort_options = list(FinancialCalculator.ANALYSIS_KEYS + FinancialCalculator.RATIO_KEYS)
+    col_sort, col_k, col_order = st.columns(3)
+    sort_column = col_sort.selectbox("排序欄位", sort_options, format_func=lambda key: ANALYSIS_TITLES.get(key, key), key="screener_sort")
+    k = col_k.number_input("前 k 名 (0 表示全部)", min_value=0, value=100, step=10, key="screener_k")
+    largest = col_order.radio("排序方向", ["由大到小", "由小到大"], horizontal=True, key="screener_order") == "由大到小"
+    try:
+        conditions = parse_query(query)
+        with get_instrumentation().stage('screener_query', rows=len(screener)):
+            positions = screener.filter(conditions)
+            ranked = screener.top_k(sort_column, int(k) or len(positions), largest=largest, among=positions)
+    except (ValueError, KeyError) as e:
+        st.error(f"篩選條件有誤: {e}")
+        return
+    # 顯示排序欄位、條件中用到的欄位與六項分數
+    columns = [sort_column]
+    for column, _, operand in conditions:
+        columns.extend([column, operand] if isinstance(operand, str) else [column])
+    st.caption(f"符合條件 {len(positions):,} / {len(screener):,} 家公司，顯示前 {min(len(ranked), SCREENER_DISPLAY_ROWS):,} 名。")
+    st.dataframe(screener.frame(ranked[:SCREENER_DISPLAY_ROWS], dict.fromkeys(columns + list(FinancialCalculator.ANALYSIS_KEYS)))
+                 .rename(columns=ANALYSIS_TITLES))
+
+# 長格式上傳檔 (每列為一家公司的一期) 的公司與期別欄位
+TREND_COMPANY_COLUMN = 'company_id'
+TREND_PERIOD_COLUMN = 'period'
+# 趨勢圖：(標題, rolling_metrics 的鍵)
+TREND_CHARTS = (
+    ("近四季營收與稅後淨利 (TTM)", ('ttm_revenue', 'ttm_net_profit')),
+    ("TTM 營收年增率與滾動 ROE", ('ttm_revenue_growth', 'rolling_roe')),
+    ("應收帳款周轉天數 (近四季移動平均)", ('ar_days_moving_average',)),
+)
+
+def is_time_series_frame(df):
+    return TREND_COMPANY_COLUMN in df.columns and TREND_PERIOD_COLUMN in df.columns
+
+def analyze_trends(df):
+    """季度趨勢：所有公司的滾動指標 (TTM、滾動 ROE、周轉天數移動平均) 與最新一期觸發的警示。"""
+    with get_instrumentation().stage('trend_metrics', rows=len(df)):
+        series = FinancialTimeSeries.from_long_frame(df, TREND_COMPANY_COLUMN, TREND_PERIOD_COLUMN)
+        metrics = series.rolling_metrics()
+        return {'series': series, 'metrics': metrics, 'alerts': series.trend_alerts(metrics)}
+
+STORE_RECENT_ENTRIES = 200
+
+def load_from_store(company, period):
+    """
+    由資料庫載入一家公司一期的數據與分析結果 (on_click 回呼，於重新執行前修改輸入欄位)。
+    只保存了分數 (多公司評分) 的公司以保存的快照重新分析一次。
+    """
+    store = get_store()
+    stored = store.load(company, period)
+    if stored is None:
+        st.toast(f"資料庫中沒有 {company} {period} 的數據。", icon="⚠️")
+        return
+    fd = st.session_state.financial_data
+    fd.data.update(stored['financial_data'].data)
+    for key in fd.data:
+        st.session_state.pop(f"input_{key}", None) # 讓手動輸入欄位以載入的數值重新建立
+    ratios, results = stored['ratios'], stored['results']
+    if results is None:
+        ratios, results, _ = store.analyze(company, period, fd)
+    st.session_state.ratios, st.session_state.results = ratios, results
+    st.session_state.analyzer.mark_analyzed()
+    st.session_state.store_company, st.session_state.store_period = company, period
+    st.session_state.data_loaded = True
+    st.toast(f"已載入 {company} {period} ({stored['updated_at']} 保存)。", icon="📂")
+
+def display_store_panel():
+    """側邊欄的公司資料庫：填寫公司後執行分析會自動保存，已保存的公司可直接載入 (不需重新計算)。"""
+    st.subheader("公司資料庫")
+    st.text_input("公司名稱或代號", key="store_company", help="填寫後，執行分析時會將數據與結果存入資料庫。")
+    st.text_input("期別 (例如 2024Q4)", key="store_period")
+    entries = get_store().entries(limit=STORE_RECENT_ENTRIES)
+    if len(entries):
+        choice = st.selectbox("已保存的公司 (最近更新)", options=range(len(entries)), key="store_entry",
+                              format_func=lambda i: f"{entries.company[i]} {entries.period[i]}".strip())
+        st.button("📂 載入", on_click=load_from_store, args=(entries.company[choice], entries.period[choice]))
+
+def get_instrumentation():
+    """目前 session 的效能量測器 (顯示診斷面板時預設開啟，否則預設關閉，可在診斷面板中切換)。"""
+    if 'instrumentation' not in st.session_state:
+        st.session_state.instrumentation = Instrumentation(enabled=diagnostics_visible(),
+                                                           context={'session': uuid.uuid4().hex[:8]})
+    return st.session_state.instrumentation
+
+def diagnostics_visible():
+    """診斷面板預設隱藏，網址加上 ?diagnostics=1 或設定環境變數時才顯示。"""
+    return enabled_by_env() or st.query_params.get('diagnostics') == '1'
+
+@st.cache_resource
+def configure_diagnostics_logging():
+    """每個伺服器程序設定一次 'instrumentation' logger 的輸出 (標準錯誤或 FINANCIAL_ANALYZER_DIAGNOSTICS_LOG 指定的檔案)。"""
+    return configure_logging()
+
+def display_diagnostics_panel(instrumentation):
+    """側邊欄的效能診斷面板：各階段耗時、cProfile 剖析結果與共用快取的命中率。"""
+    with st.sidebar.expander("🔧 效能診斷"):
+        # 以 on_change 回呼更新設定，讓切換後的這次重新執行就套用新設定
+        for attr, label in (('enabled', "記錄各階段耗時"), ('profile', "cProfile 剖析"), ('trace_memory', "tracemalloc 峰值記憶體")):
+            key = f'diagnostics_{attr}'
+            st.checkbox(label, value=getattr(instrumentation, attr), key=key,
+                        on_change=lambda attr=attr, key=key: setattr(instrumentation, attr, st.session_state[key]))
+        if st.button("清除統計"):
+            instrumentation.reset()
+
+        summary = instrumentation.summary()
+        if summary:
+            st.dataframe(pd.DataFrame(summary).set_index('stage').round(3))
+        else:
+            st.caption("尚無量測資料。開啟記錄後重新執行分析即可看到各階段耗時。")
+        profile_text = instrumentation.profile_text()
+        if profile_text:
+            st.code(profile_text, language=None)
+
+        st.caption("共用快取 (所有 session)")
+        caches = {"分析結果": get_result_cache(), "圖表": get_chart_cache(), "上傳檔案": get_upload_cache()}
+        st.dataframe(pd.DataFrame.from_dict({name: cache.stats() for name, cache in caches.items()}, orient='index').round(3))
+
 # --- Streamlit App ---
 
 st.set_page_config(page_title="財務報表分析工具", layout="wide")
+if diagnostics_visible():
+    configure_diagnostics_logging()
 st.title("📊 財務報表分析工具")
 st.write("輸入或載入您的財務數據，以獲得全面的財務健康評估。")
 
@@ -937,12 +522,26 @@ if 'financial_data' not in st.session_state:
     st.session_state.financial_data = FinancialData()
 if 'calculator' not in st.session_state:
     st.session_state.calculator = FinancialCalculator(st.session_state.financial_data)
+if 'analyzer' not in st.session_state:
+    st.session_state.analyzer = IncrementalAnalyzer(st.session_state.calculator)
 if 'ratios' not in st.session_state:
     st.session_state.ratios = {}
 if 'results' not in st.session_state:
     st.session_state.results = {}
 if 'data_loaded' not in st.session_state:
     st.session_state.data_loaded = False
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = None
+if 'screener' not in st.session_state:
+    st.session_state.screener = None
+if 'ranker' not in st.session_state:
+    st.session_state.ranker = None
+if 'stream_result' not in st.session_state:
+    st.session_state.stream_result = None
+if 'report_archive' not in st.session_state:
+    st.session_state.report_archive = None
+if 'trend' not in st.session_state:
+    st.session_state.trend = None
 
 
 # --- Sidebar for Data Input ---
@@ -951,25 +550,51 @@ with st.sidebar:
     st.write("您可以從檔案載入或手動輸入數據。")
 
     # File Uploader
-    uploaded_file = st.file_uploader("從檔案載入數據 (CSV/Excel)", type=['csv', 'xlsx', 'xls'])
+    uploaded_file = st.file_uploader("從檔案載入數據 (CSV (可為 .csv.gz)/Excel/Parquet/Arrow)", type=['csv', 'gz', 'xlsx', 'xls', 'parquet', 'arrow', 'feather'])
     if uploaded_file is not None:
         try:
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            streaming = is_streaming_upload(uploaded_file)
+            df = preview_uploaded_file(uploaded_file) if streaming else load_uploaded_file(uploaded_file)
 
             st.success(f"已成功載入檔案: {uploaded_file.name}")
             st.dataframe(df.head())
 
-            # Update FinancialData from DataFrame (assuming first row and matching columns)
+            # 多公司模式：檔案含多列時，可一次評分所有公司，或選擇一列載入單一公司分析
+            row_position = 0
+            if streaming:
+                st.caption(f"檔案較大 ({uploaded_file.size / 2**20:,.0f} MB)，只載入前 {len(df)} 列預覽，評分時逐批串流處理。")
+                if st.button("📋 串流評分檔案中全部公司"):
+                    st.session_state.stream_result = stream_score_upload(uploaded_file)
+                if st.button("📦 匯出全部公司報告 (ZIP)"):
+                    uploaded_file.seek(0)
+                    st.session_state.report_archive = export_report_archive(
+                        iter_company_chunks(uploaded_file, REPORT_EXPORT_CHUNK_ROWS, file_name=uploaded_file.name),
+                        lambda count: uploaded_file.tell() / max(uploaded_file.size, 1), uploaded_file.name)
+            if len(df) > 1:
+                row_position = st.selectbox(
+                    "載入至單一公司分析的資料列",
+                    options=range(len(df)),
+                    format_func=lambda i: f"第 {i + 1} 列",
+                )
+                if not streaming and st.button(f"📋 評分檔案中全部 {len(df)} 家公司"):
+                    st.session_state.batch_results, st.session_state.screener, st.session_state.ranker = score_all_companies(df)
+                if not streaming and st.button(f"📦 匯出全部 {len(df)} 家公司報告 (ZIP)"):
+                    st.session_state.report_archive = export_report_archive(
+                        split_frame(df, REPORT_EXPORT_CHUNK_ROWS), lambda count: count / len(df), uploaded_file.name)
+                if not streaming and is_time_series_frame(df) and st.button("📈 分析季度趨勢"):
+                    st.session_state.trend = analyze_trends(df)
+
+            # Update FinancialData from DataFrame (selected row and matching columns)
+            row = df.iloc[row_position]
             for key in st.session_state.financial_data.data.keys():
                 if key in df.columns:
                     try:
-                        value = df.loc[0, key]
+                        value = row[key]
                         if isinstance(st.session_state.financial_data.get_data(key), list):
                             if isinstance(value, str):
                                 st.session_state.financial_data.update_data(key, [float(x.strip()) for x in value.split(',')])
+                            elif hasattr(value, '__len__'): # Parquet / Arrow 的列表欄位
+                                st.session_state.financial_data.update_data(key, [float(x) for x in value])
                             else:
                                 st.session_state.financial_data.update_data(key, [float(value)])
                         else:
@@ -981,6 +606,8 @@ with st.sidebar:
         except Exception as e:
             st.error(f"載入檔案時發生錯誤: {e}")
 
+    display_store_panel()
+
     # Manual Input
     st.subheader("手動輸入")
     with st.expander("展開以手動輸入數據", expanded=not st.session_state.data_loaded):
@@ -1042,29 +669,105 @@ with st.sidebar:
             st.error("近三年營業現金流格式不正確，請使用逗號分隔的數字。")
             fd.data['three_year_operating_cash_flows'] = [0.0, 0.0, 0.0]
 
+st.sidebar.radio("圖表顯示方式", list(CHART_BACKENDS), format_func=CHART_BACKENDS.get,
+                 index=list(CHART_BACKENDS).index(chart_backend()), key="chart_backend")
+# 只有伺服器繪圖時才需要字型 (會匯入 matplotlib)；瀏覽器繪圖時在第一次下載 PNG 才解析
+if chart_backend() == 'matplotlib':
+    warm_up_fonts()
+
 # --- Analysis Button ---
 if st.sidebar.button("🚀 執行所有分析", type="primary"):
     try:
         # Update FinancialData from manual inputs before analysis
         # (This is implicitly done by st.number_input updating the fd.data dict)
 
-        st.session_state.ratios = st.session_state.calculator.calculate_ratios()
-        st.session_state.results['profit_quality'] = st.session_state.calculator.assess_profit_quality(st.session_state.ratios)
-        st.session_state.results['cash_flow'] = st.session_state.calculator.assess_cash_flow(st.session_state.ratios)
-        st.session_state.results['liquidity'] = st.session_state.calculator.assess_liquidity_risk(st.session_state.ratios)
-        st.session_state.results['debt_solvency'] = st.session_state.calculator.assess_debt_solvency(st.session_state.ratios)
-        st.session_state.results['op_efficiency'] = st.session_state.calculator.assess_operational_efficiency(st.session_state.ratios)
-        st.session_state.results['inv_expansion'] = st.session_state.calculator.assess_investment_expansion(st.session_state.ratios)
-        st.toast("分析完成！請查看各分頁結果。", icon="🎉")
+        # 其他 session 算過相同數據時直接取用共用快取，否則只重算輸入有變動的比率與評估
+        recomputed = run_analysis()
+        company = st.session_state.get('store_company', '').strip()
+        if company:
+            get_store().save(company, st.session_state.get('store_period', DEFAULT_PERIOD).strip(),
+                             st.session_state.financial_data, st.session_state.ratios, st.session_state.results)
+        st.toast(f"分析完成！重新計算 {len(recomputed)} / 6 項評估，請查看各分頁結果。", icon="🎉")
     except Exception as e:
         st.error(f"執行分析時發生錯誤: {e}\n請確認數據輸入是否完整且正確。")
 
 
+# --- Multi-company Results ---
+if st.session_state.batch_results is not None:
+    st.header("多公司評分結果")
+    st.caption(f"共 {len(st.session_state.batch_results)} 家公司，點擊欄位標題即可排序。")
+    st.dataframe(st.session_state.batch_results)
+    st.download_button(
+        label="💾 下載評分結果 (CSV)",
+        data=st.session_state.batch_results.to_csv(index=False).encode('utf-8-sig'),
+        file_name=f"batch_scores_{datetime.now().strftime('%Y%m%d')}.csv",
+        mime="text/csv"
+    )
+    st.download_button(
+        label="💾 下載評分結果 (Parquet)",
+        data=frame_to_parquet_bytes(st.session_state.batch_results),
+        file_name=f"batch_scores_{datetime.now().strftime('%Y%m%d')}.parquet",
+        mime="application/vnd.apache.parquet"
+    )
+    if st.session_state.screener is not None:
+        display_screener(st.session_state.screener)
+    if st.session_state.ranker is not None:
+        display_ranking(st.session_state.ranker)
+
+stream_result = st.session_state.stream_result
+if stream_result is not None and os.path.exists(stream_result['path']):
+    st.header("多公司評分結果 (串流)")
+    st.caption(f"{stream_result['name']}：共 {stream_result['rows']:,} 家公司，以下為前 100 列。")
+    st.dataframe(pd.read_csv(stream_result['path'], nrows=100, encoding='utf-8-sig'))
+    with open(stream_result['path'], 'rb') as result_file:
+        st.download_button(
+            label="💾 下載評分結果 (CSV)",
+            data=result_file,
+            file_name=f"batch_scores_{datetime.now().strftime('%Y%m%d')}.csv",
+            mime="text/csv",
+            key="download_stream_result"
+        )
+    st.subheader(f"六項平均分數前 {len(stream_result['top'])} 名")
+    st.dataframe(stream_result['top'])
+
+trend = st.session_state.trend
+if trend is not None:
+    st.header("季度趨勢分析")
+    series, metrics = trend['series'], trend['metrics']
+    company = st.selectbox("公司", options=range(len(series)), format_func=lambda i: str(series.companies[i]), key="trend_company")
+    chart_columns = st.columns(len(TREND_CHARTS))
+    for chart_column, (title, keys) in zip(chart_columns, TREND_CHARTS):
+        with chart_column:
+            values = {ROLLING_METRIC_TITLES[key]: metrics[key][company].tolist() for key in keys}
+            show_chart(line_chart_spec(series.periods, values, title),
+                       lambda values=values, title=title: render_line_chart_png(series.periods, values, title), title)
+    with st.expander("各期指標"):
+        st.dataframe(series.metric_frame(metrics, company))
+    st.subheader(f"趨勢警示 ({series.periods[-1]})")
+    if len(trend['alerts']):
+        st.dataframe(trend['alerts'], hide_index=True)
+    else:
+        st.success("最新一期沒有公司觸發警示。")
+
+report_archive = st.session_state.report_archive
+if report_archive is not None and os.path.exists(report_archive['path']):
+    st.header("全部公司報告")
+    st.caption(f"{report_archive['name']}：共 {report_archive['reports']:,} 份報告，耗時 {report_archive['seconds']:.1f} 秒 "
+               f"({report_archive['reports_per_second']:,.0f} 份/秒)。ZIP 內含每家公司的報告與合併的評分 CSV。")
+    with open(report_archive['path'], 'rb') as archive_file:
+        st.download_button(
+            label="💾 下載全部報告 (ZIP)",
+            data=archive_file,
+            file_name=f"financial_reports_{datetime.now().strftime('%Y%m%d')}.zip",
+            mime="application/zip",
+            key="download_report_archive"
+        )
+
 # --- Main Area with Tabs ---
 if st.session_state.ratios: # Only show tabs if analysis has run
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
         "📈 綜合報告", "🏆 獲利品質", "💧 現金流量",
-        "💰 流動性風險", "⚖️ 負債與償債", "⚙️ 營運效率", "🏗️ 投資與擴張"
+        "💰 流動性風險", "⚖️ 負債與償債", "⚙️ 營運效率", "🏗️ 投資與擴張", "🎲 敏感度模擬"
     ])
 
     fd = st.session_state.financial_data
@@ -1079,15 +782,16 @@ if st.session_state.ratios: # Only show tabs if analysis has run
             ratios.get('net_profit_margin', 0.0), ratios.get('current_ratio', 0.0),
             ratios.get('debt_ratio', 0.0), ratios.get('free_cash_flow', 0.0)
         ]
-        fig = plot_bar_chart(overall_labels, overall_values, "綜合關鍵財務指標")
-        st.pyplot(fig)
-
-        report_text = generate_overall_report_text(
-            st.session_state.calculator,
-            ratios,
-            results['profit_quality'], results['cash_flow'], results['liquidity'],
-            results['debt_solvency'], results['op_efficiency'], results['inv_expansion']
-        )
+        show_chart(bar_chart_spec(overall_labels, overall_values, "綜合關鍵財務指標"),
+                   lambda: render_bar_chart_png(overall_labels, overall_values, "綜合關鍵財務指標"), "綜合關鍵財務指標")
+
+        with get_instrumentation().stage('report_text'):
+            report_text = generate_overall_report_text(
+                st.session_state.calculator,
+                ratios,
+                results['profit_quality'], results['cash_flow'], results['liquidity'],
+                results['debt_solvency'], results['op_efficiency'], results['inv_expansion']
+            )
         st.text_area("報告內容", report_text, height=400)
         st.download_button(
             label="💾 儲存報告",
@@ -1177,8 +881,14 @@ if st.session_state.ratios: # Only show tabs if analysis has run
             ]
         )
 
+    with tab8: # 敏感度模擬
+        display_simulation_tab(fd)
+
 else:
     st.info("請在左側輸入或載入數據，然後點擊 '執行所有分析' 按鈕以查看結果。")
 
+if diagnostics_visible():
+    display_diagnostics_panel(get_instrumentation())
+
 st.sidebar.markdown("---")
 st.sidebar.caption("© 2024 Financial Analyzer (Streamlit Version)")